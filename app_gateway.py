@@ -1,11 +1,29 @@
 from flask import Flask, render_template, request, redirect, url_for, session, flash, send_file
-import sqlite3, os, datetime, psycopg2
-from urllib.parse import urlparse
+import sqlite3, os, datetime
 from werkzeug.utils import secure_filename
 
 # ====== SERVICES (pastikan fungsi-fungsi ini ada di services/*.py) ======
 from services.auth_service import login_user, logout_user, current_user, require_role
 from services.admin_service import list_users, create_user
+from services.db_pool import DB_PATH
+from services.repository import connection as db_connection
+from services.migrations import ensure_schema
+from services.statistik_service import dashboard_counts
+from services.pagination import keyset_page
+from services.facet_service import parse_filter, facet_hasil
+from services.search_service import cari_ijazah
+from services.export_service import (
+    export_hasil, export_hasil_by_nama, export_pdf, select_hasil_ids,
+    rekap_csv, nama_file_rekap, PDF_ZIP_MAX, HASIL_DIR as EXPORT_HASIL_DIR
+)
+from services.verifikasi_publik import rate_limited, normalisasi_nomor, cek_nomor
+from services.storage import simpan as simpan_upload, resolve as resolve_upload, hapus as hapus_upload
+from services.file_serving import kirim_file
+from services.santri_service import santri_header, page_santri, ringkasan_santri, nis_ganda
+from services.job_service import (
+    enqueue_penetapan, enqueue_penetapan_massal, enqueue_export_pdf_zip, get_job, list_active_jobs,
+    start_workers, JENIS_EXPORT, enqueue_export_rekap_xlsx
+)
 from services.mdt_service import (
     create_pengajuan_batch,
     list_pengajuan_batch_by_mdt,
@@ -15,14 +33,19 @@ from services.mdt_service import (
     list_pengajuan_for_kanwil,
     generate_nomor_ijazah_batch,
     list_hasil_penetapan,
-    list_kabupaten
+    list_kabupaten,
+    pengajuan_milik_mdt
 )
 
 from flask import send_file, jsonify
 from flask import send_from_directory, abort
+from flask import Response, stream_with_context
 from flask import render_template
-import pandas as pd
 from urllib.parse import unquote
+from werkzeug.security import safe_join
+from services.excel_ingest import (
+    read_header, read_page, column_meta, KolomTidakDitemukan, PREVIEW_PAGE_SIZE, PREVIEW_MAX_LIMIT
+)
 
 # ====== APP CONFIG ======
 app = Flask(__name__, static_folder="static", static_url_path="/static")
@@ -36,85 +59,30 @@ app.config["PROPAGATE_EXCEPTIONS"] = True
 # Tentukan base folder aplikasi
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 TMP_DIR = "/tmp"
-UPLOAD_DIR = os.path.join(TMP_DIR, "uploads")
 HASIL_DIR = os.path.join(TMP_DIR, "hasil_excel")
-DB_PATH = os.path.join(TMP_DIR, "sindi.db")
 
-os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(HASIL_DIR, exist_ok=True)
 
+# Path SQLite & koneksi (PostgreSQL/SQLite) dikelola oleh services/db_pool.py
+DB_NAME = DB_PATH
 
-DB_PATH = "/tmp/sindi.db"
-if not os.path.exists(DB_PATH):
-    from create_db import create_database  # import fungsi yang kamu pakai
-    create_database(DB_PATH)
+# File upload disimpan & dicari lewat services/storage.py (kunci = hash isi)
+ALLOWED_EXT = {"pdf", "xls", "xlsx"}
 
-def get_connection():
-    db_url = os.getenv("DATABASE_URL")
-    if db_url:
-        try:
-            parsed = urlparse(db_url)
-            conn = psycopg2.connect(
-                database=parsed.path[1:],
-                user=parsed.username,
-                password=parsed.password,
-                host=parsed.hostname,
-                port=parsed.port
-            )
-            print("✅ Connected to PostgreSQL")
-            return conn
-        except Exception as e:
-            print(f"⚠️ PostgreSQL error: {e} — fallback to SQLite")
+def _page_args(param="cursor"):
+    """(cursor, per_page) dari query string untuk daftar ber-pagination keyset."""
+    return request.args.get(param) or None, request.args.get("per_page", type=int)
 
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
 
+@app.template_global()
+def page_url(param, cursor):
+    """URL halaman ini dengan satu parameter cursor diganti (filter lain tetap)."""
+    args = request.args.to_dict(flat=False)  # filter multi-nilai tetap terbawa
+    args.pop(param, None)
+    if cursor:
+        args[param] = cursor
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
 
-# -------------------------
-# Auto-create database di Render jika belum ada
-# -------------------------
-def create_database(path):
-    print(f"🧱 Membuat ulang database di {path} ...")
-    conn = sqlite3.connect(path)
-    c = conn.cursor()
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT,
-        password TEXT,
-        role TEXT,
-        kode_mdt TEXT,
-        wilayah TEXT,
-        created_at TEXT DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS pengajuan (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        nama_mdt TEXT,
-        jenjang TEXT,
-        tahun_pelajaran TEXT,
-        jumlah_lulus INTEGER,
-        file_lulusan TEXT,
-        kabupaten TEXT,
-        status TEXT,
-        nomor_batch TEXT,
-        alasan TEXT,
-        tanggal_verifikasi TEXT,
-        verifikator TEXT
-    )
-    """)
-    conn.commit()
-    conn.close()
-    print("✅ Database siap digunakan.")
-
-if not os.path.exists(DB_PATH):
-    create_database(DB_PATH)
-
-UPLOAD_DIR = "uploads"
-ALLOWED_EXT = {"pdf", "xls", "xlsx"}
-os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 def allowed_file(filename: str) -> bool:
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXT
@@ -123,53 +91,8 @@ def allowed_file(filename: str) -> bool:
 #  INIT DATABASE (aman, idempotent)
 # ==============================
 def init_db():
-    """Pastikan semua tabel dan kolom penting sudah ada."""
-    with sqlite3.connect(DB_NAME) as conn:
-        c = conn.cursor()
-
-        # 🔹 Pastikan kolom penting di pengajuan
-        for col, tipe in [
-            ("alasan", "TEXT"),
-            ("kabupaten", "TEXT"),
-            ("tanggal_verifikasi", "TEXT"),
-            ("verifikator", "TEXT"),
-        ]:
-            try:
-                c.execute(f"ALTER TABLE pengajuan ADD COLUMN {col} {tipe}")
-            except sqlite3.OperationalError:
-                pass
-
-        # 🔹 Buat tabel nomor_ijazah (kalau belum ada)
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS nomor_ijazah (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            pengajuan_id INTEGER,
-            nama_santri TEXT,
-            nis TEXT,
-            nomor_ijazah TEXT,
-            tahun TEXT,
-            jenjang TEXT
-        )
-        """)
-
-        # 🔹 Buat tabel riwayat_verifikasi (kalau belum ada)
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS riwayat_verifikasi (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            pengajuan_id INTEGER,
-            nama_mdt TEXT,
-            jenjang TEXT,
-            tahun TEXT,
-            jumlah_lulus INTEGER,
-            status TEXT,
-            alasan TEXT,
-            verifikator TEXT,
-            tanggal_verifikasi TEXT
-        )
-        """)
-
-        conn.commit()
-        print("✅ Semua tabel utama & riwayat_verifikasi sudah dicek/dibuat.")
+    """Terapkan migrasi skema yang belum jalan di backend aktif (lihat services/repository.py)."""
+    ensure_schema()
 
 def init_master_kabupaten():
     kabupaten_jabar = [
@@ -188,44 +111,138 @@ def init_master_kabupaten():
         ("Kota Depok", "Jawa Barat"), ("Kota Sukabumi", "Jawa Barat"),
         ("Kota Tasikmalaya", "Jawa Barat")
     ]
-    with sqlite3.connect(DB_NAME) as conn:
+    with db_connection() as conn:
         c = conn.cursor()
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS master_kabupaten (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nama_kabupaten TEXT NOT NULL UNIQUE,
-            provinsi TEXT NOT NULL
-        )
-        """)
         c.executemany("""
-            INSERT OR IGNORE INTO master_kabupaten (nama_kabupaten, provinsi)
-            VALUES (?, ?)
+            INSERT INTO master_kabupaten (nama_kabupaten, provinsi)
+            VALUES (?, ?) ON CONFLICT DO NOTHING
         """, kabupaten_jabar)
         conn.commit()
 
 def init_master_jenjang():
     jenjangs = [("Ula",), ("Wustha",), ("Ulya",), ("Al-Jami’ah",)]
-    with sqlite3.connect(DB_NAME) as conn:
+    with db_connection() as conn:
         c = conn.cursor()
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS master_jenjang (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nama_jenjang TEXT NOT NULL UNIQUE
-        )
-        """)
-        c.executemany("INSERT OR IGNORE INTO master_jenjang (nama_jenjang) VALUES (?)", jenjangs)
+        c.executemany("INSERT INTO master_jenjang (nama_jenjang) VALUES (?) ON CONFLICT DO NOTHING", jenjangs)
         conn.commit()
 
 init_db()
 init_master_kabupaten()
 init_master_jenjang()
+start_workers()
 
 # ==============================
 #  ROOTS
 # ==============================
+PERAN_PRATINJAU = ["mdt", "kankemenag", "kanwil", "admin"]
+
+
+def _boleh_lihat_pengajuan(pengajuan_id):
+    """Staging santri hanya untuk user login; MDT hanya pengajuan miliknya sendiri."""
+    user = current_user()
+    if not user or user["role"] not in PERAN_PRATINJAU:
+        return False
+    return user["role"] != "mdt" or pengajuan_milik_mdt(pengajuan_id, user["id"])
+
+
+def _render_excel_preview(template, path, filename):
+    """
+    Render kerangka pratinjau Excel: header + halaman pertama saja.
+    Halaman berikutnya diambil template lewat /preview_data saat tabel di-scroll,
+    jadi file 20 ribu baris tidak lagi menjadi HTML bermegabyte.
+    Dengan ?pengajuan_id= baris diambil dari staging santri_lulusan (tanpa membuka file).
+    """
+    pengajuan_id = request.args.get("pengajuan_id", type=int)
+    if pengajuan_id and not _boleh_lihat_pengajuan(pengajuan_id):
+        pengajuan_id = None
+    header = santri_header(pengajuan_id) if pengajuan_id else None
+    if header is not None:
+        rows, has_more = page_santri(pengajuan_id, 0, PREVIEW_PAGE_SIZE)
+    else:
+        pengajuan_id = None
+        header = read_header(path)
+        rows, has_more = read_page(path, 0, PREVIEW_PAGE_SIZE)
+    return render_template(
+        template, header=header, rows=rows, has_more=has_more, filename=filename,
+        page_size=PREVIEW_PAGE_SIZE,
+        data_url=url_for("preview_data", filename=filename, pengajuan_id=pengajuan_id),
+    )
+
+
+def _file_hasil(filename):
+    """
+    (path, nama unduhan) file hasil penetapan: artefak export_service (dirender
+    dari nomor_ijazah bila versinya belum di-cache), atau file lama di hasil_excel.
+    """
+    hasil = export_hasil_by_nama(filename)
+    if hasil is not None:
+        return hasil
+    for folder in (EXPORT_HASIL_DIR, HASIL_DIR, os.path.join(os.getcwd(), "hasil_excel")):
+        path = safe_join(folder, filename.replace("\\", "/"))
+        if path and os.path.isfile(path):
+            return path, os.path.basename(path)
+    return None
+
+
+def _preview_path(filename):
+    """Cari file pratinjau di hasil penetapan lalu uploads (None bila tidak ada)."""
+    hasil = _file_hasil(filename)
+    if hasil is not None:
+        return hasil[0]
+    return resolve_upload(filename)
+
+
+@app.route("/preview_data/<path:filename>")
+@require_role(PERAN_PRATINJAU)
+def preview_data(filename):
+    """
+    JSON pratinjau Excel berhalaman.
+      ?header_only=1        → metadata kolom saja (hanya baris header yang dibaca)
+      ?offset=0&limit=50    → {columns, rows, offset, limit, has_more, next_offset}
+      ?pengajuan_id=        → baris dari staging santri_lulusan (query ber-index;
+                              MDT hanya untuk pengajuan miliknya)
+    """
+    pengajuan_id = request.args.get("pengajuan_id", type=int)
+    if pengajuan_id and not _boleh_lihat_pengajuan(pengajuan_id):
+        return jsonify({"error": "Akses ditolak."}), 403
+    header = santri_header(pengajuan_id) if pengajuan_id else None
+    path = None if header is not None else _preview_path(unquote(filename))
+    if header is None and not path:
+        return jsonify({"error": "File tidak ditemukan."}), 404
+    if path and not path.lower().endswith((".xlsx", ".xls")):
+        return jsonify({"error": "Format file tidak didukung untuk pratinjau."}), 400
+
+    try:
+        offset = int(request.args.get("offset", 0))
+        limit = int(request.args.get("limit", PREVIEW_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"error": "offset dan limit harus berupa angka."}), 400
+    offset = max(offset, 0)
+    limit = min(max(limit, 0), PREVIEW_MAX_LIMIT)
+
+    try:
+        columns = column_meta(header if header is not None else read_header(path))
+        if request.args.get("header_only") in ("1", "true"):
+            return jsonify({"filename": filename, "columns": columns})
+        if header is not None:
+            rows, has_more = page_santri(pengajuan_id, offset, limit)
+        else:
+            rows, has_more = read_page(path, offset, limit)
+    except Exception as e:
+        return jsonify({"error": f"Gagal membaca file Excel: {e}"}), 500
+
+    return jsonify({
+        "filename": filename,
+        "columns": columns,
+        "rows": rows,
+        "offset": offset,
+        "limit": limit,
+        "has_more": has_more,
+        "next_offset": offset + len(rows) if has_more else None,
+    })
+
 app.route("/preview/<path:filepath>")
 def preview_file(filepath):
-    import pandas as pd
     import os
     full_path = os.path.join(os.getcwd(), filepath)
 
@@ -237,14 +254,7 @@ def preview_file(filepath):
         return f"<iframe src='/{filepath}' width='100%' height='600px'></iframe>"
     elif ext in ["xls", "xlsx"]:
         try:
-            df = pd.read_excel(full_path)
-            html_table = df.to_html(classes='table table-striped table-bordered table-hover', index=False)
-            return f"""
-            <div style='padding:10px'>
-                <h5 class='text-success'>📄 Preview Excel: {os.path.basename(filepath)}</h5>
-                <div style='overflow:auto; max-height:70vh;'>{html_table}</div>
-            </div>
-            """
+            return _render_excel_preview("lihat_file_modal.html", full_path, os.path.basename(filepath))
         except Exception as e:
             return f"<p class='text-danger p-3'>Gagal membaca file Excel: {e}</p>"
     else:
@@ -253,21 +263,16 @@ def preview_file(filepath):
 @app.route("/preview_upload/<path:filename>")
 def preview_upload(filename):
     from urllib.parse import unquote
-    import pandas as pd
     import os
 
     filename = unquote(filename)
-    upload_path = os.path.join(os.getcwd(), "uploads", filename.replace("\\", "/"))
+    upload_path = resolve_upload(filename)
 
-    if not os.path.exists(upload_path):
-        return f"<h4 class='text-danger'>❌ File tidak ditemukan:<br>{upload_path}</h4>"
+    if upload_path is None:
+        return f"<h4 class='text-danger'>❌ File tidak ditemukan:<br>{filename}</h4>"
 
     try:
-        pd.set_option("display.max_rows", None)
-        pd.set_option("display.max_columns", None)
-        df = pd.read_excel(upload_path)
-        df_html = df.to_html(classes="table table-bordered table-striped", index=False)
-        return render_template("preview_excel.html", table_html=df_html, filename=filename)
+        return _render_excel_preview("preview_excel.html", upload_path, filename)
     except Exception as e:
         return f"<h4 class='text-danger'>❌ Gagal membuka file Excel:<br>{e}</h4>"
 
@@ -306,43 +311,8 @@ def dashboard():
     if not user:
         return redirect(url_for("login"))
 
-    data = {}
-
-    with sqlite3.connect("sindi.db") as conn:
-        c = conn.cursor()
-        if user["role"] == "mdt":
-            c.execute("SELECT COUNT(*), SUM(status='Ditetapkan'), SUM(status='Menunggu') FROM pengajuan WHERE mdt_id=?", (user["id"],))
-            total, ditetapkan, menunggu = c.fetchone()
-            data = {
-                "pengajuan_total": total or 0,
-                "ditetapkan": ditetapkan or 0,
-                "menunggu": menunggu or 0
-            }
-
-        elif user["role"] == "kankemenag":
-            c.execute("SELECT COUNT(*), SUM(status='Menunggu'), SUM(status='Diverifikasi') FROM pengajuan")
-            total, menunggu, diverifikasi = c.fetchone()
-            data = {
-                "total": total or 0,
-                "menunggu": menunggu or 0,
-                "diverifikasi": diverifikasi or 0
-            }
-
-        elif user["role"] == "kanwil":
-            c.execute("SELECT COUNT(*), SUM(status='Ditetapkan') FROM pengajuan WHERE status IN ('Diverifikasi','Ditetapkan')")
-            total, ditetapkan = c.fetchone()
-            c.execute("SELECT COUNT(*) FROM nomor_ijazah")
-            total_santri = c.fetchone()[0]
-
-            total = total or 0
-            ditetapkan = ditetapkan or 0
-            data = {
-                "total": total,
-                "ditetapkan": ditetapkan,
-                "total_santri": total_santri or 0,
-                "menunggu": 0,
-                "diverifikasi": total - ditetapkan if total and ditetapkan is not None else 0
-            }
+    # counter status dimaterialisasi (services/statistik_service.py) + cache TTL
+    data = dashboard_counts(user["role"], user["id"])
 
     return render_template("dashboard.html", user=user, data=data)
 
@@ -358,7 +328,7 @@ def pengajuan_mdt():
     # --- Ambil data dropdown dari database ---
     kabupaten_list = list_kabupaten()
 
-    with sqlite3.connect(DB_NAME) as conn:
+    with db_connection() as conn:
         c = conn.cursor()
         c.execute("SELECT nama_jenjang FROM master_jenjang ORDER BY id ASC")
         jenjang_list = [r[0] for r in c.fetchall()]
@@ -380,31 +350,36 @@ def pengajuan_mdt():
             flash("Format file harus PDF/XLS/XLSX.", "danger")
             return redirect(url_for("pengajuan_mdt"))
 
-        filename = f"{user['kode_mdt']}_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}_{secure_filename(file.filename)}"
-        save_path = os.path.join(UPLOAD_DIR, filename)
-        file.save(save_path)
+        # Disimpan berbasis isi: unggah ulang file yang sama tidak menambah salinan
+        tersimpan = simpan_upload(file.stream, file.filename)
 
-        # Buat batch baru
-        nomor_batch = create_pengajuan_batch(
-            mdt_user=user,
-            nama_mdt=nama_mdt,
-            jenjang=jenjang,
-            tahun_pelajaran=tahun,
-            jumlah_lulus=jumlah,
-            file_lulusan_path=save_path
-        )
+        # Buat batch baru (baris santri di-stage sekali di sini)
+        try:
+            pengajuan_id, nomor_batch = create_pengajuan_batch(
+                mdt_user=user,
+                nama_mdt=nama_mdt,
+                jenjang=jenjang,
+                tahun_pelajaran=tahun,
+                jumlah_lulus=jumlah,
+                file_lulusan_path=tersimpan.kunci
+            )
+        except KolomTidakDitemukan as e:
+            if tersimpan.baru:
+                hapus_upload(tersimpan.kunci)
+            flash(f"❌ {e}", "danger")
+            return redirect(url_for("pengajuan_mdt"))
 
         # Simpan kabupaten di pengajuan
-        with sqlite3.connect(DB_NAME) as conn:
+        with db_connection() as conn:
             c = conn.cursor()
-            c.execute("UPDATE pengajuan SET kabupaten=? WHERE nomor_batch=?", (kabupaten, nomor_batch))
+            c.execute("UPDATE pengajuan SET kabupaten=? WHERE id=?", (kabupaten, pengajuan_id))
             conn.commit()
 
         flash(f"✅ Pengajuan terkirim. Nomor Batch: {nomor_batch}", "success")
         return redirect(url_for("pengajuan_mdt"))
 
     # --- Ambil daftar pengajuan yang sudah dikirim oleh MDT ini ---
-    pengajuans = list_pengajuan_batch_by_mdt(user["id"])
+    pengajuans = list_pengajuan_batch_by_mdt(user["id"], *_page_args())
 
     # --- Kirim semua data ke template ---
     return render_template(
@@ -421,7 +396,8 @@ def hasil_mdt():
     from services.mdt_service import list_hasil_penetapan
     user = current_user()
 
-    hasil_list = list_hasil_penetapan(kode_mdt=user["kode_mdt"])
+    cursor, per_page = _page_args()
+    hasil_list = list_hasil_penetapan(kode_mdt=user["kode_mdt"], cursor=cursor, per_page=per_page)
     return render_template("hasil_mdt.html", user=user, hasil_list=hasil_list)
 
 @app.route("/hasil_kanwil")
@@ -430,24 +406,48 @@ def hasil_kanwil():
     from services.mdt_service import list_hasil_penetapan
     user = current_user()
 
-    kabupaten_dipilih = request.args.get("kabupaten", "")
-    jenjang_dipilih = request.args.get("jenjang", "")
-
-    hasil_list = list_hasil_penetapan(kabupaten=kabupaten_dipilih or None, jenjang=jenjang_dipilih or None)
-
-    daftar_kabupaten = sorted({row["kabupaten"] for row in hasil_list if row["kabupaten"]})
-    daftar_jenjang = sorted({row["jenjang"] for row in hasil_list if row["jenjang"]})
+    # filter multi-nilai (?kabupaten=A&kabupaten=B) + rentang tanggal penetapan
+    filt = parse_filter(request.args)
+    cursor, per_page = _page_args()
+    hasil_list = list_hasil_penetapan(filt=filt, cursor=cursor, per_page=per_page)
 
     return render_template(
         "hasil_kanwil.html",
         user=user,
         hasil_list=hasil_list,
-        daftar_kabupaten=daftar_kabupaten,
-        daftar_jenjang=daftar_jenjang,
-        kabupaten_dipilih=kabupaten_dipilih,
-        jenjang_dipilih=jenjang_dipilih
+        facets=facet_hasil(filt),
+        filt=filt
     )
 
+@app.route("/hasil_kanwil/facets")
+@require_role(["kanwil", "admin"])
+def hasil_kanwil_facets():
+    """Nilai unik kabupaten/jenjang/tahun + jumlah batch untuk filter yang sedang aktif."""
+    filt = parse_filter(request.args)
+    return jsonify({
+        "filter": {k: (v.isoformat() if hasattr(v, "isoformat") else v) for k, v in filt.items()},
+        "facets": facet_hasil(filt),
+    })
+
+@app.route("/hasil_kanwil/export.<fmt>")
+@require_role(["kanwil", "admin"])
+def hasil_kanwil_export(fmt):
+    """
+    Rekap semua nomor ijazah sesuai filter hasil_kanwil. CSV dikirim streaming
+    sejak baris pertama; XLSX (zip, baru utuh setelah baris terakhir) dibuat
+    sebagai job di antrian dan diunduh dari halaman job, seperti zip PDF.
+    """
+    if fmt not in ("csv", "xlsx"):
+        abort(404)
+    filt = parse_filter(request.args)
+    if fmt == "xlsx":
+        job_id = enqueue_export_rekap_xlsx(filt, nama_file_rekap(filt, fmt), current_user()["username"])
+        return _respons_job_export(job_id)
+    resp = Response(stream_with_context(rekap_csv(filt)), mimetype="text/csv")
+    resp.headers["Content-Disposition"] = f"attachment; filename={nama_file_rekap(filt, fmt)}"
+    resp.headers["X-Accel-Buffering"] = "no"  # nginx: teruskan potongan tanpa menunggu selesai
+    return resp
+
 # ==============================
 #  KANKEMENAG: Verifikasi (unggah rekomendasi)
 # ==============================
@@ -466,9 +466,60 @@ def verifikasi_kemenag():
         flash(f"✅ Pengajuan berhasil diperbarui sebagai {status}.", "success")
         return redirect(url_for("verifikasi_kemenag"))
 
-    pengajuan_list = list_pengajuan_for_kemenag()
-    riwayat_list = list_riwayat_verifikasi_kemenag()
-    return render_template("verifikasi.html", user=user, pengajuan_list=pengajuan_list, riwayat_list=riwayat_list)
+    pengajuan_list = list_pengajuan_for_kemenag(*_page_args())
+    riwayat_list = list_riwayat_verifikasi_kemenag(*_page_args("riwayat_cursor"))
+    santri_info = ringkasan_santri([p[0] for p in pengajuan_list])
+    return render_template(
+        "verifikasi.html", user=user, pengajuan_list=pengajuan_list,
+        riwayat_list=riwayat_list, santri_info=santri_info
+    )
+
+
+@app.route("/verifikasi/bulk", methods=["POST"])
+@require_role("kankemenag")
+def verifikasi_bulk():
+    """
+    Verifikasi massal dalam satu transaksi.
+    JSON : {"items": [{"pengajuan_id": 1, "status": "Diverifikasi", "alasan": null}, ...]}
+    Form : pengajuan_id (berulang) + status + alasan (sama untuk semua yang dipilih)
+    """
+    from services.mdt_service import update_status_pengajuan_bulk, _status_final
+    user = current_user()
+
+    if request.is_json:
+        items = [
+            (i.get("pengajuan_id"), i.get("status"), i.get("alasan"))
+            for i in (request.get_json(silent=True) or {}).get("items", [])
+        ]
+    else:
+        status = request.form.get("status")
+        alasan = request.form.get("alasan", "").strip() or None
+        items = [(pid, status, alasan) for pid in request.form.getlist("pengajuan_id")]
+
+    try:
+        if any(_status_final(st) == "Ditolak" and not (al or "").strip() for _, st, al in items):
+            raise ValueError("Alasan wajib diisi untuk pengajuan yang ditolak.")
+        hasil = update_status_pengajuan_bulk(items, user["username"])
+    except (TypeError, ValueError) as e:
+        if request.is_json:
+            return jsonify({"error": str(e)}), 400
+        flash(f"❌ {e}", "danger")
+        return redirect(url_for("verifikasi_kemenag"))
+
+    if request.is_json:
+        return jsonify(hasil)
+    pesan = f"✅ {len(hasil['diperbarui'])} pengajuan berhasil diperbarui."
+    if hasil["dilewati"]:
+        pesan += f" {len(hasil['dilewati'])} dilewati (sudah diproses)."
+    flash(pesan, "success")
+    return redirect(url_for("verifikasi_kemenag"))
+
+
+@app.route("/pengajuan/<int:pengajuan_id>/nis_ganda")
+@require_role(["kankemenag", "kanwil", "admin"])
+def pengajuan_nis_ganda(pengajuan_id):
+    """NIS ganda dalam batch / sudah punya nomor ijazah (dari staging santri_lulusan)."""
+    return jsonify(nis_ganda(pengajuan_id))
 
 
 @app.route("/riwayat_verifikasi")
@@ -476,7 +527,7 @@ def verifikasi_kemenag():
 def riwayat_verifikasi():
     from services.mdt_service import list_riwayat_verifikasi_kemenag
     user = current_user()
-    riwayat_list = list_riwayat_verifikasi_kemenag()
+    riwayat_list = list_riwayat_verifikasi_kemenag(*_page_args())
     return render_template("riwayat_verifikasi.html", user=user, riwayat_list=riwayat_list)
 
 # ==============================
@@ -485,166 +536,216 @@ def riwayat_verifikasi():
 @app.route("/penetapan", methods=["GET", "POST"])
 @require_role(["kanwil", "admin"])
 def penetapan_kanwil():
-    from services.mdt_service import list_pengajuan_for_kanwil, tetapkan_pengajuan, list_kabupaten
+    from services.mdt_service import list_pengajuan_for_kanwil, list_kabupaten
 
     if request.method == "POST":
         pengajuan_id = request.form.get("pengajuan_id")
-        tetapkan_pengajuan(pengajuan_id)
-        flash("✅ Nomor Ijazah berhasil ditetapkan.", "success")
-        return redirect(url_for("penetapan_kanwil"))
+        job_id = enqueue_penetapan(pengajuan_id, current_user()["username"])
 
-    kab_filter = request.args.get("kabupaten")
-    jenjang_filter = request.args.get("jenjang")
-
-    query = """
-        SELECT id, nomor_batch, nama_mdt, jenjang, tahun_pelajaran, jumlah_lulus,
-               file_lulusan, status, kabupaten, alasan, verifikator, tanggal_verifikasi
-        FROM pengajuan
-        WHERE status = 'Diverifikasi'
-    """
-    params = []
-
-    if kab_filter:
-        query += " AND kabupaten=?"
-        params.append(kab_filter)
-    if jenjang_filter:
-        query += " AND jenjang=?"
-        params.append(jenjang_filter)
-
-    query += " ORDER BY id DESC"
+        # fetch() dari penetapan.html → JSON; form biasa → redirect
+        if request.accept_mimetypes.best == "application/json":
+            return jsonify({"job_id": job_id, "status_url": url_for("penetapan_job_status", job_id=job_id)}), 202
+        flash(f"⏳ Penetapan sedang diproses (job #{job_id}).", "info")
+        return redirect(url_for("penetapan_kanwil"))
 
-    with sqlite3.connect(DB_NAME) as conn:
-        c = conn.cursor()
-        c.execute(query, params)
-        pengajuan_list = c.fetchall()
+    pengajuan_list = list_pengajuan_for_kanwil(
+        request.args.get("kabupaten") or None, request.args.get("jenjang") or None, *_page_args()
+    )
 
     daftar_kabupaten = [(i+1, k) for i, k in enumerate(list_kabupaten())]
     return render_template("penetapan.html",
                            user=current_user(),
                            pengajuan_list=pengajuan_list,
-                           daftar_kabupaten=daftar_kabupaten)
+                           daftar_kabupaten=daftar_kabupaten,
+                           job_aktif=list_active_jobs())
+
+@app.route("/penetapan/massal", methods=["POST"])
+@require_role(["kanwil", "admin"])
+def penetapan_massal():
+    """Tetapkan banyak pengajuan sekaligus: daftar id terpilih dan/atau filter kabupaten/jenjang."""
+    data = request.get_json(silent=True) or {}
+    pengajuan_ids = data.get("pengajuan_ids") or request.form.getlist("pengajuan_ids")
+    kabupaten = data.get("kabupaten") or request.form.get("kabupaten") or None
+    jenjang = data.get("jenjang") or request.form.get("jenjang") or None
+
+    try:
+        pengajuan_ids = [int(i) for i in pengajuan_ids]
+    except (TypeError, ValueError):
+        return jsonify({"error": "pengajuan_ids harus berupa daftar angka."}), 400
+
+    job_id = enqueue_penetapan_massal(pengajuan_ids, kabupaten, jenjang, current_user()["username"])
+
+    if request.is_json or request.accept_mimetypes.best == "application/json":
+        return jsonify({"job_id": job_id, "status_url": url_for("penetapan_job_status", job_id=job_id)}), 202
+    flash(f"⏳ Penetapan massal sedang diproses (job #{job_id}).", "info")
+    return redirect(url_for("penetapan_kanwil", kabupaten=kabupaten or "", jenjang=jenjang or ""))
+
+@app.route("/penetapan/job/<int:job_id>")
+@require_role(["kanwil", "admin"])
+def penetapan_job_status(job_id):
+    job = get_job(job_id)
+    if not job:
+        return jsonify({"error": "Job tidak ditemukan."}), 404
+    return jsonify(job)
 
 @app.route("/hasil/download/<path:filename>")
 def download_hasil(filename):
-    from flask import send_from_directory
-    hasil_dir = os.path.join(os.getcwd(), "hasil_excel")
-    return send_from_directory(hasil_dir, filename, as_attachment=True)
+    hasil = _file_hasil(filename)
+    if hasil is None:
+        abort(404)
+    path, nama = hasil
+    return kirim_file(path, download_name=nama, as_attachment=True)
 
 @app.route("/penetapan/export/<string:mode>/<int:pengajuan_id>")
-@require_role("kanwil")
+@require_role(["kanwil", "admin"])
 def export_penetapan(mode, pengajuan_id):
-    filename = f"hasil_penetapan_{pengajuan_id}"
+    # file jadi di-cache per (pengajuan, versi isi) oleh export_service
     try:
         if mode == "excel":
-            file_path = os.path.join(UPLOAD_DIR, f"{filename}.xlsx")
-            export_nomor_ijazah_excel(pengajuan_id, file_path)
+            hasil = export_hasil(pengajuan_id)
         elif mode == "pdf":
-            file_path = os.path.join(UPLOAD_DIR, f"{filename}.pdf")
-            export_nomor_ijazah_pdf(pengajuan_id, file_path)
+            hasil = export_pdf(pengajuan_id)
         else:
             flash("Format export tidak valid.", "danger")
             return redirect(url_for("penetapan_kanwil"))
 
-        return send_file(file_path, as_attachment=True)
+        if hasil is None:
+            flash("Pengajuan belum ditetapkan.", "warning")
+            return redirect(url_for("hasil_kanwil"))
+        path, nama = hasil
+        return kirim_file(path, download_name=nama, as_attachment=True)
 
     except Exception as e:
         flash(f"❌ Gagal export data: {e}", "danger")
         return redirect(url_for("penetapan_kanwil"))
 
+@app.route("/hasil_kanwil/export_pdf.zip")
+@require_role(["kanwil", "admin"])
+def hasil_kanwil_export_pdf():
+    """
+    PDF daftar nomor ijazah semua pengajuan sesuai filter hasil_kanwil dalam
+    satu zip. Render ratusan PDF terlalu lama untuk satu request, jadi dibuat
+    sebagai job di antrian penetapan; halaman job mengunduh zip saat selesai.
+    """
+    filt = parse_filter(request.args)
+    ids = select_hasil_ids(filt, batas=PDF_ZIP_MAX + 1)
+    if not ids:
+        flash("Tidak ada hasil penetapan sesuai filter.", "warning")
+        return redirect(url_for("hasil_kanwil", **request.args.to_dict(flat=False)))
+    if len(ids) > PDF_ZIP_MAX:
+        flash(f"⚠️ Maksimal {PDF_ZIP_MAX} batch per unduhan zip, persempit filter.", "warning")
+        return redirect(url_for("hasil_kanwil", **request.args.to_dict(flat=False)))
+
+    job_id = enqueue_export_pdf_zip(ids, nama_file_rekap(filt, "zip"), current_user()["username"])
+    return _respons_job_export(job_id)
+
+def _respons_job_export(job_id):
+    """202 + URL status/unduh untuk klien JSON, selain itu redirect ke halaman job."""
+    if request.accept_mimetypes.best == "application/json":
+        return jsonify({"job_id": job_id, "status_url": url_for("penetapan_job_status", job_id=job_id),
+                        "download_url": url_for("hasil_kanwil_export_job", job_id=job_id)}), 202
+    return redirect(url_for("hasil_kanwil_export_job", job_id=job_id))
+
+@app.route("/hasil_kanwil/export_job/<int:job_id>")
+@require_role(["kanwil", "admin"])
+def hasil_kanwil_export_job(job_id):
+    """File hasil job export (zip PDF / rekap xlsx) bila sudah selesai, selain itu halaman progres."""
+    job = get_job(job_id)
+    if not job or job["jenis"] not in JENIS_EXPORT:
+        abort(404)
+    if job["status"] == "gagal":
+        flash(f"❌ Export gagal: {job['pesan']}", "danger")
+        return redirect(url_for("hasil_kanwil"))
+    if job["status"] != "selesai":
+        return render_template("export_job.html", user=current_user(), job=job)
+
+    if not job["hasil_file"] or not os.path.isfile(job["hasil_file"]):
+        flash("⚠️ File export sudah kedaluwarsa, silakan export ulang.", "warning")
+        return redirect(url_for("hasil_kanwil"))
+    laporan = job["laporan"] or {}
+    if laporan.get("gagal"):
+        app.logger.warning("Export PDF job %s: %s PDF gagal dirender: %s",
+                           job_id, laporan["gagal"], laporan.get("detail_gagal"))
+    return kirim_file(job["hasil_file"], download_name=(job["parameter"] or {}).get("nama_file"),
+                      as_attachment=True)
+
 # ==============================
 #  MDT: Lihat Hasil Penetapan
 # ==============================
 @app.route("/hasil")
 @require_role(["mdt", "kanwil"])
 def hasil():
-    from services.mdt_service import get_nomor_ijazah_by_pengajuan
+    from services.mdt_service import list_pengajuan_ditetapkan, get_nomor_ijazah_by_pengajuan_ids
     user = current_user()
 
-    with sqlite3.connect(DB_NAME) as conn:
-        c = conn.cursor()
+    # === PAGINATION (per batch pengajuan, keyset) ===
+    cursor, per_page = _page_args()
+    pengajuan_list = list_pengajuan_ditetapkan(
+        mdt_id=user["id"] if user["role"] == "mdt" else None,
+        cursor=cursor, per_page=per_page or 10,
+    )
 
-        if user["role"] == "mdt":
-            c.execute("""
-                SELECT id, nomor_batch, nama_mdt, status, tahun_pelajaran, jenjang
-                FROM pengajuan WHERE mdt_id=? AND status='Ditetapkan' ORDER BY id DESC
-            """, (user["id"],))
-        else:  # Kanwil
-            c.execute("""
-                SELECT id, nomor_batch, nama_mdt, status, tahun_pelajaran, jenjang
-                FROM pengajuan WHERE status='Ditetapkan' ORDER BY id DESC
-            """)
+    # satu query untuk semua nomor ijazah di halaman ini (bukan satu query per batch)
+    nomor = get_nomor_ijazah_by_pengajuan_ids([p[0] for p in pengajuan_list])
+    results = [(p, nomor[p[0]]) for p in pengajuan_list if nomor[p[0]]]
+
+    return render_template("hasil.html", user=user, results=results, page=pengajuan_list)
 
-        pengajuan_list = c.fetchall()
+@app.route("/cari_ijazah")
+@require_role(["mdt", "kanwil", "admin"])
+def cari_ijazah_route():
+    """Cari nomor ijazah per nama santri / NIS / nomor (awalan + toleran salah ketik), JSON."""
+    user = current_user()
+    hasil = cari_ijazah(
+        request.args.get("q", ""),
+        limit=request.args.get("limit", type=int),
+        mdt_id=user["id"] if user["role"] == "mdt" else None,
+    )
+    return jsonify({"q": request.args.get("q", ""), "hasil": hasil})
 
-    results = []
-    for p in pengajuan_list:
-        data = get_nomor_ijazah_by_pengajuan(p[0])
-        if data:
-            results.append((p, data))
+# ==============================
+#  PUBLIK: Verifikasi Nomor Ijazah (tanpa login)
+# ==============================
+@app.route("/api/verifikasi")
+@app.route("/api/verifikasi/<path:nomor>")
+@rate_limited
+def verifikasi_publik(nomor=None):
+    nomor = normalisasi_nomor(nomor or request.args.get("nomor"))
+    if not nomor:
+        return jsonify({"valid": False, "error": "Format nomor ijazah tidak dikenal."}), 400
+
+    data = cek_nomor(nomor)
+    if data is None:
+        resp = jsonify({"valid": False, "nomor_ijazah": nomor})
+        resp.status_code = 404
+    else:
+        resp = jsonify({"valid": True, "data": data})
+    resp.headers["Cache-Control"] = "public, max-age=60"
+    return resp
 
-    return render_template("hasil.html", user=user, results=results)
-    
 @app.route("/uploads/<path:filename>")
 def serve_upload(filename):
-    filepath = os.path.join(UPLOAD_DIR, filename)
-    if not os.path.isfile(filepath):
-        return f"<h4 class='text-danger'>❌ File tidak ditemukan: {filepath}</h4>", 404
-    return send_file(filepath, as_attachment=False)
-
-
-def list_hasil_penetapan(kode_mdt=None, kabupaten=None, jenjang=None):
-    conn = conn()
-    c = conn.cursor()
-    query = """
-        SELECT 
-            p.id, p.nama_mdt, p.jenjang, p.tahun_pelajaran, 
-            p.jumlah_lulus, p.kabupaten, p.nomor_batch, 
-            COALESCE(p.file_hasil, p.file_lulusan) AS file_path
-        FROM pengajuan p
-        WHERE p.status = 'Ditetapkan'
-        ORDER BY p.id DESC
-    """
-    c.execute(query)
-    rows = c.fetchall()
-    conn.close()
-
-    hasil = []
-    for r in rows:
-        hasil.append({
-            "id": r[0],
-            "nama_mdt": r[1],
-            "jenjang": r[2],
-            "tahun": r[3],
-            "jumlah": r[4],
-            "kabupaten": r[5],
-            "batch": r[6],
-            "file_path": r[7] or ""
-        })
-    return hasil
-
-@app.route("/uploads/<filename>")
-def uploads(filename):
-    filepath = os.path.join("/tmp/uploads", filename)
-    if not os.path.exists(filepath):
-        return f"<h4 class='text-danger'>❌ File tidak ditemukan: {filepath}</h4>", 404
-    return send_file(filepath, as_attachment=False)
+    filepath = resolve_upload(filename)
+    if filepath is None:
+        return f"<h4 class='text-danger'>❌ File tidak ditemukan: {filename}</h4>", 404
+    return kirim_file(filepath)
 
 
 @app.route("/hasil_excel/<path:filename>")
 def hasil_excel(filename):
-    filepath = os.path.join(HASIL_DIR, filename)
-    if not os.path.isfile(filepath):
-        return f"<h4 class='text-danger'>❌ File tidak ditemukan: {filepath}</h4>", 404
-    return send_file(filepath, as_attachment=False)
+    hasil = _file_hasil(filename)
+    if hasil is None:
+        return f"<h4 class='text-danger'>❌ File tidak ditemukan: {filename}</h4>", 404
+    path, nama = hasil
+    return kirim_file(path, download_name=nama)
 
 @app.route("/preview-file/<path:filename>")
 def preview_file(filename):
-    uploads_dir = os.path.join(os.getcwd(), "uploads")
-    file_path = os.path.join(uploads_dir, filename)
+    file_path = resolve_upload(filename)
 
-    print(f"🔍 Preview request for: {file_path}")  # <-- Tambahkan ini di sini
+    print(f"🔍 Preview request for: {filename} → {file_path}")
 
-    if not os.path.isfile(file_path):
+    if file_path is None:
         print("❌ File tidak ditemukan.")
         return "<div class='alert alert-danger p-3'>❌ File tidak ditemukan.</div>"
 
@@ -653,13 +754,7 @@ def preview_file(filename):
     # ✅ Jika Excel: render ke tabel HTML
     if ext in ["xlsx", "xls"]:
         try:
-            df = pd.read_excel(file_path)
-            html_table = df.to_html(
-                index=False,
-                classes="table table-bordered table-striped table-sm align-middle",
-                border=0
-            )
-            return render_template("lihat_file_modal.html", filename=filename, table_html=html_table)
+            return _render_excel_preview("lihat_file_modal.html", file_path, filename)
         except Exception as e:
             return f"<div class='alert alert-danger p-3'>Gagal membaca Excel: {e}</div>"
 
@@ -682,25 +777,16 @@ def preview_file(filename):
 @app.route("/preview_excel/<path:filename>")
 def preview_excel(filename):
     from urllib.parse import unquote
-    import pandas as pd
 
     filename = unquote(filename)
-    hasil_dir = os.path.join(os.getcwd(), "hasil_excel")
-    uploads_dir = os.path.join(os.getcwd(), "uploads")
-
-    hasil_path = os.path.join(hasil_dir, filename)
-    upload_path = os.path.join(uploads_dir, filename)
-
-    if os.path.exists(hasil_path):
-        file_path = hasil_path
-    elif os.path.exists(upload_path):
-        file_path = upload_path
-    else:
+    file_path = _preview_path(filename)
+    if file_path is None:
         return f"<h4 class='text-danger'>❌ File tidak ditemukan:<br>{filename}</h4>"
 
-    df = pd.read_excel(file_path)
-    df_html = df.to_html(classes="table table-bordered table-striped", index=False)
-    return render_template("preview_excel.html", table_html=df_html, filename=filename)
+    try:
+        return _render_excel_preview("preview_excel.html", file_path, filename)
+    except Exception as e:
+        return f"<h4 class='text-danger'>❌ Gagal membuka file Excel:<br>{e}</h4>"
 
 
 # ==============================
@@ -710,8 +796,6 @@ def preview_excel(filename):
 @app.route("/admin/users", methods=["GET", "POST"])
 @require_role(["kanwil", "admin"])
 def admin_users():
-    import math
-
     # === FORM SUBMIT TAMBAH USER ===
     if request.method == "POST":
         username = request.form.get("username", "").strip()
@@ -724,56 +808,28 @@ def admin_users():
         flash(msg, "success" if ok else "danger")
         return redirect(url_for("admin_users"))
 
-    # === PAGINATION ===
-    page = int(request.args.get("page", 1))
-    per_page = 50  # tampilkan 50 user per halaman
-    offset = (page - 1) * per_page
-
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-
-    # total data
-    c.execute("SELECT COUNT(*) FROM users")
-    total = c.fetchone()[0]
-
-    # ambil hanya data di halaman ini
-    c.execute("""
-        SELECT id, username, password, role, kode_mdt, wilayah
-        FROM users
-        ORDER BY id DESC
-        LIMIT ? OFFSET ?
-    """, (per_page, offset))
-    users = c.fetchall()
-    conn.close()
-
-    total_pages = math.ceil(total / per_page)
+    # === PAGINATION (keyset) ===
+    cursor, per_page = _page_args()
+    with db_connection() as conn:
+        users = keyset_page(conn, """
+            SELECT id, username, password, role, kode_mdt, wilayah
+            FROM users
+        """, cursor=cursor, per_page=per_page)
 
     return render_template(
         "users.html",
         users=users,
         user=current_user(),
-        page=page,
-        total_pages=total_pages,
-        total=total
+        page=users
     )
 
 @app.route("/admin/log")
 @require_role("admin")
 def admin_log():
-    conn = sqlite3.connect(DB_NAME)
+    conn = db_connection()
     c = conn.cursor()
     
-    # pastikan tabel log_aktivitas ada
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS log_aktivitas (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT,
-        aksi TEXT,
-        waktu TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
-    
-    # ambil data log terbaru
+    # ambil data log terbaru (tabel dibuat oleh migrasi)
     c.execute("SELECT username, aksi, waktu FROM log_aktivitas ORDER BY waktu DESC LIMIT 200")
     data = c.fetchall()
     conn.close()
@@ -783,7 +839,7 @@ def admin_log():
 @app.route("/admin/kabupaten", methods=["GET", "POST"])
 @require_role("admin")
 def admin_kabupaten():
-    conn = sqlite3.connect(DB_NAME)
+    conn = db_connection()
     c = conn.cursor()
 
     if request.method == "POST":
@@ -791,8 +847,8 @@ def admin_kabupaten():
         provinsi = "Jawa Barat"
         if nama_kabupaten:
             c.execute("""
-                INSERT OR IGNORE INTO master_kabupaten (nama_kabupaten, provinsi)
-                VALUES (?, ?)
+                INSERT INTO master_kabupaten (nama_kabupaten, provinsi)
+                VALUES (?, ?) ON CONFLICT DO NOTHING
             """, (nama_kabupaten, provinsi))
             conn.commit()
             flash("✅ Kabupaten/Kota berhasil ditambahkan.", "success")
@@ -810,10 +866,8 @@ def admin_kabupaten():
 @app.route("/admin/reset-password/<int:user_id>", methods=["POST"])
 @require_role(["admin", "kanwil"])
 def reset_password(user_id):
-    import sqlite3
-
     new_password = "123"  # default reset password
-    with sqlite3.connect(DB_NAME) as conn:
+    with db_connection() as conn:
         c = conn.cursor()
         c.execute("UPDATE users SET password=? WHERE id=?", (new_password, user_id))
         conn.commit()
@@ -825,7 +879,7 @@ def reset_password(user_id):
 
     # catat aktivitas reset password
     try:
-        with sqlite3.connect(DB_NAME) as conn:
+        with db_connection() as conn:
             c = conn.cursor()
             c.execute("""
                 INSERT INTO log_aktivitas (username, aksi)
@@ -838,14 +892,6 @@ def reset_password(user_id):
     flash(f"🔑 Password user '{username}' telah direset ke default (123).", "info")
     return redirect(url_for("admin_users"))
 
-@app.route("/hasil")
-@require_role(["mdt", "kanwil"])
-def hasil_view():
-    from services.mdt_service import list_hasil_penetapan_by_role
-    user = current_user()
-    hasil = list_hasil_penetapan_by_role(user["role"])
-    return render_template("hasil.html", user=user, hasil=hasil)
-
 import logging
 from logging import StreamHandler
 
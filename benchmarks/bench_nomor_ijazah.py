@@ -0,0 +1,114 @@
+# benchmarks/bench_nomor_ijazah.py
+"""
+Benchmark penomoran ijazah: loop df.iterrows() lama vs penetapan sekarang.
+
+- iterrows : salinan loop lama generate_nomor_ijazah_batch — satu tuple Python
+  per santri dari DataFrame, lalu executemany ke nomor_ijazah (transaksinya
+  di-rollback setelah diukur, jadi tidak meninggalkan nomor);
+- sekarang : generate_nomor_ijazah_batch ujung ke ujung (klaim pengajuan +
+  pesan blok nomor + INSERT ... SELECT dari santri_lulusan + commit).
+
+Keduanya mulai dari data yang sudah di memori/di-stage; membaca Excel tidak
+ikut diukur. Benchmark memakai database SQLite dan folder upload sementara
+sendiri; untuk tiap ukuran file Excel ditulis, disimpan lewat
+services/storage.py, dan di-stage dengan create_pengajuan_batch seperti
+upload MDT.
+
+    python benchmarks/bench_nomor_ijazah.py            # 1k, 10k, 100k baris
+    python benchmarks/bench_nomor_ijazah.py 5000 50000
+"""
+import os, sys, time, tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# database & folder upload sementara — harus diset sebelum services diimpor
+_TMP = tempfile.mkdtemp(prefix="bench_nomor_")
+os.environ["SINDI_DB_PATH"] = os.path.join(_TMP, "bench.db")
+os.environ["UPLOAD_ROOT"] = os.path.join(_TMP, "uploads")
+os.environ["PARSED_CACHE_DIR"] = os.path.join(_TMP, "cache")
+
+import pandas as pd
+from openpyxl import Workbook
+
+from services.migrations import ensure_schema
+from services.repository import get_repository
+from services.storage import simpan_path
+from services.nomor_sequence import kode_jenjang, PREFIX_NOMOR, PANJANG_URUT
+from services.mdt_service import create_pengajuan_batch, generate_nomor_ijazah_batch
+
+JENJANG, TAHUN = "Ulya", "2024/2025"
+MDT = {"id": 1, "kode_mdt": "BENCH", "wilayah": "Bench"}
+
+
+def _tulis_excel(n):
+    path = os.path.join(_TMP, f"lulusan_{n}.xlsx")
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(["Nama Santri", "Nomor Induk Santri"])
+    for i in range(n):
+        ws.append([f"Santri {i}", str(100000 + i)])
+    wb.save(path)
+    return path
+
+
+def _siapkan(n):
+    """Upload & stage pengajuan berisi n santri, status Diverifikasi → (id, path Excel)."""
+    path = _tulis_excel(n)
+    pengajuan_id, _ = create_pengajuan_batch(MDT, f"MDT {n}", JENJANG, TAHUN, n, simpan_path(path).kunci)
+    with get_repository().connection() as conn:
+        conn.cursor().execute("UPDATE pengajuan SET status='Diverifikasi' WHERE id=?", (pengajuan_id,))
+        conn.commit()
+    return pengajuan_id, path
+
+
+def cara_lama(pengajuan_id, df):
+    """Loop iterrows lama + executemany; diukur sampai sebelum rollback."""
+    kode = kode_jenjang(JENJANG)
+    with get_repository().connection() as conn:
+        c = conn.cursor()
+        t0 = time.perf_counter()
+        nomor_list = []
+        for i, row in df.iterrows():
+            urut = str(i + 1).zfill(PANJANG_URUT)
+            no_ijazah = f"{PREFIX_NOMOR}-{kode}-LAMA-{urut}"
+            nomor_list.append((pengajuan_id, row["nama_santri"], str(row["nomor_induk_santri"]), no_ijazah, TAHUN, JENJANG))
+        df["Nomor Ijazah"] = [n[3] for n in nomor_list]
+        c.executemany("""
+            INSERT INTO nomor_ijazah (pengajuan_id, nama_santri, nis, nomor_ijazah, tahun, jenjang)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, nomor_list)
+        durasi = time.perf_counter() - t0
+        conn.rollback()
+    return durasi
+
+
+def cara_sekarang(pengajuan_id):
+    t0 = time.perf_counter()
+    generate_nomor_ijazah_batch(pengajuan_id)
+    return time.perf_counter() - t0
+
+
+def _jumlah_nomor(pengajuan_id):
+    with get_repository().connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT COUNT(*) FROM nomor_ijazah WHERE pengajuan_id=?", (pengajuan_id,))
+        return c.fetchone()[0]
+
+
+def main(ukuran):
+    ensure_schema(verbose=False)
+    print(f"{'baris':>8} | {'iterrows (s)':>12} | {'sekarang (s)':>12} | {'speedup':>7}")
+    print("-" * 50)
+    for n in ukuran:
+        pengajuan_id, path = _siapkan(n)
+        df = pd.read_excel(path)
+        df.columns = [str(col).strip().lower().replace(" ", "_") for col in df.columns]
+
+        t_lama = cara_lama(pengajuan_id, df)
+        t_baru = cara_sekarang(pengajuan_id)
+        assert _jumlah_nomor(pengajuan_id) == n, "jumlah nomor terbit tidak sama dengan jumlah santri"
+        print(f"{n:>8} | {t_lama:>12.4f} | {t_baru:>12.4f} | {t_lama / t_baru:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [1000, 10000, 100000])
@@ -0,0 +1,127 @@
+# benchmarks/bench_sqlite_concurrency.py
+"""
+Benchmark konkurensi SQLite: throughput pembaca selama transaksi penetapan
+(tulis besar) sedang berjalan, profil lama (rollback journal) vs profil
+SQLITE_PRAGMAS di services/db_pool.py (WAL dst).
+
+Penulis meniru generate_nomor_ijazah_batch: satu transaksi INSERT nomor_ijazah
+sebanyak N baris (dibagi per potongan dengan jeda kecil, supaya transaksi
+"panjang" seperti saat Excel dibaca). Pembaca meniru halaman daftar/dashboard:
+query keyset pengajuan + hitung nomor per pengajuan.
+
+    python benchmarks/bench_sqlite_concurrency.py              # 200k baris, 4 pembaca
+    python benchmarks/bench_sqlite_concurrency.py 500000 8
+
+Catatan membaca hasil: pada mesin dengan sedikit core, "tulis(s)" profil WAL
+bisa lebih lama justru karena pembaca tetap jalan dan berbagi CPU dengan
+penulis; tanpa pembaca (argumen kedua 0) WAL menulis lebih cepat.
+"""
+import os, sys, time, sqlite3, tempfile
+import multiprocessing as mp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.db_pool import apply_sqlite_profile, SQLITE_PRAGMAS
+
+PROFIL = {
+    "lama (DELETE journal)": {"journal_mode": "DELETE", "synchronous": "FULL", "busy_timeout": 2000},
+    "WAL (SQLITE_PRAGMAS)": dict(SQLITE_PRAGMAS, busy_timeout=2000),
+}
+POTONGAN = 5000
+JEDA = 0.005
+
+
+def _siapkan(path, jumlah_pengajuan=2000):
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE pengajuan (id INTEGER PRIMARY KEY, nama_mdt TEXT, status TEXT);
+        CREATE INDEX idx_pengajuan_status ON pengajuan (status, id);
+        CREATE TABLE nomor_ijazah (id INTEGER PRIMARY KEY, pengajuan_id INTEGER,
+                                   nama_santri TEXT, nis TEXT, nomor_ijazah TEXT);
+        CREATE INDEX idx_nomor_ijazah_pengajuan ON nomor_ijazah (pengajuan_id, id);
+    """)
+    conn.executemany("INSERT INTO pengajuan (nama_mdt, status) VALUES (?, ?)",
+                     [(f"MDT {i}", "Ditetapkan" if i % 2 else "Menunggu") for i in range(jumlah_pengajuan)])
+    conn.commit()
+    conn.close()
+
+
+def _penulis(path, pragmas, jumlah, hasil):
+    conn = apply_sqlite_profile(sqlite3.connect(path, timeout=30), pragmas)
+    t0 = time.perf_counter()
+    c = conn.cursor()
+    c.execute("BEGIN IMMEDIATE")
+    for awal in range(0, jumlah, POTONGAN):
+        c.executemany(
+            "INSERT INTO nomor_ijazah (pengajuan_id, nama_santri, nis, nomor_ijazah) VALUES (?, ?, ?, ?)",
+            [(1 + i % 1000, f"Santri {i}", str(100000 + i), f"MDT-12-01-2024/2025-{i:06d}")
+             for i in range(awal, min(awal + POTONGAN, jumlah))],
+        )
+        time.sleep(JEDA)
+    conn.commit()
+    hasil.put(time.perf_counter() - t0)
+    conn.close()
+
+
+def _pembaca(path, pragmas, mulai, selesai, hasil):
+    conn = apply_sqlite_profile(sqlite3.connect(path, timeout=2), pragmas)
+    ok, gagal, latensi = 0, 0, []
+    mulai.wait()
+    while not selesai.is_set():
+        t0 = time.perf_counter()
+        try:
+            conn.execute("SELECT id, nama_mdt FROM pengajuan WHERE status=? ORDER BY id DESC LIMIT 50",
+                         ("Ditetapkan",)).fetchall()
+            conn.execute("SELECT COUNT(*) FROM nomor_ijazah WHERE pengajuan_id=?", (7,)).fetchone()
+            ok += 1
+            latensi.append(time.perf_counter() - t0)
+        except sqlite3.OperationalError:  # "database is locked"
+            gagal += 1
+    conn.close()
+    hasil.put((ok, gagal, latensi))
+
+
+def jalankan(nama, pragmas, jumlah, jumlah_pembaca):
+    folder = tempfile.mkdtemp()
+    path = os.path.join(folder, "bench.db")
+    _siapkan(path)
+    apply_sqlite_profile(sqlite3.connect(path), pragmas).close()  # journal_mode persisten di file
+
+    # proses terpisah (bukan thread) supaya GIL tidak ikut mengatur giliran
+    mulai, selesai = mp.Event(), mp.Event()
+    antrian_baca, antrian_tulis = mp.Queue(), mp.Queue()
+    pembaca = [mp.Process(target=_pembaca, args=(path, pragmas, mulai, selesai, antrian_baca))
+               for _ in range(jumlah_pembaca)]
+    for p in pembaca:
+        p.start()
+    penulis = mp.Process(target=_penulis, args=(path, pragmas, jumlah, antrian_tulis))
+    mulai.set()
+    penulis.start()
+    detik = antrian_tulis.get()
+    penulis.join()
+    selesai.set()
+    hasil = {"ok": 0, "gagal": 0, "latensi": []}
+    for _ in pembaca:
+        ok, gagal, latensi = antrian_baca.get()
+        hasil["ok"] += ok
+        hasil["gagal"] += gagal
+        hasil["latensi"].extend(latensi)
+    for p in pembaca:
+        p.join()
+
+    lat = sorted(hasil["latensi"]) or [0.0]
+    p99 = lat[min(len(lat) - 1, int(len(lat) * 0.99))]
+    print(f"{nama:<24} | {detik:>8.2f} | {hasil['ok'] / detik:>10.0f} | {hasil['gagal']:>6} | {p99 * 1000:>8.1f}")
+
+
+def main(jumlah, jumlah_pembaca):
+    print(f"penetapan {jumlah} baris, {jumlah_pembaca} pembaca")
+    print(f"{'profil':<24} | {'tulis(s)':>8} | {'baca/detik':>10} | {'locked':>6} | {'p99(ms)':>8}")
+    print("-" * 70)
+    for nama, pragmas in PROFIL.items():
+        jalankan(nama, pragmas, jumlah, jumlah_pembaca)
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(args[0] if args else 200_000, args[1] if len(args) > 1 else 4)
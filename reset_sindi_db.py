@@ -98,38 +98,6 @@ CREATE TABLE IF NOT EXISTS riwayat_verifikasi (
 )
 """)
 
-# =========================
-# 🧩 TRIGGER OTOMATIS
-# =========================
-c.execute("""
-CREATE TRIGGER IF NOT EXISTS after_pengajuan_status_update
-AFTER UPDATE OF status ON pengajuan
-BEGIN
-    INSERT INTO riwayat_verifikasi (
-        pengajuan_id,
-        nama_mdt,
-        jenjang,
-        tahun_pelajaran,
-        jumlah_lulus,
-        status,
-        alasan,
-        verifikator,
-        tanggal_verifikasi
-    )
-    VALUES (
-        NEW.id,
-        NEW.nama_mdt,
-        NEW.jenjang,
-        NEW.tahun_pelajaran,
-        NEW.jumlah_lulus,
-        NEW.status,
-        NEW.alasan,
-        NEW.verifikator,
-        datetime('now', 'localtime')
-    );
-END;
-""")
-
 conn.commit()
 
 # =========================
@@ -162,6 +130,12 @@ for u in users:
     c.execute("INSERT INTO users (username, password, role, kode_mdt, wilayah) VALUES (?, ?, ?, ?, ?)", u)
 
 conn.commit()
+
+# =========================
+# 🧭 MIGRASI SKEMA (index & tabel tambahan)
+# =========================
+from services.migrations import run_migrations
+run_migrations(conn)
 conn.close()
 
 print("✅ Database 'sindi.db' berhasil dibuat ulang dan siap digunakan untuk aplikasi SINDI.")
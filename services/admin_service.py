@@ -1,9 +1,10 @@
-import sqlite3
+from services.db_pool import DB_PATH
+from services.repository import get_repository
 
-DB_NAME = "sindi.db"
+DB_NAME = DB_PATH
 
 def _conn():
-    return sqlite3.connect(DB_NAME)
+    return get_repository().connection()
 
 def list_users():
     with _conn() as conn:
@@ -22,5 +23,5 @@ def create_user(username, password, role, kode_mdt=None, wilayah=None):
                       (username, password, role, kode_mdt, wilayah))
             conn.commit()
         return True, f"User '{username}' berhasil dibuat."
-    except sqlite3.IntegrityError:
+    except get_repository().IntegrityError:
         return False, "Username sudah ada."
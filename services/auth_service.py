@@ -1,15 +1,17 @@
 from flask import session, redirect, url_for, flash
 import sqlite3
 from functools import wraps
+from services.db_pool import DB_PATH
+from services.repository import get_repository
 
-DB_NAME = "sindi.db"
+DB_NAME = DB_PATH
 
 # ==========================
 # 🔐 LOGIN SYSTEM
 # ==========================
 
 def login_user(username, password):
-    conn = sqlite3.connect(DB_NAME)
+    conn = get_repository().connection()
     c = conn.cursor()
     c.execute("SELECT id, username, password, role, kode_mdt, wilayah FROM users WHERE username=?", (username,))
     row = c.fetchone()
@@ -0,0 +1,273 @@
+# services/db_pool.py
+"""
+Pool koneksi database bersama untuk app_gateway dan semua services/*.py.
+
+- PostgreSQL (DATABASE_URL): koneksi psycopg2 dibuat sekali dan dipakai ulang
+  antar thread worker gunicorn, dibatasi DB_POOL_MAX, dicek kesehatannya
+  sebelum dipinjam kalau sudah lama menganggur.
+- SQLite: satu handle per thread, dibuka sekali lalu dipakai terus, dengan
+  profil PRAGMA SQLITE_PRAGMAS (WAL, synchronous=NORMAL, busy_timeout, mmap,
+  cache, temp_store).
+
+Kode aplikasi memakai services/repository.get_repository(), yang memilih
+backend sekali per proses; modul ini hanya menyediakan pool-nya:
+    with pg_connection() as conn:          # commit/rollback + kembali ke pool
+        conn.cursor().execute(...)         # (conn.close() juga hanya mengembalikan)
+"""
+import os, sqlite3, threading, time
+from urllib.parse import urlparse
+
+try:
+    import psycopg2
+    from psycopg2 import pool as pg_pool
+    from psycopg2 import extensions as pg_ext
+except ImportError:  # psycopg2 opsional saat jalan lokal dengan SQLite
+    psycopg2 = None
+    pg_pool = None
+    pg_ext = None
+
+BASE_DIR = "/tmp" if os.getenv("RENDER") else os.getcwd()
+DB_PATH = os.getenv("SINDI_DB_PATH", os.path.join(BASE_DIR, "sindi.db"))
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+PG_MIN_CONN = int(os.getenv("DB_POOL_MIN", "1"))
+PG_MAX_CONN = int(os.getenv("DB_POOL_MAX", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+HEALTH_CHECK_IDLE = float(os.getenv("DB_POOL_HEALTH_IDLE", "30"))
+SQLITE_TIMEOUT = float(os.getenv("DB_SQLITE_TIMEOUT", "30"))
+
+# Profil penyimpanan SQLite, diterapkan ke setiap koneksi baru.
+# WAL: pembaca tidak diblok penulis (dan sebaliknya) selama penetapan panjang;
+# synchronous=NORMAL aman di WAL (paling buruk kehilangan commit terakhir saat
+# listrik mati, bukan korupsi). Set SQLITE_JOURNAL_MODE=DELETE untuk
+# filesystem jaringan yang tidak mendukung shared memory WAL.
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(SQLITE_TIMEOUT * 1000),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": -int(os.getenv("SQLITE_CACHE_KB", "65536")),  # negatif = KiB
+    "temp_store": os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+}
+
+
+class PoolTimeout(Exception):
+    """Semua koneksi sedang dipakai dan tidak ada yang kembali tepat waktu."""
+
+
+# ======================
+# WRAPPER KONEKSI
+# ======================
+class PooledConnection:
+    """
+    Membungkus koneksi mentah. Semua atribut diteruskan ke koneksi asli,
+    kecuali close() yang mengembalikan koneksi ke pool.
+
+    Pinjaman bersarang di SQLite (fungsi yang membuka `with _conn()` di dalam
+    `with _conn()` lain pada thread yang sama) berbagi satu handle dan satu
+    transaksi. Hanya pinjaman terluar (outermost) yang commit/rollback —
+    termasuk saat keluar dari blok with; commit()/rollback() pinjaman dalam
+    diabaikan supaya tidak memotong transaksi pemanggilnya.
+    """
+
+    def __init__(self, raw, release, outermost=True):
+        self._raw = raw
+        self._release = release
+        self._released = False
+        self.outermost = outermost
+
+    @property
+    def raw(self):
+        return self._raw
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def commit(self):
+        if self.outermost:
+            self._raw.commit()
+
+    def rollback(self):
+        if self.outermost:
+            self._raw.rollback()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.commit()
+            else:
+                self.rollback()
+        finally:
+            self.close()
+        return False
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            self._release(self._raw)
+
+
+# ======================
+# SQLITE: HANDLE PER THREAD
+# ======================
+_sqlite_local = threading.local()
+
+
+def apply_sqlite_profile(conn, pragmas=None):
+    """Terapkan PRAGMA profil (default SQLITE_PRAGMAS) ke koneksi SQLite mentah."""
+    for nama, nilai in (SQLITE_PRAGMAS if pragmas is None else pragmas).items():
+        conn.execute(f"PRAGMA {nama}={nilai}")
+    return conn
+
+
+def _open_sqlite():
+    conn = sqlite3.connect(DB_PATH, timeout=SQLITE_TIMEOUT, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    return apply_sqlite_profile(conn)
+
+
+def _sqlite_alive(conn):
+    try:
+        conn.execute("SELECT 1")
+        return True
+    except sqlite3.Error:
+        return False
+
+
+def sqlite_connection():
+    """Pinjam handle SQLite milik thread ini (dibuat sekali per thread/proses)."""
+    state = _sqlite_local.__dict__
+    conn = state.get("conn")
+    pid = os.getpid()
+
+    if conn is not None and state.get("pid") != pid:
+        # proses hasil fork (gunicorn --preload): jangan pakai handle induk
+        conn = None
+    elif conn is not None and state.get("depth", 0) == 0 \
+            and time.monotonic() - state.get("last_used", 0) > HEALTH_CHECK_IDLE \
+            and not _sqlite_alive(conn):
+        conn = None
+
+    if conn is None:
+        conn = _open_sqlite()
+        state.update(conn=conn, pid=pid, depth=0)
+
+    state["depth"] = state.get("depth", 0) + 1
+    return PooledConnection(conn, _release_sqlite, outermost=state["depth"] == 1)
+
+
+def _release_sqlite(conn):
+    state = _sqlite_local.__dict__
+    if state.get("conn") is not conn:
+        conn.close()
+        return
+    state["depth"] = max(state.get("depth", 1) - 1, 0)
+    state["last_used"] = time.monotonic()
+    if state["depth"] == 0 and conn.in_transaction:
+        # jangan biarkan transaksi yang lupa di-commit menahan lock
+        conn.rollback()
+
+
+# ======================
+# POSTGRESQL: THREADED POOL
+# ======================
+_pg_lock = threading.Lock()
+_pg_pool = None
+_pg_pid = None
+_pg_slots = threading.BoundedSemaphore(PG_MAX_CONN)
+_pg_last_used = {}
+
+
+def _pg_dsn_kwargs(db_url):
+    parsed = urlparse(db_url)
+    return dict(
+        database=parsed.path[1:],
+        user=parsed.username,
+        password=parsed.password,
+        host=parsed.hostname,
+        port=parsed.port,
+    )
+
+
+def _get_pg_pool():
+    global _pg_pool, _pg_pid, _pg_slots
+    pid = os.getpid()
+    if _pg_pool is not None and _pg_pid == pid:
+        return _pg_pool
+
+    with _pg_lock:
+        if _pg_pool is None or _pg_pid != pid:
+            if psycopg2 is None:
+                raise RuntimeError("psycopg2 belum terpasang.")
+            _pg_pool = pg_pool.ThreadedConnectionPool(
+                PG_MIN_CONN, PG_MAX_CONN, **_pg_dsn_kwargs(DATABASE_URL)
+            )
+            _pg_pid = pid
+            _pg_slots = threading.BoundedSemaphore(PG_MAX_CONN)
+            _pg_last_used.clear()
+            print(f"✅ Pool PostgreSQL siap ({PG_MIN_CONN}-{PG_MAX_CONN} koneksi)")
+    return _pg_pool
+
+
+def _pg_alive(conn):
+    if conn.closed:
+        return False
+    try:
+        with conn.cursor() as c:
+            c.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def pg_connection():
+    """Pinjam koneksi PostgreSQL dari pool (menunggu bila pool penuh)."""
+    pool = _get_pg_pool()
+    slots = _pg_slots
+    if not slots.acquire(timeout=POOL_TIMEOUT):
+        raise PoolTimeout(f"Pool PostgreSQL penuh ({PG_MAX_CONN} koneksi).")
+
+    try:
+        conn = pool.getconn()
+        idle = time.monotonic() - _pg_last_used.get(id(conn), 0)
+        if conn.closed or (idle > HEALTH_CHECK_IDLE and not _pg_alive(conn)):
+            pool.putconn(conn, close=True)
+            conn = pool.getconn()
+    except Exception:
+        slots.release()
+        raise
+
+    def release(raw):
+        try:
+            if raw.closed:
+                pool.putconn(raw, close=True)
+            else:
+                if raw.get_transaction_status() != pg_ext.TRANSACTION_STATUS_IDLE:
+                    raw.rollback()
+                _pg_last_used[id(raw)] = time.monotonic()
+                pool.putconn(raw)
+        finally:
+            slots.release()
+
+    return PooledConnection(conn, release)
+
+
+# ======================
+# PENUTUPAN
+# ======================
+def close_all():
+    """Tutup semua koneksi pool (dipakai saat shutdown / reset database)."""
+    global _pg_pool
+    with _pg_lock:
+        if _pg_pool is not None and _pg_pid == os.getpid():
+            _pg_pool.closeall()
+        _pg_pool = None
+        _pg_last_used.clear()
+
+    conn = _sqlite_local.__dict__.pop("conn", None)
+    if conn is not None:
+        conn.close()
@@ -0,0 +1,186 @@
+# services/excel_ingest.py
+"""
+Pembacaan file lulusan (xlsx) secara streaming.
+
+openpyxl dibuka dalam mode read-only: baris dibaca satu per satu dari zip,
+jadi memori puncak tetap datar berapa pun besar filenya. Kolom nama/NIS
+dideteksi dari baris header saja; baris diteruskan sebagai generator atau
+potongan (chunk) kecil.
+
+File .xls lama tidak didukung openpyxl — untuk itu dipakai pandas sebagai
+cadangan (seluruh sheet tetap dimuat, seperti sebelumnya).
+
+Tabel yang sudah dinormalisasi disimpan di services/upload_cache.py (kunci =
+hash isi file), jadi pratinjau berikutnya dan penetapan tidak mem-parse ulang.
+"""
+import os, datetime
+from contextlib import contextmanager
+from itertools import islice
+
+from openpyxl import load_workbook
+
+from services import upload_cache
+
+CHUNK_SIZE = int(os.getenv("EXCEL_CHUNK_SIZE", "2000"))
+PREVIEW_PAGE_SIZE = int(os.getenv("PREVIEW_PAGE_SIZE", "50"))
+PREVIEW_MAX_LIMIT = 500
+
+
+class KolomTidakDitemukan(Exception):
+    """File tidak punya kolom nama santri / nomor induk santri."""
+
+
+def normalize_header(col):
+    return str(col).strip().lower().replace(" ", "_") if col is not None else ""
+
+
+def detect_columns(headers):
+    """Indeks kolom (nama, nis) dari header yang sudah dinormalisasi; None bila tidak ada."""
+    nama_idx = next((i for i, c in enumerate(headers) if "nama_santri" in c or c.startswith("nama")), None)
+    nis_idx = next((i for i, c in enumerate(headers) if "nomor_induk" in c or "nis" in c), None)
+    return nama_idx, nis_idx
+
+
+def _is_xls(path):
+    return path.lower().endswith(".xls")
+
+
+def _is_empty(row):
+    return all(v is None or (isinstance(v, str) and not v.strip()) for v in row)
+
+
+@contextmanager
+def _open_source(path):
+    """Iterator baris mentah (baris pertama = header) langsung dari sheet aktif."""
+    if _is_xls(path):
+        import pandas as pd
+        df = pd.read_excel(path, header=None)
+        yield (tuple(None if pd.isna(v) else v for v in row) for row in df.itertuples(index=False, name=None))
+        return
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        yield wb.active.iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+
+def _normalize_rows(rows):
+    """Header apa adanya, lalu baris data tanpa baris kosong, dipotong/dipadatkan selebar header."""
+    header = tuple(next(rows, None) or ())
+    yield header
+    width = len(header)
+    for row in rows:
+        if _is_empty(row):
+            continue
+        yield tuple(row[:width]) + (None,) * (width - len(row))
+
+
+@contextmanager
+def _load_table(path):
+    with _open_source(path) as rows:
+        yield _normalize_rows(iter(rows))
+
+
+@contextmanager
+def _open_rows(path):
+    """Tabel ter-normalisasi (baris pertama = header), lewat cache hasil parsing bila ada."""
+    with upload_cache.open_table(path, _load_table) as rows:
+        yield rows
+
+
+# ======================
+# API
+# ======================
+def read_header(path):
+    """
+    Header asli (apa adanya, untuk tampilan) dari baris pertama.
+    Jalur cepat: bila tabel belum ada di cache, hanya baris header yang dibaca.
+    """
+    if upload_cache.is_cached(path):
+        with _open_rows(path) as rows:
+            header = next(rows, None) or ()
+    else:
+        with _open_source(path) as rows:
+            header = next(iter(rows), None) or ()
+    return ["" if h is None else str(h) for h in header]
+
+
+def iter_rows(path):
+    """Generator baris data (tanpa header, baris kosong dilewati), panjang = jumlah kolom header."""
+    with _open_rows(path) as rows:
+        next(rows, None)
+        yield from rows
+
+
+def iter_chunks(path, chunk_size=CHUNK_SIZE):
+    """Baris data dalam potongan list berukuran maksimal chunk_size."""
+    rows = iter_rows(path)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def santri_columns(path):
+    """
+    (header_asli, header_normal, nama_idx, nis_idx) dari baris header saja.
+    Raise KolomTidakDitemukan bila kolom wajib tidak ada.
+    """
+    header = read_header(path)
+    normal = [normalize_header(h) for h in header]
+    nama_idx, nis_idx = detect_columns(normal)
+    if nama_idx is None or nis_idx is None:
+        raise KolomTidakDitemukan("File wajib memiliki kolom 'Nama Santri' dan 'Nomor Induk Santri'.")
+    return header, normal, nama_idx, nis_idx
+
+
+# ======================
+# PRATINJAU BERHALAMAN
+# ======================
+def column_meta(header):
+    """Metadata kolom untuk pratinjau: indeks, label asli, key normal, peran (nama/nis)."""
+    normal = [normalize_header(h) for h in header]
+    nama_idx, nis_idx = detect_columns(normal)
+    peran = {nama_idx: "nama", nis_idx: "nis"}
+    return [
+        {"index": i, "label": label, "key": key, "role": peran.get(i)}
+        for i, (label, key) in enumerate(zip(header, normal))
+    ]
+
+
+def json_value(v):
+    """Nilai sel yang aman untuk JSON (tanggal → ISO, float bulat → int)."""
+    if v is None:
+        return None
+    if isinstance(v, (datetime.date, datetime.datetime, datetime.time)):
+        return v.isoformat()
+    if isinstance(v, float) and v.is_integer():
+        return int(v)
+    return v
+
+
+def read_page(path, offset=0, limit=PREVIEW_PAGE_SIZE):
+    """
+    Satu halaman baris data: (rows, has_more). Baris sebelum offset dilewati
+    secara streaming dan pembacaan berhenti di baris ke offset+limit+1.
+
+    Bila tabel sudah di cache, halaman dibaca dari sana. Bila belum, halaman
+    dibaca langsung dari file Excel (sisa file tidak di-parse) dan cache
+    dibangun di thread latar untuk halaman berikutnya — satu-satunya biaya
+    penuh di jalur permintaan adalah hash SHA-256 isi file untuk kunci cache.
+    """
+    offset = max(int(offset), 0)
+    limit = min(max(int(limit), 0), PREVIEW_MAX_LIMIT)
+    if upload_cache.is_cached(path):
+        with _open_rows(path) as rows:
+            next(rows, None)
+            page = list(islice(rows, offset, offset + limit + 1))
+    else:
+        with _load_table(path) as rows:
+            next(rows, None)
+            page = list(islice(rows, offset, offset + limit + 1))
+        upload_cache.build_background(path, _load_table)
+    has_more = len(page) > limit
+    return [[json_value(v) for v in row] for row in page[:limit]], has_more
@@ -0,0 +1,386 @@
+# services/export_service.py
+"""
+File hasil penetapan (xlsx) dirender saat diminta, langsung dari database.
+
+Penetapan tidak lagi menulis file: pengajuan hanya menyimpan nama file publik
+`HASIL_{mdt}_{tahun}_{jenjang}_{id}.xlsx` (id membuat nama unik, jadi dua
+batch dengan MDT/tahun/jenjang sama tidak saling menimpa). Saat file diunduh
+atau dipratinjau:
+
+- versi isi dihitung dari nomor_ijazah pengajuan itu (jumlah + id terakhir,
+  satu query ber-index idx_nomor_ijazah_pengajuan) plus tanggal penetapan
+  dan FORMAT_VERSI;
+- bila artefak `{pengajuan_id}-{versi}.xlsx` sudah ada di EXPORT_CACHE_DIR,
+  file itu yang dikirim (tidak dirender ulang);
+- bila belum, baris di-stream dari nomor_ijazah (server-side cursor di
+  PostgreSQL) ke openpyxl write-only, ditulis ke file sementara lalu
+  di-rename; versi lama pengajuan itu dihapus.
+
+Kolom asli file lulusan (staging santri_lulusan) ikut ditulis bila jumlah
+barisnya sama dengan nomor yang terbit; pengajuan lama tanpa staging
+mendapat kolom Nama Santri / NIS saja.
+
+Rekap Kanwil (rekap_csv / export_rekap_xlsx): semua nomor ijazah yang sesuai
+filter hasil (facet_service.where_hasil: tahun, kabupaten, jenjang, tanggal)
+dalam satu file. Query di-stream lewat server-side cursor, urut (pengajuan,
+id) mengikuti index jadi tanpa sort; memori tetap berapa pun jumlah barisnya.
+CSV dikirim per potongan sejak baris pertama. XLSX adalah zip yang baru bisa
+dikirim setelah baris terakhir ditulis, jadi dibuat sebagai job di antrian
+(seperti zip PDF) dan diunduh dari halaman job setelah selesai.
+"""
+import os, re, io, csv, json, glob, time, hashlib, threading, zipfile, multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+
+from openpyxl import Workbook
+
+from services.db_pool import BASE_DIR
+from services.repository import get_repository
+from services.santri_service import iter_santri_rows
+from services.facet_service import where_hasil
+from services.file_serving import simpan_etag, hapus_etag
+
+HASIL_DIR = os.path.join(BASE_DIR, "hasil_excel")
+EXPORT_CACHE_DIR = os.getenv("EXPORT_CACHE_DIR", os.path.join(HASIL_DIR, "cache"))
+FORMAT_VERSI = 1  # naikkan bila tata letak file hasil berubah
+
+KOLOM_REKAP = [
+    "Nomor Ijazah", "Nama Santri", "NIS", "Jenjang", "Tahun Pelajaran",
+    "Nama MDT", "Kabupaten", "Nomor Batch", "Tanggal Penetapan",
+]
+REKAP_CHUNK = int(os.getenv("EXPORT_REKAP_CHUNK", "1000"))  # baris per potongan CSV
+XLSX_MAX_BARIS = 1_000_000  # batas Excel 1.048.576 baris per sheet
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "0")) or min(os.cpu_count() or 1, 4)
+PDF_ZIP_MAX = int(os.getenv("PDF_ZIP_MAX", "500"))  # batas pengajuan per zip
+JOB_DIR = os.path.join(EXPORT_CACHE_DIR, "job")  # file hasil job export, dihapus setelah JOB_TTL
+JOB_TTL = float(os.getenv("EXPORT_JOB_TTL", os.getenv("EXPORT_ZIP_TTL", str(24 * 3600))))
+
+_POLA_NAMA = re.compile(r"^HASIL_.+_(\d+)\.xlsx$")
+# lock render per (pengajuan, ext) dibagi ke sejumlah tetap "stripe" — tidak tumbuh per pengajuan
+_render_locks = [threading.Lock() for _ in range(64)]
+
+
+def _conn():
+    return get_repository().connection()
+
+
+# ======================
+# NAMA FILE
+# ======================
+def nama_file_hasil(nama_mdt, tahun, jenjang, pengajuan_id):
+    """Nama file publik hasil penetapan (unik per pengajuan)."""
+    safe_nama = (nama_mdt or "MDT").replace(" ", "_").replace("/", "_")
+    safe_tahun = str(tahun).replace("/", "-")
+    return f"HASIL_{safe_nama}_{safe_tahun}_{jenjang}_{pengajuan_id}.xlsx"
+
+
+def path_file_hasil(nama_mdt, tahun, jenjang, pengajuan_id):
+    """Nilai kolom pengajuan.file_hasil (path di HASIL_DIR, file-nya dirender saat diminta)."""
+    return os.path.join(HASIL_DIR, nama_file_hasil(nama_mdt, tahun, jenjang, pengajuan_id))
+
+
+# ======================
+# VERSI & RENDER
+# ======================
+def _info(c, pengajuan_id):
+    c.execute("""
+        SELECT nama_mdt, tahun_pelajaran, jenjang, kolom_lulusan, tanggal_penetapan, file_hasil
+        FROM pengajuan WHERE id=? AND status='Ditetapkan'
+    """, (pengajuan_id,))
+    row = c.fetchone()
+    if not row:
+        return None
+    c.execute("SELECT COUNT(*), MAX(id) FROM nomor_ijazah WHERE pengajuan_id=?", (pengajuan_id,))
+    jumlah, terakhir = c.fetchone()
+    versi = hashlib.sha1(
+        repr((FORMAT_VERSI, jumlah, terakhir, row[4], row[3])).encode()
+    ).hexdigest()[:12]
+    return {
+        "nama_mdt": row[0], "tahun": row[1], "jenjang": row[2],
+        "kolom_lulusan": row[3], "file_hasil": row[5],
+        "jumlah": jumlah, "versi": versi,
+    }
+
+
+def _jumlah_staging(pengajuan_id):
+    with _conn() as conn:
+        c = conn.cursor()
+        c.execute("SELECT COUNT(*) FROM santri_lulusan WHERE pengajuan_id=?", (pengajuan_id,))
+        return c.fetchone()[0]
+
+
+def _render(pengajuan_id, info, path):
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+
+    header = json.loads(info["kolom_lulusan"]) if info["kolom_lulusan"] else None
+    asli = header is not None and info["jumlah"] and _jumlah_staging(pengajuan_id) == info["jumlah"]
+    ws.append((list(header) if asli else ["Nama Santri", "NIS"]) + ["Nomor Ijazah"])
+
+    nomor = get_repository().stream(
+        "SELECT nama_santri, nis, nomor_ijazah FROM nomor_ijazah WHERE pengajuan_id=? ORDER BY id",
+        (pengajuan_id,),
+    )
+    try:
+        if asli:
+            # nomor_ijazah diinsert urut baris staging, jadi urutan id = urutan baris
+            santri = chain.from_iterable(iter_santri_rows(pengajuan_id))
+            for (_, data), n in zip(santri, nomor):
+                ws.append(data + [n[2]])
+        else:
+            for n in nomor:
+                ws.append([n[0], n[1], n[2]])
+    finally:
+        nomor.close()
+
+    wb.save(path)
+
+
+def _lock(kunci):
+    return _render_locks[hash(kunci) % len(_render_locks)]
+
+
+def _artefak(pengajuan_id, ext, render):
+    """
+    (path artefak, info) dari cache `{pengajuan_id}-{versi}.{ext}`; dirender
+    dengan render(pengajuan_id, info, path) hanya bila versi itu belum ada.
+    None bila pengajuan belum Ditetapkan.
+    """
+    with _conn() as conn:
+        info = _info(conn.cursor(), pengajuan_id)
+    if info is None:
+        return None
+
+    path = os.path.join(EXPORT_CACHE_DIR, f"{pengajuan_id}-{info['versi']}.{ext}")
+    if os.path.isfile(path):
+        return path, info
+
+    with _lock((pengajuan_id, ext)):
+        if not os.path.isfile(path):
+            os.makedirs(EXPORT_CACHE_DIR, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            render(pengajuan_id, info, tmp_path)
+            os.replace(tmp_path, path)
+            simpan_etag(path)  # ETag dihitung sekali di sini, bukan per unduhan
+            for lama in glob.glob(os.path.join(EXPORT_CACHE_DIR, f"{pengajuan_id}-*.{ext}")):
+                if lama != path:
+                    try:
+                        os.remove(lama)
+                    except OSError:
+                        pass
+                    hapus_etag(lama)
+            print(f"✅ {ext.upper()} pengajuan {pengajuan_id} dirender ({info['jumlah']} santri)")
+    return path, info
+
+
+def export_hasil(pengajuan_id):
+    """
+    (path artefak, nama file unduhan) xlsx hasil untuk pengajuan yang sudah
+    Ditetapkan, atau None. Dirender hanya bila versi isinya belum ada di cache.
+    """
+    hasil = _artefak(pengajuan_id, "xlsx", _render)
+    if hasil is None:
+        return None
+    path, info = hasil
+    return path, _nama_hasil(info, pengajuan_id)
+
+
+def _nama_hasil(info, pengajuan_id):
+    return os.path.basename((info["file_hasil"] or "").replace("\\", "/")) \
+        or nama_file_hasil(info["nama_mdt"], info["tahun"], info["jenjang"], pengajuan_id)
+
+
+def export_hasil_by_nama(filename):
+    """
+    export_hasil() untuk nama file publik (dari URL); None bila bukan file hasil
+    pengajuan. Nama dicocokkan dulu (query ringan) sebelum apa pun dirender,
+    jadi nama tebakan tidak bisa memicu render.
+    """
+    filename = os.path.basename((filename or "").replace("\\", "/"))
+    cocok = _POLA_NAMA.match(filename)
+    if not cocok:
+        return None
+    pengajuan_id = int(cocok.group(1))
+    with _conn() as conn:
+        info = _info(conn.cursor(), pengajuan_id)
+    if info is None or _nama_hasil(info, pengajuan_id) != filename:
+        return None
+    return export_hasil(pengajuan_id)
+
+
+# ======================
+# REKAP KANWIL (SELURUH PROVINSI)
+# ======================
+def iter_rekap(filt):
+    """Baris KOLOM_REKAP untuk semua nomor ijazah pengajuan Ditetapkan sesuai filter (generator)."""
+    where, params = where_hasil(filt)
+    return get_repository().stream(f"""
+        SELECT n.nomor_ijazah, n.nama_santri, n.nis, p.jenjang, p.tahun_pelajaran,
+               p.nama_mdt, p.kabupaten, p.nomor_batch, p.tanggal_penetapan
+        FROM (
+            SELECT id, jenjang, tahun_pelajaran, nama_mdt, kabupaten, nomor_batch, tanggal_penetapan
+            FROM pengajuan WHERE {where}
+        ) p
+        JOIN nomor_ijazah n ON n.pengajuan_id = p.id
+        ORDER BY p.id, n.id
+    """, params)
+
+
+def nama_file_rekap(filt, ext):
+    bagian = [v for nama in ("tahun", "kabupaten", "jenjang") for v in filt.get(nama) or []]
+    if filt.get("dari") or filt.get("sampai"):
+        bagian.append(f"{filt.get('dari') or ''}_sd_{filt.get('sampai') or ''}")
+    label = re.sub(r"[^A-Za-z0-9]+", "_", "_".join(bagian)).strip("_") or "semua"
+    return f"rekap_nomor_ijazah_{label[:80]}.{ext}"
+
+
+def rekap_csv(filt):
+    """Potongan teks CSV (UTF-8 dengan BOM supaya terbaca Excel), per REKAP_CHUNK baris."""
+    buf = io.StringIO()
+    tulis = csv.writer(buf)
+    buf.write("\ufeff")
+    tulis.writerow(KOLOM_REKAP)
+    n = 0
+    for row in iter_rekap(filt):
+        tulis.writerow(tuple(row))
+        n += 1
+        if n % REKAP_CHUNK == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def hitung_rekap(filt):
+    """Jumlah baris rekap untuk filter (dipakai untuk progres job)."""
+    where, params = where_hasil(filt)
+    with _conn() as conn:
+        c = conn.cursor()
+        c.execute(f"""
+            SELECT COUNT(*) FROM nomor_ijazah n
+            JOIN (SELECT id FROM pengajuan WHERE {where}) p ON n.pengajuan_id = p.id
+        """, params)
+        return c.fetchone()[0]
+
+
+def export_rekap_xlsx(filt, path, progress=None):
+    """
+    Tulis file xlsx rekap (write-only, satu sheet per XLSX_MAX_BARIS) ke
+    `path` secara atomik. Dijalankan job_service; mengembalikan jumlah baris.
+    """
+    progress = progress or (lambda persen, pesan=None: None)
+    total = hitung_rekap(filt)
+    wb = Workbook(write_only=True)
+    ws, n, jumlah = None, XLSX_MAX_BARIS, 0
+    for row in iter_rekap(filt):
+        if n >= XLSX_MAX_BARIS:
+            ws = wb.create_sheet(f"Rekap {len(wb.worksheets) + 1}")
+            ws.append(KOLOM_REKAP)
+            n = 0
+        ws.append(tuple(row))
+        n += 1
+        jumlah += 1
+        if jumlah % (REKAP_CHUNK * 10) == 0 and total:
+            progress(min(int(jumlah * 90 / total), 90), f"{jumlah}/{total} baris")
+    if ws is None:
+        wb.create_sheet("Rekap 1").append(KOLOM_REKAP)
+
+    progress(95, "Menyimpan file")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        wb.save(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return jumlah
+
+
+# ======================
+# PDF DAFTAR NOMOR IJAZAH
+# ======================
+def export_pdf(pengajuan_id):
+    """(path artefak, nama file unduhan) PDF daftar nomor ijazah, atau None (lihat export_hasil)."""
+    from services.pdf_service import render_daftar_pdf
+
+    hasil = _artefak(pengajuan_id, "pdf", render_daftar_pdf)
+    if hasil is None:
+        return None
+    path, info = hasil
+    return path, nama_file_hasil(info["nama_mdt"], info["tahun"], info["jenjang"], pengajuan_id)[:-5] + ".pdf"
+
+
+def _export_pdf_anak(pengajuan_id):
+    """Dijalankan di proses anak export_pdf_zip."""
+    try:
+        return pengajuan_id, export_pdf(pengajuan_id), None
+    except Exception as e:
+        return pengajuan_id, None, str(e)
+
+
+def select_hasil_ids(filt, batas=None):
+    """Id pengajuan Ditetapkan yang cocok dengan filter hasil (urut id)."""
+    where, params = where_hasil(filt)
+    sql = f"SELECT id FROM pengajuan WHERE {where} ORDER BY id"
+    if batas:
+        sql += f" LIMIT {int(batas)}"
+    with _conn() as conn:
+        c = conn.cursor()
+        c.execute(sql, params)
+        return [r[0] for r in c.fetchall()]
+
+
+def path_file_job(job_id, ext):
+    return os.path.join(JOB_DIR, f"job-{job_id}.{ext}")
+
+
+def bersihkan_file_job_lama():
+    """Hapus file hasil job export yang umurnya lewat JOB_TTL."""
+    batas = time.time() - JOB_TTL
+    for path in glob.glob(os.path.join(JOB_DIR, "job-*.*")):
+        try:
+            if os.path.getmtime(path) < batas:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def export_pdf_zip(pengajuan_ids, path, max_workers=None, progress=None):
+    """
+    Tulis satu file zip berisi PDF banyak pengajuan ke `path` (atomik). PDF
+    yang belum ada di cache dirender paralel di process pool (PDF_WORKERS),
+    yang sudah ada langsung dipakai. Dijalankan job_service (bukan di dalam
+    request). Mengembalikan {pengajuan_id: error} untuk PDF yang gagal.
+    """
+    progress = progress or (lambda persen, pesan=None: None)
+    ids = sorted({int(i) for i in pengajuan_ids})
+    hasil, gagal = {}, {}
+    workers = max(1, min(max_workers or PDF_WORKERS, len(ids) or 1))
+    if workers == 1:
+        selesai = map(_export_pdf_anak, ids)
+    else:
+        # spawn: proses anak tidak mewarisi thread/koneksi milik worker gunicorn
+        ctx = multiprocessing.get_context("spawn")
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=ctx)
+        selesai = pool.map(_export_pdf_anak, ids)
+    try:
+        for n, (pid, artefak, error) in enumerate(selesai, start=1):
+            if artefak is not None:
+                hasil[pid] = artefak
+            else:
+                gagal[pid] = error or "Pengajuan belum ditetapkan."
+            progress(int(n * 95 / len(ids)), f"{n}/{len(ids)} PDF siap")
+    finally:
+        if workers > 1:
+            pool.shutdown()
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    # PDF FPDF sudah terkompresi → simpan tanpa deflate lagi
+    with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_STORED) as zf:
+        for pid in ids:
+            if pid in hasil:
+                zf.write(hasil[pid][0], hasil[pid][1])
+    os.replace(tmp_path, path)
+    return gagal
@@ -0,0 +1,159 @@
+# services/facet_service.py
+"""
+Filter & faceting hasil penetapan (halaman hasil Kanwil).
+
+Filter bisa multi-nilai (?kabupaten=A&kabupaten=B), ditambah rentang tanggal
+penetapan (?dari=YYYY-MM-DD&sampai=YYYY-MM-DD). Facet = nilai unik
+kabupaten/jenjang/tahun beserta jumlah batch, dihitung dengan GROUP BY di atas
+index (status, kolom). Seperti faceting pada umumnya, jumlah tiap facet
+memakai semua filter KECUALI filternya sendiri, jadi pilihan kabupaten tidak
+menyusut menjadi kabupaten yang sedang dipilih saja.
+
+Hasil facet di-cache di memori per kombinasi filter dan otomatis tidak
+berlaku begitu ada penetapan baru: kunci cache memuat "stempel" data
+(jumlah pengajuan Ditetapkan dari statistik_pengajuan + tanggal penetapan
+terakhir), yang dibaca dengan dua query kecil ber-index. FACET_CACHE_TTL
+menjadi batas atas umur cache untuk perubahan lain (mis. edit kabupaten).
+"""
+import os, time, datetime, threading
+
+from services.repository import get_repository
+
+CACHE_TTL = float(os.getenv("FACET_CACHE_TTL", "300"))
+CACHE_MAX = 256
+
+# nama facet → kolom pengajuan
+FACETS = {
+    "kabupaten": "kabupaten",
+    "jenjang": "jenjang",
+    "tahun": "tahun_pelajaran",
+}
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _conn():
+    return get_repository().connection()
+
+
+# ======================
+# FILTER
+# ======================
+def _tanggal(nilai):
+    try:
+        return datetime.datetime.strptime((nilai or "").strip(), "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+def _daftar(nilai):
+    if nilai is None:
+        return []
+    if isinstance(nilai, str):
+        nilai = [nilai]
+    return sorted({v.strip() for v in nilai if v and v.strip()})
+
+
+def parse_filter(args):
+    """Filter hasil dari request.args (MultiDict) atau dict biasa."""
+    ambil = args.getlist if hasattr(args, "getlist") else (lambda k: args.get(k))
+    return make_filter(
+        kode_mdt=args.get("kode_mdt"),
+        kabupaten=ambil("kabupaten"),
+        jenjang=ambil("jenjang"),
+        tahun=ambil("tahun"),
+        dari=args.get("dari"),
+        sampai=args.get("sampai"),
+    )
+
+
+def make_filter(kode_mdt=None, kabupaten=None, jenjang=None, tahun=None, dari=None, sampai=None):
+    """Normalisasi filter: list untuk facet, date untuk rentang (nilai tidak valid diabaikan)."""
+    return {
+        "kode_mdt": kode_mdt or None,
+        "kabupaten": _daftar(kabupaten),
+        "jenjang": _daftar(jenjang),
+        "tahun": _daftar(tahun),
+        "dari": dari if isinstance(dari, datetime.date) else _tanggal(dari),
+        "sampai": sampai if isinstance(sampai, datetime.date) else _tanggal(sampai),
+    }
+
+
+def where_hasil(filt, kecuali=None):
+    """(where, params) untuk pengajuan Ditetapkan sesuai filter; `kecuali` = facet yang dilewati."""
+    where, params = ["status='Ditetapkan'"], []
+    if filt.get("kode_mdt"):
+        where.append("nama_mdt=?")
+        params.append(filt["kode_mdt"])
+    for nama, kolom in FACETS.items():
+        nilai = filt.get(nama) or []
+        if nama == kecuali or not nilai:
+            continue
+        if len(nilai) == 1:
+            where.append(f"{kolom}=?")
+        else:
+            where.append(f"{kolom} IN ({', '.join('?' for _ in nilai)})")
+        params.extend(nilai)
+    if filt.get("dari"):
+        where.append("tanggal_penetapan >= ?")
+        params.append(filt["dari"].isoformat())
+    if filt.get("sampai"):
+        # inklusif sampai akhir hari: < tanggal berikutnya
+        where.append("tanggal_penetapan < ?")
+        params.append((filt["sampai"] + datetime.timedelta(days=1)).isoformat())
+    return " AND ".join(where), params
+
+
+# ======================
+# FACET
+# ======================
+def _stempel(c):
+    """Berubah setiap ada penetapan baru (dan saat status Ditetapkan dicabut)."""
+    c.execute("SELECT COALESCE(SUM(jumlah), 0) FROM statistik_pengajuan WHERE status='Ditetapkan'")
+    jumlah = c.fetchone()[0]
+    c.execute("SELECT MAX(tanggal_penetapan) FROM pengajuan WHERE status='Ditetapkan'")
+    return jumlah, c.fetchone()[0]
+
+
+def _kunci(filt):
+    return tuple(
+        tuple(v) if isinstance(v, list) else v
+        for _, v in sorted(filt.items())
+    )
+
+
+def facet_hasil(filt):
+    """
+    {facet: [{"nilai": ..., "jumlah": n}, ...]} untuk kabupaten, jenjang, tahun,
+    plus "total" (jumlah batch yang cocok dengan semua filter).
+    """
+    kunci = _kunci(filt)
+    now = time.monotonic()
+    with _conn() as conn:
+        c = conn.cursor()
+        stempel = _stempel(c)
+        with _cache_lock:
+            hit = _cache.get(kunci)
+        if hit and hit[0] == stempel and hit[1] > now:
+            return hit[2]
+
+        hasil = {}
+        for nama, kolom in FACETS.items():
+            where, params = where_hasil(filt, kecuali=nama)
+            c.execute(f"""
+                SELECT {kolom}, COUNT(*) FROM pengajuan
+                WHERE {where} AND {kolom} IS NOT NULL AND {kolom} <> ''
+                GROUP BY {kolom} ORDER BY {kolom}
+            """, params)
+            hasil[nama] = [{"nilai": r[0], "jumlah": r[1]} for r in c.fetchall()]
+
+        where, params = where_hasil(filt)
+        c.execute(f"SELECT COUNT(*) FROM pengajuan WHERE {where}", params)
+        hasil["total"] = c.fetchone()[0]
+
+    with _cache_lock:
+        if len(_cache) >= CACHE_MAX:
+            _cache.clear()
+        _cache[kunci] = (stempel, now + CACHE_TTL, hasil)
+    return hasil
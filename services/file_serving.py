@@ -0,0 +1,134 @@
+# services/file_serving.py
+"""
+Pengiriman file ke browser: ETag kuat, GET bersyarat, byte range, dan
+delegasi ke reverse proxy.
+
+- ETag = SHA-256 isi file, dihitung sekali lalu disimpan bersama file:
+  file upload berbasis isi (services/storage.py) sudah membawanya di
+  namanya; file lain memakai sidecar `<file>.etag` berisi
+  "ukuran mtime_ns sha256" yang dihitung ulang hanya bila file berubah.
+  Artefak export_service menulis sidecar ini saat dirender.
+- If-None-Match cocok → 304 tanpa isi; Range → 206 (iframe PDF bisa
+  meminta per potongan); keduanya lewat make_conditional Werkzeug.
+- FILE_OFFLOAD=x-accel (nginx) atau x-sendfile (Apache/lighttpd): worker
+  Python hanya mengirim header, isi file dikirim proxy. X-Accel-Redirect
+  butuh pemetaan folder → location internal nginx di FILE_ACCEL_MAP, mis.
+  "/srv/sindi/uploads=/_berkas/uploads,/srv/sindi/hasil_excel=/_berkas/hasil".
+  File di luar pemetaan tetap dikirim oleh Python.
+"""
+import os, mimetypes, unicodedata
+from urllib.parse import quote
+
+from flask import current_app, request, send_file
+
+from services.storage import is_kunci
+from services.upload_cache import file_hash
+
+OFFLOAD = os.getenv("FILE_OFFLOAD", "").lower()
+SIDECAR = ".etag"
+
+# file berbasis isi tidak pernah berubah; file lain selalu divalidasi ulang (304 bila sama)
+CACHE_IMMUTABLE = "private, max-age=31536000, immutable"
+CACHE_REVALIDATE = "private, no-cache"
+
+
+def _accel_map():
+    pasangan = []
+    for item in os.getenv("FILE_ACCEL_MAP", "").split(","):
+        if "=" in item:
+            folder, lokasi = item.split("=", 1)
+            pasangan.append((os.path.realpath(folder.strip()), lokasi.strip().rstrip("/")))
+    return pasangan
+
+
+ACCEL_MAP = _accel_map()
+
+
+# ======================
+# ETAG
+# ======================
+def simpan_etag(path):
+    """Hitung SHA-256 file dan tulis sidecar-nya (atomik); kembalikan digest."""
+    st = os.stat(path)
+    digest = file_hash(path)
+    tmp = f"{path}{SIDECAR}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w") as f:
+            f.write(f"{st.st_size} {st.st_mtime_ns} {digest}")
+        os.replace(tmp, path + SIDECAR)
+    except OSError:  # folder read-only: tetap jalan, file_hash mengingat digest di memori
+        pass
+    return digest
+
+
+def etag_file(path):
+    """ETag kuat (SHA-256 isi) untuk file di `path`."""
+    nama = os.path.basename(path)
+    if is_kunci(nama):
+        return nama.split(".", 1)[0]
+
+    st = os.stat(path)
+    try:
+        with open(path + SIDECAR) as f:
+            ukuran, mtime, digest = f.read().split()
+        if int(ukuran) == st.st_size and int(mtime) == st.st_mtime_ns:
+            return digest
+    except (OSError, ValueError):
+        pass
+    return simpan_etag(path)
+
+
+def hapus_etag(path):
+    try:
+        os.remove(path + SIDECAR)
+    except OSError:
+        pass
+
+
+# ======================
+# KIRIM
+# ======================
+def _accel_uri(path):
+    asli = os.path.realpath(path)
+    for folder, lokasi in ACCEL_MAP:
+        if asli.startswith(folder + os.sep):
+            return lokasi + "/" + quote(os.path.relpath(asli, folder).replace(os.sep, "/"))
+    return None
+
+
+def _content_disposition(resp, nama, as_attachment):
+    jenis = "attachment" if as_attachment else "inline"
+    ascii_nama = unicodedata.normalize("NFKD", nama).encode("ascii", "ignore").decode("ascii")
+    if ascii_nama == nama:
+        resp.headers.set("Content-Disposition", jenis, filename=nama)
+    else:
+        resp.headers["Content-Disposition"] = f"{jenis}; filename=\"{ascii_nama}\"; filename*=UTF-8''{quote(nama)}"
+
+
+def _delegasi(header, nilai, nama, as_attachment, etag, cache_control):
+    """Respons tanpa isi; proxy yang membaca file (termasuk Range)."""
+    resp = current_app.response_class(b"", mimetype=mimetypes.guess_type(nama)[0] or "application/octet-stream")
+    resp.headers[header] = nilai
+    _content_disposition(resp, nama, as_attachment)
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = cache_control
+    return resp.make_conditional(request)
+
+
+def kirim_file(path, download_name=None, as_attachment=False):
+    """Pengganti send_file untuk file upload/hasil: ETag + 304 + Range + offload proxy."""
+    nama = download_name or os.path.basename(path)
+    etag = etag_file(path)
+    cache_control = CACHE_IMMUTABLE if is_kunci(os.path.basename(path)) else CACHE_REVALIDATE
+
+    if OFFLOAD == "x-accel":
+        uri = _accel_uri(path)
+        if uri:
+            return _delegasi("X-Accel-Redirect", uri, nama, as_attachment, etag, cache_control)
+    elif OFFLOAD == "x-sendfile":
+        return _delegasi("X-Sendfile", os.path.realpath(path), nama, as_attachment, etag, cache_control)
+
+    resp = send_file(path, as_attachment=as_attachment, download_name=nama,
+                     conditional=True, etag=etag, max_age=None)
+    resp.headers["Cache-Control"] = cache_control
+    return resp
@@ -0,0 +1,358 @@
+# services/job_service.py
+"""
+Antrian job penetapan nomor ijazah (background).
+
+POST /penetapan hanya memasukkan job ke tabel `penetapan_job` lalu langsung
+mengembalikan job id. Thread worker di tiap proses gunicorn mengambil job dari
+tabel (klaim atomik), menjalankan tetapkan_pengajuan dan mencatat progres.
+
+Karena antrian tersimpan di database, job tetap ada walau worker restart:
+job 'proses' yang heartbeat-nya basi dikembalikan ke 'antri' dan diulang
+(maksimal MAX_ATTEMPTS kali). Penomoran + update status dilakukan dalam satu
+transaksi, jadi pengulangan tidak menerbitkan nomor ganda.
+
+Worker juga bisa dijalankan terpisah:
+    python -m services.job_service
+"""
+import os, json, threading, time, datetime, socket, traceback, multiprocessing
+
+from services.repository import get_repository
+
+JOB_WORKERS = int(os.getenv("PENETAPAN_WORKERS", "2"))
+POLL_INTERVAL = float(os.getenv("PENETAPAN_POLL", "1"))
+HEARTBEAT_INTERVAL = float(os.getenv("PENETAPAN_HEARTBEAT", "10"))
+STALE_AFTER = float(os.getenv("PENETAPAN_STALE", "60"))
+# cek job basi cukup sesekali dan hanya oleh worker 0 (UPDATE = kunci tulis SQLite)
+REQUEUE_INTERVAL = float(os.getenv("PENETAPAN_REQUEUE", str(STALE_AFTER / 2)))
+MAX_ATTEMPTS = 3
+
+STATUS_ANTRI = "antri"
+STATUS_PROSES = "proses"
+STATUS_SELESAI = "selesai"
+STATUS_GAGAL = "gagal"
+
+JENIS_SATU = "satu"
+JENIS_MASSAL = "massal"
+JENIS_PDF_ZIP = "pdf_zip"  # zip PDF daftar nomor ijazah (hasil_kanwil), bukan penetapan
+JENIS_REKAP_XLSX = "rekap_xlsx"  # rekap xlsx seluruh nomor ijazah sesuai filter hasil_kanwil
+JENIS_EXPORT = (JENIS_PDF_ZIP, JENIS_REKAP_XLSX)
+
+_JOB_COLUMNS = (
+    "id", "pengajuan_id", "jenis", "status", "progress", "pesan", "hasil_file",
+    "parameter", "laporan", "diajukan_oleh", "attempts", "created_at", "started_at", "finished_at",
+)
+
+
+def _conn():
+    return get_repository().connection()
+
+
+def _now():
+    return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _row_to_dict(row):
+    if not row:
+        return None
+    job = dict(zip(_JOB_COLUMNS, row))
+    for key in ("parameter", "laporan"):
+        job[key] = json.loads(job[key]) if job[key] else None
+    return job
+
+
+# ======================
+# API UNTUK ROUTE
+# ======================
+def enqueue_penetapan(pengajuan_id, diajukan_oleh=None):
+    """
+    Masukkan job penetapan. Bila pengajuan yang sama masih antri/proses,
+    job yang sudah ada yang dikembalikan (klik ganda tidak membuat job baru).
+    """
+    with _conn() as conn:
+        c = conn.cursor()
+        c.execute("""
+            SELECT id FROM penetapan_job
+            WHERE pengajuan_id=? AND status IN (?, ?)
+            ORDER BY id DESC LIMIT 1
+        """, (pengajuan_id, STATUS_ANTRI, STATUS_PROSES))
+        row = c.fetchone()
+        if row:
+            return row[0]
+
+        job_id = conn.insert_returning("""
+            INSERT INTO penetapan_job (pengajuan_id, status, progress, pesan, diajukan_oleh, created_at)
+            VALUES (?, ?, 0, ?, ?, ?)
+        """, (pengajuan_id, STATUS_ANTRI, "Menunggu antrian", diajukan_oleh, _now()))
+        conn.commit()
+        return job_id
+
+
+def enqueue_penetapan_massal(pengajuan_ids=None, kabupaten=None, jenjang=None, diajukan_oleh=None):
+    """Masukkan satu job penetapan massal (daftar id dan/atau filter kabupaten/jenjang)."""
+    parameter = {
+        "pengajuan_ids": [int(i) for i in pengajuan_ids] if pengajuan_ids else None,
+        "kabupaten": kabupaten or None,
+        "jenjang": jenjang or None,
+    }
+    with _conn() as conn:
+        job_id = conn.insert_returning("""
+            INSERT INTO penetapan_job (jenis, status, progress, pesan, parameter, diajukan_oleh, created_at)
+            VALUES (?, ?, 0, ?, ?, ?, ?)
+        """, (JENIS_MASSAL, STATUS_ANTRI, "Menunggu antrian", json.dumps(parameter), diajukan_oleh, _now()))
+        conn.commit()
+        return job_id
+
+
+def _enqueue_export(jenis, parameter, diajukan_oleh):
+    with _conn() as conn:
+        job_id = conn.insert_returning("""
+            INSERT INTO penetapan_job (jenis, status, progress, pesan, parameter, diajukan_oleh, created_at)
+            VALUES (?, ?, 0, ?, ?, ?, ?)
+        """, (jenis, STATUS_ANTRI, "Menunggu antrian", json.dumps(parameter), diajukan_oleh, _now()))
+        conn.commit()
+        return job_id
+
+
+def enqueue_export_pdf_zip(pengajuan_ids, nama_file, diajukan_oleh=None):
+    """Masukkan job export zip PDF; file jadi diambil lewat hasil_file job."""
+    parameter = {"pengajuan_ids": [int(i) for i in pengajuan_ids], "nama_file": nama_file}
+    return _enqueue_export(JENIS_PDF_ZIP, parameter, diajukan_oleh)
+
+
+def enqueue_export_rekap_xlsx(filt, nama_file, diajukan_oleh=None):
+    """Masukkan job rekap xlsx untuk filter hasil (facet_service.make_filter)."""
+    filter_json = {k: (v.isoformat() if hasattr(v, "isoformat") else v) for k, v in filt.items()}
+    return _enqueue_export(JENIS_REKAP_XLSX, {"filter": filter_json, "nama_file": nama_file}, diajukan_oleh)
+
+
+def get_job(job_id):
+    with _conn() as conn:
+        c = conn.cursor()
+        c.execute(f"SELECT {', '.join(_JOB_COLUMNS)} FROM penetapan_job WHERE id=?", (job_id,))
+        return _row_to_dict(c.fetchone())
+
+
+def list_active_jobs():
+    """Job satuan antri/proses terbaru per pengajuan → {pengajuan_id: job}."""
+    with _conn() as conn:
+        c = conn.cursor()
+        c.execute(f"""
+            SELECT {', '.join(_JOB_COLUMNS)} FROM penetapan_job
+            WHERE jenis=? AND status IN (?, ?) ORDER BY id ASC
+        """, (JENIS_SATU, STATUS_ANTRI, STATUS_PROSES))
+        return {job["pengajuan_id"]: job for job in map(_row_to_dict, c.fetchall())}
+
+
+def update_progress(job_id, progress, pesan=None):
+    with _conn() as conn:
+        conn.cursor().execute("""
+            UPDATE penetapan_job SET progress=?, pesan=COALESCE(?, pesan), heartbeat=?
+            WHERE id=?
+        """, (int(progress), pesan, time.time(), job_id))
+        conn.commit()
+
+
+# ======================
+# WORKER
+# ======================
+def _worker_id(n):
+    return f"{socket.gethostname()}:{os.getpid()}:{n}"
+
+
+def requeue_stale_jobs():
+    """Kembalikan job 'proses' milik worker yang mati ke antrian (atau gagalkan)."""
+    batas = time.time() - STALE_AFTER
+    with _conn() as conn:
+        c = conn.cursor()
+        # baca dulu: tanpa job basi tidak perlu mengambil kunci tulis sama sekali
+        c.execute("""
+            SELECT 1 FROM penetapan_job WHERE status=? AND COALESCE(heartbeat, 0) < ? LIMIT 1
+        """, (STATUS_PROSES, batas))
+        if c.fetchone() is None:
+            return
+        c.execute("""
+            UPDATE penetapan_job
+            SET status=?, finished_at=?, pesan='Gagal: worker berhenti berulang kali'
+            WHERE status=? AND COALESCE(heartbeat, 0) < ? AND attempts >= ?
+        """, (STATUS_GAGAL, _now(), STATUS_PROSES, batas, MAX_ATTEMPTS))
+        c.execute("""
+            UPDATE penetapan_job
+            SET status=?, worker=NULL, pesan='Diulang setelah worker restart'
+            WHERE status=? AND COALESCE(heartbeat, 0) < ?
+        """, (STATUS_ANTRI, STATUS_PROSES, batas))
+        conn.commit()
+
+
+def claim_next_job(worker):
+    """Ambil satu job 'antri' secara atomik; None bila antrian kosong."""
+    with _conn() as conn:
+        c = conn.cursor()
+        while True:
+            c.execute("SELECT id FROM penetapan_job WHERE status=? ORDER BY id LIMIT 1", (STATUS_ANTRI,))
+            row = c.fetchone()
+            if not row:
+                return None
+            c.execute("""
+                UPDATE penetapan_job
+                SET status=?, worker=?, heartbeat=?, attempts=attempts + 1,
+                    started_at=COALESCE(started_at, ?), pesan='Diproses'
+                WHERE id=? AND status=?
+            """, (STATUS_PROSES, worker, time.time(), _now(), row[0], STATUS_ANTRI))
+            conn.commit()
+            if c.rowcount == 1:
+                return get_job(row[0])
+            # sudah diambil worker lain, coba job berikutnya
+
+
+def _heartbeat(job_id, stop):
+    while not stop.wait(HEARTBEAT_INTERVAL):
+        try:
+            with _conn() as conn:
+                conn.cursor().execute("UPDATE penetapan_job SET heartbeat=? WHERE id=?", (time.time(), job_id))
+                conn.commit()
+        except Exception as e:
+            print(f"⚠️ Heartbeat job {job_id} gagal: {e}")
+
+
+def _finish(job_id, status, pesan, hasil_file=None, laporan=None):
+    with _conn() as conn:
+        conn.cursor().execute("""
+            UPDATE penetapan_job
+            SET status=?, pesan=?, hasil_file=COALESCE(?, hasil_file),
+                laporan=COALESCE(?, laporan),
+                progress=CASE WHEN ?='selesai' THEN 100 ELSE progress END,
+                finished_at=?, heartbeat=?
+            WHERE id=?
+        """, (status, pesan, hasil_file, json.dumps(laporan) if laporan else None,
+              status, _now(), time.time(), job_id))
+        conn.commit()
+
+
+def _run_massal(job):
+    from services.penetapan_bulk import tetapkan_bulk
+
+    parameter = job["parameter"] or {}
+    laporan = tetapkan_bulk(
+        pengajuan_ids=parameter.get("pengajuan_ids"),
+        kabupaten=parameter.get("kabupaten"),
+        jenjang=parameter.get("jenjang"),
+        progress=lambda pct, pesan=None: update_progress(job["id"], pct, pesan),
+    )
+    pesan = f"{laporan['berhasil']} dari {laporan['total']} batch ditetapkan ({laporan['jumlah_santri']} santri)"
+    _finish(job["id"], STATUS_SELESAI, pesan, laporan=laporan)
+
+
+def _run_pdf_zip(job):
+    from services.export_service import export_pdf_zip, path_file_job, bersihkan_file_job_lama
+
+    bersihkan_file_job_lama()
+    ids = (job["parameter"] or {}).get("pengajuan_ids") or []
+    path = path_file_job(job["id"], "zip")
+    gagal = export_pdf_zip(ids, path, progress=lambda pct, pesan=None: update_progress(job["id"], pct, pesan))
+    laporan = {"total": len(ids), "berhasil": len(ids) - len(gagal),
+               "gagal": len(gagal), "detail_gagal": {str(k): v for k, v in gagal.items()}}
+    pesan = f"{laporan['berhasil']} dari {laporan['total']} PDF siap diunduh"
+    _finish(job["id"], STATUS_SELESAI, pesan, hasil_file=path, laporan=laporan)
+
+
+def _run_rekap_xlsx(job):
+    from services.export_service import export_rekap_xlsx, path_file_job, bersihkan_file_job_lama
+    from services.facet_service import make_filter
+
+    bersihkan_file_job_lama()
+    filt = make_filter(**(job["parameter"] or {}).get("filter") or {})
+    path = path_file_job(job["id"], "xlsx")
+    jumlah = export_rekap_xlsx(filt, path, progress=lambda pct, pesan=None: update_progress(job["id"], pct, pesan))
+    _finish(job["id"], STATUS_SELESAI, f"{jumlah} nomor ijazah siap diunduh", hasil_file=path,
+            laporan={"jumlah": jumlah})
+
+
+def run_job(job):
+    from services.mdt_service import tetapkan_pengajuan
+
+    job_id = job["id"]
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(job_id, stop), daemon=True).start()
+    try:
+        if job["jenis"] == JENIS_MASSAL:
+            # batch yang sudah ditetapkan di percobaan sebelumnya otomatis
+            # terlewati karena hanya status 'Diverifikasi' yang dipilih
+            _run_massal(job)
+            return
+        if job["jenis"] == JENIS_PDF_ZIP:
+            _run_pdf_zip(job)
+            return
+        if job["jenis"] == JENIS_REKAP_XLSX:
+            _run_rekap_xlsx(job)
+            return
+
+        with _conn() as conn:
+            c = conn.cursor()
+            c.execute("SELECT status, file_hasil FROM pengajuan WHERE id=?", (job["pengajuan_id"],))
+            row = c.fetchone()
+
+        if row and row[0] == "Ditetapkan":
+            # percobaan sebelumnya sudah commit sebelum worker mati
+            _finish(job_id, STATUS_SELESAI, "Sudah ditetapkan", row[1])
+            return
+
+        hasil_file = tetapkan_pengajuan(
+            job["pengajuan_id"],
+            progress=lambda pct, pesan=None: update_progress(job_id, pct, pesan),
+        )
+        _finish(job_id, STATUS_SELESAI, "Nomor ijazah berhasil ditetapkan", hasil_file)
+    except Exception as e:
+        traceback.print_exc()
+        _finish(job_id, STATUS_GAGAL, f"Gagal: {e}")
+    finally:
+        stop.set()
+
+
+def worker_loop(n, stop=None):
+    stop = stop or threading.Event()
+    worker = _worker_id(n)
+    requeue_berikut = time.monotonic()
+    while not stop.is_set():
+        try:
+            if n == 0 and time.monotonic() >= requeue_berikut:
+                requeue_stale_jobs()
+                requeue_berikut = time.monotonic() + REQUEUE_INTERVAL
+            job = claim_next_job(worker)
+        except Exception as e:
+            print(f"⚠️ Worker penetapan {worker}: {e}")
+            job = None
+
+        if job:
+            run_job(job)
+        else:
+            stop.wait(POLL_INTERVAL)
+
+
+_started_pid = None
+_start_lock = threading.Lock()
+
+
+def start_workers(jumlah=None):
+    """Jalankan thread worker sekali per proses (aman dipanggil berulang)."""
+    global _started_pid
+    jumlah = JOB_WORKERS if jumlah is None else jumlah
+    if jumlah <= 0:
+        return
+    # proses anak pool spawn meng-import ulang app_gateway; worker hanya di proses induk
+    if multiprocessing.parent_process() is not None:
+        return
+    with _start_lock:
+        if _started_pid == os.getpid():
+            return
+        _started_pid = os.getpid()
+        for n in range(jumlah):
+            threading.Thread(target=worker_loop, args=(n,), name=f"penetapan-worker-{n}", daemon=True).start()
+    print(f"✅ {jumlah} worker penetapan aktif (pid {os.getpid()})")
+
+
+if __name__ == "__main__":
+    threads = [threading.Thread(target=worker_loop, args=(n,)) for n in range(max(JOB_WORKERS, 1))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
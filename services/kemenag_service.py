@@ -1,11 +1,12 @@
 import sqlite3
 import os
+from services.db_pool import DB_PATH
+from services.repository import get_repository
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DB_NAME = os.path.join(BASE_DIR, "../instance/sindi.db")
+DB_NAME = DB_PATH
 
 def _conn():
-    return sqlite3.connect(DB_NAME)
+    return get_repository().connection()
 
 def get_pengajuan_pending():
     with _conn() as conn:
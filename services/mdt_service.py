@@ -1,11 +1,18 @@
 # services/mdt_service.py
-import sqlite3, datetime, os, pandas as pd
-from fpdf import FPDF
-from flask import send_file
+import datetime, os
+from services.db_pool import BASE_DIR
+from services.repository import get_repository
+from services.statistik_service import tambah_jumlah_santri, invalidate as invalidate_statistik
+from services.pagination import keyset_page
+from services.facet_service import make_filter, where_hasil
+from services.santri_service import stage_santri_lulusan, ensure_staged
+from services.export_service import path_file_hasil
+from services.storage import resolve as resolve_upload
+from services.nomor_sequence import (
+    reserve_nomor_urut, kode_jenjang, PREFIX_NOMOR, PANJANG_URUT
+)
 
-BASE_DIR = "/tmp" if os.getenv("RENDER") else os.getcwd()
 HASIL_DIR = os.path.join(BASE_DIR, "hasil_excel")
-DB_PATH = os.path.join(BASE_DIR, "sindi.db")
 os.makedirs(HASIL_DIR, exist_ok=True)
 
 
@@ -13,55 +20,34 @@ os.makedirs(HASIL_DIR, exist_ok=True)
 # KONEKSI DATABASE
 # ======================
 def _conn():
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Koneksi backend aktif (SQLite/PostgreSQL) dari pool."""
+    return get_repository().connection()
 
 # ======================
 # MIGRASI / INIT
 # ======================
 
 def init_db():
-    with _conn() as conn:
-        c = conn.cursor()
-        for col, tipe in [
-            ("alasan", "TEXT"),
-            ("kabupaten", "TEXT"),
-            ("tanggal_verifikasi", "TEXT"),
-            ("verifikator", "TEXT"),
-            ("file_hasil", "TEXT"),
-        ]:
-            try:
-                c.execute(f"ALTER TABLE pengajuan ADD COLUMN {col} {tipe}")
-            except sqlite3.OperationalError:
-                pass  # kolom sudah ada
-
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS riwayat_verifikasi (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            pengajuan_id INTEGER,
-            nama_mdt TEXT,
-            jenjang TEXT,
-            tahun TEXT,
-            jumlah_lulus INTEGER,
-            status TEXT,
-            alasan TEXT,
-            verifikator TEXT,
-            tanggal_verifikasi TEXT
-        )
-        """)
-        conn.commit()
+    """Terapkan migrasi skema yang belum jalan (lihat services/migrations.py)."""
+    from services.migrations import ensure_schema
+    ensure_schema()
 
 # ======================
 # MDT: PENGAJUAN
 # ======================
 def create_pengajuan_batch(mdt_user, nama_mdt, jenjang, tahun_pelajaran, jumlah_lulus, file_lulusan_path):
+    """
+    Simpan pengajuan baru dan stage baris santri dari file Excel-nya dalam satu
+    transaksi (file yang kolom nama/NIS-nya tidak ada → KolomTidakDitemukan).
+    file_lulusan_path: kunci services/storage.py dari file yang sudah disimpan.
+    Mengembalikan (pengajuan_id, nomor_batch) — nomor_batch hanya beresolusi
+    detik, jadi jangan dipakai untuk mencari pengajuan yang baru dibuat.
+    """
     nomor_batch = f"BATCH_{mdt_user['kode_mdt']}_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}"
     kabupaten = mdt_user.get("wilayah", "-")
 
     with _conn() as conn:
-        c = conn.cursor()
-        c.execute("""
+        pengajuan_id = conn.insert_returning("""
             INSERT INTO pengajuan (
                 nama_mdt, jenjang, tahun_pelajaran, jumlah_lulus,
                 file_lulusan, tanggal_pengajuan, status, nomor_batch,
@@ -73,75 +59,51 @@ def create_pengajuan_batch(mdt_user, nama_mdt, jenjang, tahun_pelajaran, jumlah_
             file_lulusan_path, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "Menunggu", nomor_batch, mdt_user["id"], kabupaten
         ))
+        stage_santri_lulusan(conn, pengajuan_id, resolve_upload(file_lulusan_path))
         conn.commit()
-    return nomor_batch
+    return pengajuan_id, nomor_batch
 
 
-def list_pengajuan_batch_by_mdt(mdt_id):
+def list_pengajuan_batch_by_mdt(mdt_id, cursor=None, per_page=None):
     with _conn() as conn:
-        c = conn.cursor()
-        c.execute("""
+        return keyset_page(conn, """
             SELECT id, nomor_batch, nama_mdt, jenjang, tahun_pelajaran,
                    jumlah_lulus, file_lulusan, status, kabupaten
-            FROM pengajuan WHERE mdt_id=? ORDER BY id DESC
-        """, (mdt_id,))
-        return c.fetchall()
+            FROM pengajuan
+        """, "mdt_id=?", [mdt_id], cursor, per_page)
 
 # ======================
-# KANKEMENAG: VERIFIKASI
+# KANWIL: PENETAPAN NOMOR IJAZAH
 # ======================
-def list_pengajuan_for_kemenag():
+def pengajuan_milik_mdt(pengajuan_id, mdt_id):
+    """True bila pengajuan ini diajukan oleh MDT `mdt_id`."""
     with _conn() as conn:
         c = conn.cursor()
-        c.execute("""
-            SELECT id, nama_mdt, jenjang, tahun_pelajaran, jumlah_lulus,
-                   file_lulusan, status, kabupaten
-            FROM pengajuan WHERE status='Menunggu' ORDER BY id DESC
-        """)
-        return c.fetchall()
+        c.execute("SELECT 1 FROM pengajuan WHERE id=? AND mdt_id=?", (pengajuan_id, mdt_id))
+        return c.fetchone() is not None
 
-# ======================
-# KANWIL: PENETAPAN NOMOR IJAZAH
-# ======================
-def list_pengajuan_for_kanwil():
+def list_pengajuan_for_kanwil(kabupaten=None, jenjang=None, cursor=None, per_page=None):
+    where, params = "status='Diverifikasi'", []
+    if kabupaten:
+        where += " AND kabupaten=?"; params.append(kabupaten)
+    if jenjang:
+        where += " AND jenjang=?"; params.append(jenjang)
     with _conn() as conn:
-        c = conn.cursor()
-        c.execute("""
+        return keyset_page(conn, """
             SELECT id, nomor_batch, nama_mdt, jenjang, tahun_pelajaran, jumlah_lulus,
                    file_lulusan, status, kabupaten, alasan, verifikator, tanggal_verifikasi
-            FROM pengajuan WHERE status='Diverifikasi' ORDER BY id DESC
-        """)
-        return c.fetchall()
-
+            FROM pengajuan
+        """, where, params, cursor, per_page)
 
 # ===========================================================
 # 🔸 Tetapkan Pengajuan oleh Kanwil (Render-safe)
 # ===========================================================
-def tetapkan_pengajuan(pengajuan_id):
-    """Kanwil menetapkan pengajuan dan generate file hasil."""
-    conn = _conn()
-    c = conn.cursor()
-
-    c.execute("SELECT file_lulusan, nama_mdt, jenjang, tahun_pelajaran FROM pengajuan WHERE id=?", (pengajuan_id,))
-    row = c.fetchone()
-    if not row:
-        conn.close()
-        raise Exception("Data pengajuan tidak ditemukan.")
-
-    file_lulusan, nama_mdt, jenjang, tahun = row
-
-    hasil_file = generate_nomor_ijazah_batch(pengajuan_id)
-
-    c.execute("""
-        UPDATE pengajuan
-        SET status='Ditetapkan',
-            file_hasil=?,
-            tanggal_verifikasi=?
-        WHERE id=?
-    """, (hasil_file, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), pengajuan_id))
-    conn.commit()
-    conn.close()
-
+def tetapkan_pengajuan(pengajuan_id, progress=None):
+    """
+    Kanwil menetapkan pengajuan dan generate file hasil.
+    `progress(persen, pesan)` opsional dipanggil di tiap tahap (dipakai job_service).
+    """
+    hasil_file = generate_nomor_ijazah_batch(pengajuan_id, progress=progress)
     print(f"✅ Pengajuan {pengajuan_id} berhasil ditetapkan → {hasil_file}")
     return hasil_file
 
@@ -149,152 +111,187 @@ def tetapkan_pengajuan(pengajuan_id):
 # 🔸 Endpoint helper (untuk unduh di Render)
 # ===========================================================
 def get_hasil_excel(filename):
-    path = os.path.join(HASIL_DIR, filename)
-    if not os.path.exists(path):
-        return f"<h4 style='color:red'>❌ File tidak ditemukan: {path}</h4>"
-    return send_file(path, as_attachment=True)
+    from services.export_service import export_hasil_by_nama
+    from services.file_serving import kirim_file
+    hasil = export_hasil_by_nama(filename)
+    if hasil is None:
+        return f"<h4 style='color:red'>❌ File tidak ditemukan: {filename}</h4>"
+    path, nama = hasil
+    return kirim_file(path, download_name=nama, as_attachment=True)
 
 # ===========================================================
 # 🔸 Generate File Hasil Penetapan Ijazah (Aman untuk Render)
 # ===========================================================
-def tetapkan_pengajuan(pengajuan_id):
-    """Kanwil menetapkan pengajuan dan generate file hasil."""
-    conn = _conn()
-    c = conn.cursor()
-
-    c.execute("SELECT file_lulusan, nama_mdt, jenjang, tahun_pelajaran FROM pengajuan WHERE id=?", (pengajuan_id,))
-    row = c.fetchone()
-    if not row:
-        conn.close()
-        raise Exception("Data pengajuan tidak ditemukan.")
-
-    file_lulusan, nama_mdt, jenjang, tahun = row
-
-    hasil_file = generate_nomor_ijazah_batch(pengajuan_id)
-
-    c.execute("""
-        UPDATE pengajuan
-        SET status='Ditetapkan',
-            file_hasil=?,
-            tanggal_verifikasi=?
-        WHERE id=?
-    """, (hasil_file, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), pengajuan_id))
-    conn.commit()
-    conn.close()
+def generate_nomor_ijazah_batch(pengajuan_id, progress=None):
+    """
+    Generate nomor ijazah dari data santri yang sudah di-stage saat upload
+    dan tandai pengajuan 'Ditetapkan' — nomor & status di-commit dalam satu
+    transaksi. File hasil tidak ditulis di sini; export_service merendernya
+    dari nomor_ijazah saat pertama diunduh. Penomoran = satu INSERT ... SELECT
+    dari santri_lulusan (nomor urut = awal + baris).
+    """
+    progress = progress or (lambda persen, pesan=None: None)
 
-    print(f"✅ Pengajuan {pengajuan_id} berhasil ditetapkan → {hasil_file}")
-    return hasil_file
+    # Pengajuan lama yang belum punya staging di-parse sekali di sini
+    progress(10, "Membaca data santri")
+    if not ensure_staged(pengajuan_id):
+        raise Exception("❌ File lulusan bukan Excel / data santri tidak tersedia.")
 
-# ======================
-# MDT & KANWIL: HASIL
-# ======================
-def get_nomor_ijazah_by_pengajuan(pengajuan_id):
     with _conn() as conn:
         c = conn.cursor()
+
+        # Ambil data pengajuan
         c.execute("""
-            SELECT nama_santri, nis, nomor_ijazah, tahun, jenjang
-            FROM nomor_ijazah WHERE pengajuan_id=? ORDER BY id ASC
+            SELECT jenjang, tahun_pelajaran, nama_mdt, kolom_lulusan, jumlah_santri
+            FROM pengajuan WHERE id=?
         """, (pengajuan_id,))
-        return c.fetchall()
-
-def list_hasil_penetapan(kode_mdt=None, kabupaten=None, jenjang=None):
-    conn = _conn()
-    c = conn.cursor()
-    query = """
-        SELECT id, nama_mdt, jenjang, tahun_pelajaran, jumlah_lulus, kabupaten,
-               nomor_batch, COALESCE(file_hasil, file_lulusan)
-        FROM pengajuan WHERE status='Ditetapkan'
+        row = c.fetchone()
+        if not row:
+            raise Exception("❌ Data pengajuan tidak ditemukan.")
+
+        jenjang, tahun, nama_mdt, kolom_lulusan, jumlah = row
+        jumlah = jumlah or 0
+        output_path = path_file_hasil(nama_mdt, tahun, jenjang, pengajuan_id)
+
+        # Transaksi penomoran: klaim pengajuan (supaya dua penetapan paralel
+        # untuk batch yang sama tidak menerbitkan nomor ganda), pesan blok
+        # nomor, insert nomor_ijazah langsung dari staging, commit. Hanya
+        # pengajuan 'Diverifikasi' yang belum punya nomor yang bisa diklaim.
+        progress(40, f"Menomori {jumlah} santri")
+        sekarang = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        c.execute("""
+            UPDATE pengajuan
+            SET status='Ditetapkan',
+                file_hasil=?,
+                tanggal_verifikasi=?,
+                tanggal_penetapan=?
+            WHERE id=? AND status='Diverifikasi'
+              AND NOT EXISTS (SELECT 1 FROM nomor_ijazah WHERE pengajuan_id=?)
+        """, (output_path, sekarang, sekarang, pengajuan_id, pengajuan_id))
+        if c.rowcount != 1:
+            conn.rollback()
+            raise Exception(f"Pengajuan {pengajuan_id} sudah diproses atau belum diverifikasi.")
+
+        awal = reserve_nomor_urut(conn, jenjang, tahun, jumlah) if jumlah else 1
+        urut = conn.sql(
+            sqlite=f"printf('%0{PANJANG_URUT}d', ? + baris)",
+            postgres=f"lpad(CAST(CAST(? AS INTEGER) + baris AS TEXT), {PANJANG_URUT}, '0')",
+        )
+        c.execute(f"""
+            INSERT INTO nomor_ijazah (pengajuan_id, nama_santri, nis, nomor_ijazah, tahun, jenjang)
+            SELECT pengajuan_id, nama_santri, nis, ? || {urut}, ?, ?
+            FROM santri_lulusan
+            WHERE pengajuan_id=?
+            ORDER BY baris
+        """, (f"{PREFIX_NOMOR}-{kode_jenjang(jenjang)}-{tahun}-", awal, tahun, jenjang, pengajuan_id))
+        tambah_jumlah_santri(conn, pengajuan_id, c.rowcount)
+
+        conn.commit()
+    invalidate_statistik()
+
+    print(f"✅ Pengajuan {pengajuan_id}: {jumlah} nomor ijazah terbit")
+    return output_path
+
+# ======================
+# MDT & KANWIL: HASIL
+# ======================
+def get_nomor_ijazah_by_pengajuan_ids(pengajuan_ids):
     """
-    params = []
-    if kode_mdt:
-        query += " AND nama_mdt=?"; params.append(kode_mdt)
-    if kabupaten:
-        query += " AND kabupaten=?"; params.append(kabupaten)
-    if jenjang:
-        query += " AND jenjang=?"; params.append(jenjang)
-    query += " ORDER BY id DESC"
-
-    c.execute(query, params)
-    rows = c.fetchall()
-    conn.close()
-
-    hasil = []
-    for r in rows:
-        file_path = r[7]
-        if file_path:
-            file_path = os.path.basename(file_path.replace("\\", "/"))
-        hasil.append({
-            "id": r[0],
-            "nama_mdt": r[1],
-            "jenjang": r[2],
-            "tahun": r[3],
-            "jumlah": r[4],
-            "kabupaten": r[5],
-            "batch": r[6],
-            "file_path": file_path
-        })
+    Nomor ijazah untuk banyak pengajuan dalam satu query IN (...):
+    {pengajuan_id: [(nama_santri, nis, nomor_ijazah, tahun, jenjang), ...]}.
+    """
+    ids = [int(i) for i in pengajuan_ids]
+    hasil = {i: [] for i in ids}
+    if not ids:
+        return hasil
+    with _conn() as conn:
+        c = conn.cursor()
+        c.execute(f"""
+            SELECT pengajuan_id, nama_santri, nis, nomor_ijazah, tahun, jenjang
+            FROM nomor_ijazah WHERE pengajuan_id IN ({', '.join('?' for _ in ids)})
+            ORDER BY pengajuan_id, id ASC
+        """, ids)
+        for r in c.fetchall():
+            hasil[r[0]].append(tuple(r[1:]))
     return hasil
 
+def list_pengajuan_ditetapkan(mdt_id=None, cursor=None, per_page=None):
+    """Satu halaman (keyset) pengajuan 'Ditetapkan', terbaru dulu."""
+    where, params = "status='Ditetapkan'", []
+    if mdt_id is not None:
+        where += " AND mdt_id=?"
+        params.append(mdt_id)
+    with _conn() as conn:
+        return keyset_page(conn, """
+            SELECT id, nomor_batch, nama_mdt, status, tahun_pelajaran, jenjang
+            FROM pengajuan
+        """, where, params, cursor, per_page)
+
+def _hasil_dict(r):
+    file_path = r[7]
+    if file_path:
+        file_path = os.path.basename(file_path.replace("\\", "/"))
+    return {
+        "id": r[0],
+        "nama_mdt": r[1],
+        "jenjang": r[2],
+        "tahun": r[3],
+        "jumlah": r[4],
+        "kabupaten": r[5],
+        "batch": r[6],
+        "file_path": file_path
+    }
+
+def list_hasil_penetapan(kode_mdt=None, kabupaten=None, jenjang=None, cursor=None, per_page=None,
+                         tahun=None, dari=None, sampai=None, filt=None):
+    """
+    Satu halaman hasil penetapan. kabupaten/jenjang/tahun boleh satu nilai atau
+    list; dari/sampai = rentang tanggal penetapan. `filt` (dari
+    facet_service.parse_filter) menggantikan argumen filter satu per satu.
+    """
+    if filt is None:
+        filt = make_filter(kode_mdt, kabupaten, jenjang, tahun, dari, sampai)
+    where, params = where_hasil(filt)
+
+    with _conn() as conn:
+        page = keyset_page(conn, """
+            SELECT id, nama_mdt, jenjang, tahun_pelajaran, jumlah_lulus, kabupaten,
+                   nomor_batch, COALESCE(file_hasil, file_lulusan)
+            FROM pengajuan
+        """, where, params, cursor, per_page)
+    return page.map(_hasil_dict)
+
 def list_kabupaten():
     with _conn() as conn:
         c = conn.cursor()
         c.execute("SELECT nama_kabupaten FROM master_kabupaten ORDER BY nama_kabupaten ASC")
         return [r[0] for r in c.fetchall()]
 
-# ==========================================
-# 🔹 Hasil Penetapan (untuk MDT & Kanwil)
-# ==========================================
-def list_hasil_penetapan_by_role(role):
-    with _conn() as conn:
-        c = conn.cursor()
-        if role == "mdt":
-            c.execute("""
-                SELECT nomor_batch, nama_mdt, jenjang, tahun_pelajaran,
-                       jumlah_lulus, kabupaten, tanggal_penetapan
-                FROM pengajuan
-                WHERE status='Ditetapkan'
-                ORDER BY id DESC
-            """)
-        else:  # Kanwil
-            c.execute("""
-                SELECT nomor_batch, nama_mdt, jenjang, tahun_pelajaran,
-                       jumlah_lulus, kabupaten, tanggal_penetapan, verifikator
-                FROM pengajuan
-                WHERE status='Ditetapkan'
-                ORDER BY id DESC
-            """)
-        return c.fetchall()
-
-
 # ======================
 # KANKEMENAG: VERIFIKASI
 # ======================
-def list_pengajuan_for_kemenag():
+def list_pengajuan_for_kemenag(cursor=None, per_page=None):
     with _conn() as conn:
-        c = conn.cursor()
-        c.execute("""
+        return keyset_page(conn, """
             SELECT id, nama_mdt, jenjang, tahun_pelajaran, jumlah_lulus,
                    file_lulusan, status, kabupaten
             FROM pengajuan
-            WHERE status = 'Menunggu'
-            ORDER BY id DESC
-        """)
-        return c.fetchall()
-
+        """, "status = 'Menunggu'", [], cursor, per_page)
 
 # =========================================================
 # 🔸 Fungsi update status verifikasi dari Kemenag
 # =========================================================
-def update_status_pengajuan(pengajuan_id, status, alasan=None, verifikator=None):
-    now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-    status_clean = status.strip().lower()
+def _status_final(status):
+    status_clean = (status or "").strip().lower()
     if status_clean in ["diverifikasi", "verifikasi", "setuju", "ya", "acc", "approve"]:
-        status_final = "Diverifikasi"
+        return "Diverifikasi"
     elif status_clean in ["tolak", "ditolak", "tidak", "no"]:
-        status_final = "Ditolak"
-    else:
-        status_final = "Menunggu"
+        return "Ditolak"
+    return "Menunggu"
+
+def update_status_pengajuan(pengajuan_id, status, alasan=None, verifikator=None):
+    now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    status_final = _status_final(status)
 
     with _conn() as conn:
         c = conn.cursor()
@@ -312,91 +309,99 @@ def update_status_pengajuan(pengajuan_id, status, alasan=None, verifikator=None)
         """, (status_final, alasan, verifikator, now, pengajuan_id))
 
         # Simpan log riwayat di koneksi yang sama
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS riwayat_verifikasi (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                pengajuan_id INTEGER,
-                nama_mdt TEXT,
-                jenjang TEXT,
-                tahun TEXT,
-                jumlah_lulus INTEGER,
-                status TEXT,
-                alasan TEXT,
-                verifikator TEXT,
-                tanggal_verifikasi TEXT
-            )
-        """)
         c.execute("""
             INSERT INTO riwayat_verifikasi
-            (pengajuan_id, nama_mdt, jenjang, tahun, jumlah_lulus, status, alasan, verifikator, tanggal_verifikasi)
+            (pengajuan_id, nama_mdt, jenjang, tahun_pelajaran, jumlah_lulus, status, alasan, verifikator, tanggal_verifikasi)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (pengajuan_id, nama_mdt, jenjang, tahun, jumlah_lulus, status_final, alasan, verifikator, now))
 
         conn.commit()
         
-# =========================================
-# 🔹 SIMPAN LOG RIWAYAT VERIFIKASI
-# =========================================
-def simpan_riwayat_verifikasi(pengajuan_id, nama_mdt, jenjang, tahun, jumlah_lulus, status, alasan, verifikator):
+# =========================================================
+# 🔸 Verifikasi massal (Kankemenag)
+# =========================================================
+BULK_CHUNK = 300  # baris VALUES per statement (batas parameter SQLite)
+
+def update_status_pengajuan_bulk(items, verifikator=None):
+    """
+    Verifikasi banyak pengajuan sekaligus: items = [(pengajuan_id, status, alasan), ...].
+
+    Satu transaksi: UPDATE pengajuan berbasis himpunan (UPDATE ... FROM VALUES,
+    per potongan BULK_CHUNK) hanya untuk pengajuan yang masih 'Menunggu',
+    RETURNING data yang dibutuhkan riwayat, lalu satu executemany ke
+    riwayat_verifikasi. Mengembalikan {"diperbarui": [id...], "dilewati": [id...]}.
+
+    Statement sengaja diawali UPDATE (bukan WITH ... UPDATE): modul sqlite3
+    hanya membuka BEGIN implisit untuk INSERT/UPDATE/DELETE/REPLACE, jadi
+    bentuk WITH akan ter-commit per potongan dan rollback tidak berarti.
+    Kolom VALUES tanpa alias bernama column1..3 di SQLite maupun PostgreSQL.
+    """
     now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    baris = {}
+    for pengajuan_id, status, alasan in items:
+        status_final = _status_final(status)
+        if status_final == "Menunggu":
+            raise ValueError(f"Status tidak dikenal untuk pengajuan {pengajuan_id}: {status!r}")
+        baris[int(pengajuan_id)] = (status_final, (alasan or "").strip() or None)
+    if not baris:
+        return {"diperbarui": [], "dilewati": []}
+
+    data = list(baris.items())
+    riwayat = []
     with _conn() as conn:
         c = conn.cursor()
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS riwayat_verifikasi (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                pengajuan_id INTEGER,
-                nama_mdt TEXT,
-                jenjang TEXT,
-                tahun TEXT,
-                jumlah_lulus INTEGER,
-                status TEXT,
-                alasan TEXT,
-                verifikator TEXT,
-                tanggal_verifikasi TEXT
-            )
-        """)
-        c.execute("""
-            INSERT INTO riwayat_verifikasi 
-            (pengajuan_id, nama_mdt, jenjang, tahun, jumlah_lulus, status, alasan, verifikator, tanggal_verifikasi)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (pengajuan_id, nama_mdt, jenjang, tahun, jumlah_lulus, status, alasan, verifikator, now))
-        conn.commit()
+        try:
+            for i in range(0, len(data), BULK_CHUNK):
+                potongan = data[i:i + BULK_CHUNK]
+                # CAST: di PostgreSQL kolom VALUES tanpa tipe dianggap text
+                values = ", ".join("(CAST(? AS INTEGER), ?, ?)" for _ in potongan)
+                params = [v for pid, (st, al) in potongan for v in (pid, st, al)]
+                c.execute(f"""
+                    UPDATE pengajuan
+                    SET status=v.column2, alasan=v.column3, verifikator=?, tanggal_verifikasi=?
+                    FROM (VALUES {values}) AS v
+                    WHERE pengajuan.id = v.column1 AND pengajuan.status = 'Menunggu'
+                    RETURNING pengajuan.id, pengajuan.nama_mdt, pengajuan.jenjang,
+                              pengajuan.tahun_pelajaran, pengajuan.jumlah_lulus,
+                              pengajuan.status, pengajuan.alasan
+                """, [verifikator, now] + params)
+                riwayat.extend(c.fetchall())
+
+            c.executemany("""
+                INSERT INTO riwayat_verifikasi
+                (pengajuan_id, nama_mdt, jenjang, tahun_pelajaran, jumlah_lulus, status, alasan, verifikator, tanggal_verifikasi)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [tuple(r) + (verifikator, now) for r in riwayat])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    diperbarui = sorted(r[0] for r in riwayat)
+    return {"diperbarui": diperbarui, "dilewati": sorted(set(baris) - set(diperbarui))}
 
 # =========================================
 # 🔹 RIWAYAT KHUSUS UNTUK HALAMAN RIWAYAT
 # =========================================
-def list_riwayat_verifikasi_kemenag():
+def list_riwayat_verifikasi_kemenag(cursor=None, per_page=None):
     with _conn() as conn:
-        c = conn.cursor()
-        # Pastikan tabel riwayat ada (biar gak error no such table)
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS riwayat_verifikasi (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                pengajuan_id INTEGER,
-                nama_mdt TEXT,
-                jenjang TEXT,
-                tahun TEXT,
-                status TEXT,
-                alasan TEXT,
-                verifikator TEXT,
-                tanggal_verifikasi TEXT
-            )
-        """)
-
-        # Ambil semua riwayat dengan urutan terbaru
-        c.execute("""
-            SELECT 
+        # Riwayat terbaru dulu, keyset pada (tanggal_verifikasi, id) → idx_riwayat_tanggal_id.
+        # Kolom dibandingkan mentah (tanpa COALESCE) supaya index terpakai; NULL
+        # lama sudah diisi migrasi 014 dan baris baru selalu bertanggal.
+        return keyset_page(conn, """
+            SELECT
                 nama_mdt,      -- [0]
                 jenjang,       -- [1]
-                tahun,         -- [2]
-                NULL,          -- [3] (jumlah lulus tidak disimpan di sini)
+                tahun_pelajaran, -- [2]
+                jumlah_lulus,  -- [3]
                 status,        -- [4]
                 alasan,        -- [5]
                 verifikator,   -- [6]
-                tanggal_verifikasi -- [7]
+                tanggal_verifikasi, -- [7]
+                id             -- [8]
             FROM riwayat_verifikasi
-            ORDER BY tanggal_verifikasi DESC
-        """)
-        return c.fetchall()
+        """, "tanggal_verifikasi IS NOT NULL", [], cursor, per_page,
+            order_by=("tanggal_verifikasi", "id"),
+            key=lambda r: (r[7], r[8]))
 
 
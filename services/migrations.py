@@ -0,0 +1,680 @@
+# services/migrations.py
+"""
+Runner migrasi skema bernomor versi (SQLite & PostgreSQL).
+
+Menggantikan blok `ALTER TABLE ... except OperationalError: pass` yang
+tersebar di app_gateway.init_db / mdt_service.init_db. Tiap migrasi punya
+nomor versi; versi yang sudah jalan dicatat di tabel `schema_migrations`,
+jadi saat start aplikasi cukup satu SELECT bila skema sudah terbaru.
+
+Migrasi yang belum bisa jalan karena datanya (mis. nomor ijazah ganda untuk
+index unik) raise MigrasiTertunda: saat start aplikasi migrasi itu dilewati
+dengan peringatan dan dicoba lagi di start berikutnya, migrasi lain tetap
+jalan. Lewat CLI, MigrasiTertunda menggagalkan migrasi.
+
+Menambah migrasi: tulis fungsi `_mNNN_nama(db)` lalu daftarkan di MIGRATIONS
+dengan versi berikutnya. Jangan ubah migrasi yang sudah pernah dirilis.
+DDL ditulis langsung di migrasinya (bentuk pada versi itu), bukan memanggil
+fungsi service yang bisa berubah; migrasi juga tidak boleh berat — konversi
+data besar (mis. file upload lama ke storage berbasis isi) dijalankan
+terpisah: python -m services.storage --konversi-upload-lama
+
+CLI:
+    python -m services.migrations              # migrasi SQLite (SINDI_DB_PATH)
+    python -m services.migrations --postgres   # migrasi PostgreSQL (DATABASE_URL)
+    python -m services.migrations --plan       # + bandingkan query plan sebelum/sesudah
+"""
+import os, sys, sqlite3, datetime, threading
+
+from services.db_pool import sqlite_connection, DB_PATH, BASE_DIR
+
+
+class MigrasiTertunda(Exception):
+    """Migrasi belum bisa diterapkan karena data yang ada; perlu dibereskan manual."""
+
+
+# ======================
+# DIALEK
+# ======================
+class _Db:
+    """Koneksi + dialek; execute() menerjemahkan DDL/placeholder SQLite ke PostgreSQL."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.sqlite = isinstance(getattr(conn, "raw", conn), sqlite3.Connection)
+        self.ph = "?" if self.sqlite else "%s"
+
+    def translate(self, sql):
+        if self.sqlite:
+            return sql
+        return (sql.replace("INTEGER PRIMARY KEY AUTOINCREMENT", "SERIAL PRIMARY KEY")
+                   .replace(" REAL", " DOUBLE PRECISION")
+                   .replace("?", "%s"))
+
+    def execute(self, sql, params=()):
+        c = self.conn.cursor()
+        c.execute(self.translate(sql), params)
+        return c
+
+    def columns(self, table):
+        if self.sqlite:
+            return {r[1] for r in self.execute(f"PRAGMA table_info({table})").fetchall()}
+        c = self.execute(
+            "SELECT column_name FROM information_schema.columns WHERE table_name=?", (table,)
+        )
+        return {r[0] for r in c.fetchall()}
+
+    def add_columns(self, table, kolom):
+        """Tambah kolom yang belum ada: kolom = [(nama, tipe), ...]."""
+        ada = self.columns(table)
+        for nama, tipe in kolom:
+            if nama not in ada:
+                self.execute(f"ALTER TABLE {table} ADD COLUMN {nama} {tipe}")
+
+    def index(self, nama, table, kolom, unique=False):
+        self.execute(
+            f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {nama} ON {table} ({kolom})"
+        )
+
+
+# ======================
+# MIGRASI
+# ======================
+def _m001_skema_dasar(db):
+    """Tabel inti + semua kolom yang dulu ditambah lewat ALTER TABLE ad-hoc."""
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE,
+            password TEXT,
+            role TEXT,
+            kode_mdt TEXT,
+            wilayah TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS pengajuan (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nama_mdt TEXT,
+            jenjang TEXT,
+            tahun_pelajaran TEXT,
+            jumlah_lulus INTEGER,
+            file_lulusan TEXT,
+            tanggal_pengajuan TEXT,
+            status TEXT,
+            nomor_batch TEXT
+        )
+    """)
+    db.add_columns("pengajuan", [
+        ("tanggal_pengajuan", "TEXT"),
+        ("rekomendasi_file", "TEXT"),
+        ("file_hasil", "TEXT"),
+        ("mdt_id", "INTEGER"),
+        ("kabupaten", "TEXT"),
+        ("alasan", "TEXT"),
+        ("tanggal_verifikasi", "TEXT"),
+        ("verifikator", "TEXT"),
+    ])
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS nomor_ijazah (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pengajuan_id INTEGER,
+            nama_santri TEXT,
+            nis TEXT,
+            nomor_ijazah TEXT,
+            tahun TEXT,
+            jenjang TEXT
+        )
+    """)
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS riwayat_verifikasi (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pengajuan_id INTEGER,
+            nama_mdt TEXT,
+            jenjang TEXT,
+            tahun TEXT,
+            jumlah_lulus INTEGER,
+            status TEXT,
+            alasan TEXT,
+            verifikator TEXT,
+            tanggal_verifikasi TEXT
+        )
+    """)
+    # database hasil reset_sindi_db.py memakai tahun_pelajaran, kode aplikasi memakai tahun
+    db.add_columns("riwayat_verifikasi", [("tahun", "TEXT"), ("tahun_pelajaran", "TEXT")])
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS master_kabupaten (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nama_kabupaten TEXT NOT NULL UNIQUE,
+            provinsi TEXT NOT NULL
+        )
+    """)
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS master_jenjang (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nama_jenjang TEXT NOT NULL UNIQUE
+        )
+    """)
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS log_aktivitas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT,
+            aksi TEXT,
+            waktu TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def _m002_nomor_sequence(db):
+    """Counter nomor urut per (kode_jenjang, tahun) untuk services/nomor_sequence.py."""
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS nomor_ijazah_seq (
+            kode_jenjang TEXT NOT NULL,
+            tahun TEXT NOT NULL,
+            last_value INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (kode_jenjang, tahun)
+        )
+    """)
+
+
+def _m003_penetapan_job(db):
+    """Antrian job services/job_service.py (penetapan satuan & massal)."""
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS penetapan_job (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pengajuan_id INTEGER,
+            jenis TEXT NOT NULL DEFAULT 'satu',
+            status TEXT NOT NULL DEFAULT 'antri',
+            progress INTEGER NOT NULL DEFAULT 0,
+            pesan TEXT,
+            hasil_file TEXT,
+            parameter TEXT,
+            laporan TEXT,
+            diajukan_oleh TEXT,
+            worker TEXT,
+            heartbeat REAL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT,
+            started_at TEXT,
+            finished_at TEXT
+        )
+    """)
+    db.index("idx_penetapan_job_status", "penetapan_job", "status, id")
+    db.index("idx_penetapan_job_pengajuan", "penetapan_job", "pengajuan_id, id")
+
+
+def _m004_santri_lulusan(db):
+    """Baris santri yang di-stage saat upload (services/santri_service.py)."""
+    db.add_columns("pengajuan", [("kolom_lulusan", "TEXT"), ("jumlah_santri", "INTEGER")])
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS santri_lulusan (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pengajuan_id INTEGER NOT NULL,
+            baris INTEGER NOT NULL,
+            nama_santri TEXT,
+            nis TEXT,
+            data TEXT
+        )
+    """)
+    db.index("idx_santri_lulusan_pengajuan", "santri_lulusan", "pengajuan_id, baris", unique=True)
+    db.index("idx_santri_lulusan_nis", "santri_lulusan", "nis, pengajuan_id")
+    db.index("idx_nomor_ijazah_nis", "nomor_ijazah", "nis")
+
+
+def _m005_index_akses(db):
+    """Index komposit sesuai pola query daftar/riwayat/hasil."""
+    # antrian verifikasi/penetapan/hasil: WHERE status=? ORDER BY id DESC
+    db.index("idx_pengajuan_status", "pengajuan", "status, id")
+    # filter penetapan & hasil Kanwil: status + kabupaten (+ jenjang)
+    db.index("idx_pengajuan_status_kab_jenjang", "pengajuan", "status, kabupaten, jenjang, id")
+    db.index("idx_pengajuan_status_jenjang", "pengajuan", "status, jenjang, id")
+    # daftar pengajuan milik MDT: WHERE mdt_id=? ORDER BY id DESC
+    db.index("idx_pengajuan_mdt", "pengajuan", "mdt_id, id")
+    # hasil MDT: WHERE status='Ditetapkan' AND nama_mdt=?
+    db.index("idx_pengajuan_status_nama_mdt", "pengajuan", "status, nama_mdt, id")
+    # get_nomor_ijazah_by_pengajuan_ids: WHERE pengajuan_id IN (...) ORDER BY id
+    db.index("idx_nomor_ijazah_pengajuan", "nomor_ijazah", "pengajuan_id, id")
+    # riwayat verifikasi: ORDER BY tanggal_verifikasi DESC
+    db.index("idx_riwayat_tanggal", "riwayat_verifikasi", "tanggal_verifikasi")
+    db.index("idx_riwayat_pengajuan", "riwayat_verifikasi", "pengajuan_id")
+
+
+# Kunci counter statistik: NULL disimpan sebagai 0 / '' supaya UPSERT tetap bentrok di PK
+_STAT_KEY_NEW = ("COALESCE(NEW.mdt_id, 0), COALESCE(NEW.kabupaten, ''), "
+                 "COALESCE(NEW.jenjang, ''), COALESCE(NEW.status, '')")
+_STAT_KEY_OLD = _STAT_KEY_NEW.replace("NEW.", "OLD.")
+
+
+def _stat_upsert(key, delta):
+    return f"""
+        INSERT INTO statistik_pengajuan (mdt_id, kabupaten, jenjang, status, jumlah)
+        VALUES ({key}, {delta})
+        ON CONFLICT (mdt_id, kabupaten, jenjang, status)
+        DO UPDATE SET jumlah = statistik_pengajuan.jumlah + ({delta});
+    """
+
+
+def _m006_statistik_pengajuan(db):
+    """
+    Counter status pengajuan untuk dashboard (services/statistik_service.py):
+    tabel + trigger di pengajuan, lalu isi awal dari data yang ada.
+    """
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS statistik_pengajuan (
+            mdt_id INTEGER NOT NULL DEFAULT 0,
+            kabupaten TEXT NOT NULL DEFAULT '',
+            jenjang TEXT NOT NULL DEFAULT '',
+            status TEXT NOT NULL DEFAULT '',
+            jumlah INTEGER NOT NULL DEFAULT 0,
+            jumlah_santri INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (mdt_id, kabupaten, jenjang, status)
+        )
+    """)
+
+    if db.sqlite:
+        db.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_statistik_pengajuan_insert
+            AFTER INSERT ON pengajuan
+            BEGIN {_stat_upsert(_STAT_KEY_NEW, 1)} END
+        """)
+        db.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_statistik_pengajuan_delete
+            AFTER DELETE ON pengajuan
+            BEGIN {_stat_upsert(_STAT_KEY_OLD, -1)} END
+        """)
+        db.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_statistik_pengajuan_update
+            AFTER UPDATE OF status, mdt_id, kabupaten, jenjang ON pengajuan
+            WHEN COALESCE(OLD.status, '') <> COALESCE(NEW.status, '')
+              OR COALESCE(OLD.mdt_id, 0) <> COALESCE(NEW.mdt_id, 0)
+              OR COALESCE(OLD.kabupaten, '') <> COALESCE(NEW.kabupaten, '')
+              OR COALESCE(OLD.jenjang, '') <> COALESCE(NEW.jenjang, '')
+            BEGIN {_stat_upsert(_STAT_KEY_OLD, -1)} {_stat_upsert(_STAT_KEY_NEW, 1)} END
+        """)
+    else:
+        # badan fungsi plpgsql tidak diterjemahkan (tidak ada placeholder)
+        db.conn.cursor().execute(f"""
+            CREATE OR REPLACE FUNCTION fn_statistik_pengajuan() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    {_stat_upsert(_STAT_KEY_OLD, -1)}
+                END IF;
+                IF TG_OP IN ('UPDATE', 'INSERT') THEN
+                    {_stat_upsert(_STAT_KEY_NEW, 1)}
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        """)
+        db.execute("DROP TRIGGER IF EXISTS trg_statistik_pengajuan ON pengajuan")
+        db.conn.cursor().execute("""
+            CREATE TRIGGER trg_statistik_pengajuan
+            AFTER INSERT OR DELETE OR UPDATE OF status, mdt_id, kabupaten, jenjang ON pengajuan
+            FOR EACH ROW EXECUTE FUNCTION fn_statistik_pengajuan()
+        """)
+
+    db.execute("DELETE FROM statistik_pengajuan")
+    db.execute("""
+        INSERT INTO statistik_pengajuan (mdt_id, kabupaten, jenjang, status, jumlah, jumlah_santri)
+        SELECT COALESCE(p.mdt_id, 0), COALESCE(p.kabupaten, ''), COALESCE(p.jenjang, ''),
+               COALESCE(p.status, ''), COUNT(*), COALESCE(SUM(n.jumlah), 0)
+        FROM pengajuan p
+        LEFT JOIN (
+            SELECT pengajuan_id, COUNT(*) AS jumlah FROM nomor_ijazah GROUP BY pengajuan_id
+        ) n ON n.pengajuan_id = p.id
+        GROUP BY COALESCE(p.mdt_id, 0), COALESCE(p.kabupaten, ''), COALESCE(p.jenjang, ''),
+                 COALESCE(p.status, '')
+    """)
+
+
+def _m007_facet_hasil(db):
+    """Tanggal penetapan tersendiri + index untuk facet/rentang tanggal hasil Kanwil."""
+    db.add_columns("pengajuan", [("tanggal_penetapan", "TEXT")])
+    # dulu waktu penetapan ditulis ke tanggal_verifikasi
+    db.execute("""
+        UPDATE pengajuan SET tanggal_penetapan = tanggal_verifikasi
+        WHERE status='Ditetapkan' AND tanggal_penetapan IS NULL
+    """)
+    # GROUP BY tahun & filter rentang tanggal: WHERE status='Ditetapkan' ...
+    db.index("idx_pengajuan_status_tahun", "pengajuan", "status, tahun_pelajaran, id")
+    db.index("idx_pengajuan_status_tanggal_penetapan", "pengajuan", "status, tanggal_penetapan")
+
+
+def _m008_pencarian_ijazah(db):
+    """
+    Indeks pencarian services/search_service.py: FTS5 (content table +
+    trigger) di SQLite, pg_trgm di PostgreSQL; isi awal dari nomor_ijazah.
+    """
+    if not db.sqlite:
+        db.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        db.execute("CREATE INDEX IF NOT EXISTS idx_nomor_ijazah_nama_trgm ON nomor_ijazah USING gin (nama_santri gin_trgm_ops)")
+        db.execute("CREATE INDEX IF NOT EXISTS idx_nomor_ijazah_nomor_trgm ON nomor_ijazah USING gin (nomor_ijazah gin_trgm_ops)")
+        db.execute("CREATE INDEX IF NOT EXISTS idx_nomor_ijazah_nis_pola ON nomor_ijazah (nis text_pattern_ops)")
+        return
+
+    db.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS nomor_ijazah_fts USING fts5 (
+            nama_santri, nis, nomor_ijazah,
+            content='nomor_ijazah', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+    """)
+    db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS nomor_ijazah_fts_vocab USING fts5vocab (nomor_ijazah_fts, 'row')")
+    db.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_nomor_ijazah_fts_insert AFTER INSERT ON nomor_ijazah
+        BEGIN
+            INSERT INTO nomor_ijazah_fts (rowid, nama_santri, nis, nomor_ijazah)
+            VALUES (NEW.id, NEW.nama_santri, NEW.nis, NEW.nomor_ijazah);
+        END
+    """)
+    db.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_nomor_ijazah_fts_delete AFTER DELETE ON nomor_ijazah
+        BEGIN
+            INSERT INTO nomor_ijazah_fts (nomor_ijazah_fts, rowid, nama_santri, nis, nomor_ijazah)
+            VALUES ('delete', OLD.id, OLD.nama_santri, OLD.nis, OLD.nomor_ijazah);
+        END
+    """)
+    db.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_nomor_ijazah_fts_update
+        AFTER UPDATE OF nama_santri, nis, nomor_ijazah ON nomor_ijazah
+        BEGIN
+            INSERT INTO nomor_ijazah_fts (nomor_ijazah_fts, rowid, nama_santri, nis, nomor_ijazah)
+            VALUES ('delete', OLD.id, OLD.nama_santri, OLD.nis, OLD.nomor_ijazah);
+            INSERT INTO nomor_ijazah_fts (rowid, nama_santri, nis, nomor_ijazah)
+            VALUES (NEW.id, NEW.nama_santri, NEW.nis, NEW.nomor_ijazah);
+        END
+    """)
+    db.execute("INSERT INTO nomor_ijazah_fts (nomor_ijazah_fts) VALUES ('rebuild')")
+
+
+def _m009_nomor_ijazah_unik(db):
+    """Nomor ijazah unik: lookup verifikasi publik jadi satu seek index."""
+    ganda = db.execute("""
+        SELECT nomor_ijazah, COUNT(*) FROM nomor_ijazah
+        WHERE nomor_ijazah IS NOT NULL
+        GROUP BY nomor_ijazah HAVING COUNT(*) > 1 LIMIT 5
+    """).fetchall()
+    if ganda:
+        contoh = ", ".join(f"{r[0]} ({r[1]}x)" for r in ganda)
+        raise MigrasiTertunda(f"Ada nomor ijazah ganda, perbaiki dulu: {contoh}")
+    db.index("idx_nomor_ijazah_nomor", "nomor_ijazah", "nomor_ijazah", unique=True)
+
+
+def _m010_riwayat_verifikasi_seragam(db):
+    """
+    Satu definisi riwayat_verifikasi: tahun ajaran di kolom tahun_pelajaran
+    (kolom `tahun` lama diisi-balik lalu tidak dipakai lagi), dan riwayat
+    hanya ditulis eksplisit oleh update_status_pengajuan(_bulk) — trigger
+    after_pengajuan_status_update dari reset_sindi_db.py membuat baris ganda.
+    """
+    db.add_columns("riwayat_verifikasi", [
+        ("pengajuan_id", "INTEGER"), ("nama_mdt", "TEXT"), ("jenjang", "TEXT"),
+        ("tahun_pelajaran", "TEXT"), ("jumlah_lulus", "INTEGER"), ("status", "TEXT"),
+        ("alasan", "TEXT"), ("verifikator", "TEXT"), ("tanggal_verifikasi", "TEXT"),
+    ])
+    if "tahun" in db.columns("riwayat_verifikasi"):
+        db.execute("""
+            UPDATE riwayat_verifikasi SET tahun_pelajaran = tahun
+            WHERE tahun_pelajaran IS NULL AND tahun IS NOT NULL
+        """)
+    if db.sqlite:
+        db.execute("DROP TRIGGER IF EXISTS after_pengajuan_status_update")
+    else:
+        db.execute("DROP TRIGGER IF EXISTS after_pengajuan_status_update ON pengajuan")
+
+
+def _m011_file_hasil_per_pengajuan(db):
+    """
+    Nama file hasil unik per pengajuan (HASIL_..._{id}.xlsx); isinya dirender
+    saat diminta oleh services/export_service.py, bukan ditulis saat penetapan.
+    """
+    hasil_dir = os.path.join(BASE_DIR, "hasil_excel")
+    rows = db.execute("""
+        SELECT id, nama_mdt, tahun_pelajaran, jenjang FROM pengajuan WHERE status='Ditetapkan'
+    """).fetchall()
+    for pengajuan_id, nama_mdt, tahun, jenjang in rows:
+        safe_nama = (nama_mdt or "MDT").replace(" ", "_").replace("/", "_")
+        safe_tahun = str(tahun).replace("/", "-")
+        nama = f"HASIL_{safe_nama}_{safe_tahun}_{jenjang}_{pengajuan_id}.xlsx"
+        db.execute("UPDATE pengajuan SET file_hasil=? WHERE id=?", (os.path.join(hasil_dir, nama), pengajuan_id))
+
+
+
+def _m012_index_riwayat_keyset(db):
+    """
+    Riwayat verifikasi berhalaman keyset (tanggal_verifikasi, id) DESC: index
+    dua kolom supaya tiap halaman satu seek, bukan scan + sort. Index lama
+    (tanggal_verifikasi saja) adalah prefix-nya, jadi dibuang.
+    """
+    db.index("idx_riwayat_tanggal_id", "riwayat_verifikasi", "tanggal_verifikasi, id")
+    db.execute("DROP INDEX IF EXISTS idx_riwayat_tanggal")
+
+
+
+def _m013_riwayat_tanggal_terisi(db):
+    """
+    Riwayat lama tanpa tanggal_verifikasi: isi dari pengajuan (atau '' =
+    paling lama) supaya keyset (tanggal_verifikasi, id) tidak perlu COALESCE.
+    Baris baru selalu ditulis dengan tanggal oleh update_status_pengajuan(_bulk).
+    """
+    db.execute("""
+        UPDATE riwayat_verifikasi SET tanggal_verifikasi = COALESCE(
+            (SELECT p.tanggal_verifikasi FROM pengajuan p WHERE p.id = riwayat_verifikasi.pengajuan_id), '')
+        WHERE tanggal_verifikasi IS NULL
+    """)
+
+
+MIGRATIONS = [
+    (1, "skema_dasar", _m001_skema_dasar),
+    (2, "nomor_sequence", _m002_nomor_sequence),
+    (3, "penetapan_job", _m003_penetapan_job),
+    (4, "santri_lulusan", _m004_santri_lulusan),
+    (5, "index_akses", _m005_index_akses),
+    (6, "statistik_pengajuan", _m006_statistik_pengajuan),
+    (7, "facet_hasil", _m007_facet_hasil),
+    (8, "pencarian_ijazah", _m008_pencarian_ijazah),
+    (9, "nomor_ijazah_unik", _m009_nomor_ijazah_unik),
+    (10, "riwayat_verifikasi_seragam", _m010_riwayat_verifikasi_seragam),
+    (11, "file_hasil_per_pengajuan", _m011_file_hasil_per_pengajuan),
+    (12, "index_riwayat_keyset", _m012_index_riwayat_keyset),
+    (13, "riwayat_tanggal_terisi", _m013_riwayat_tanggal_terisi),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# ======================
+# RUNNER
+# ======================
+def _init_version_table(db):
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            nama TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+        )
+    """)
+
+
+def current_version(db):
+    c = db.execute("SELECT MAX(version) FROM schema_migrations")
+    row = c.fetchone()
+    return (row[0] if row else None) or 0
+
+
+def applied_versions(db):
+    return {r[0] for r in db.execute("SELECT version FROM schema_migrations").fetchall()}
+
+
+def _lock(db):
+    """Kunci tulis sampai commit, supaya worker gunicorn lain tidak migrasi bersamaan."""
+    if db.sqlite:
+        if db.conn.in_transaction:
+            db.conn.commit()
+        db.execute("BEGIN IMMEDIATE")
+    else:
+        db.execute("SELECT pg_advisory_xact_lock(?)", (7_312_001,))
+
+
+def run_migrations(conn, verbose=True, strict=False):
+    """
+    Jalankan migrasi yang belum diterapkan pada koneksi ini (SQLite atau
+    PostgreSQL). Tiap migrasi + catatan versinya satu transaksi.
+    MigrasiTertunda → migrasi itu dilewati dengan peringatan (strict=True:
+    diteruskan ke pemanggil). Mengembalikan daftar versi yang baru dijalankan.
+    """
+    db = _Db(conn)
+    _init_version_table(db)
+    conn.commit()
+    if {v for v, _, _ in MIGRATIONS} <= applied_versions(db):
+        return []
+
+    dijalankan = []
+    for version, nama, fn in MIGRATIONS:
+        _lock(db)
+        try:
+            if version in applied_versions(db):
+                conn.commit()
+                continue
+            fn(db)
+            db.execute(
+                "INSERT INTO schema_migrations (version, nama, applied_at) VALUES (?, ?, ?)",
+                (version, nama, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+            )
+            conn.commit()
+        except MigrasiTertunda as e:
+            conn.rollback()
+            if strict:
+                raise
+            print(f"⚠️ Migrasi {version:03d} {nama} ditunda: {e}")
+            continue
+        except Exception:
+            conn.rollback()
+            raise
+        dijalankan.append(version)
+        if verbose:
+            print(f"✅ Migrasi {version:03d} {nama} diterapkan")
+    return dijalankan
+
+
+_schema_siap = set()
+_schema_lock = threading.Lock()
+
+
+def ensure_schema(conn=None, verbose=True):
+    """
+    Bootstrap skema sekali per proses: cek versi (satu SELECT) lalu migrasi
+    bila tertinggal. Tanpa `conn` dipakai backend repository aktif. Hasilnya diingat per database, jadi pemanggilan
+    berikutnya tidak menyentuh database sama sekali — fungsi baca/tulis
+    cukup menjalankan DML tanpa CREATE TABLE IF NOT EXISTS.
+    """
+    from services.repository import get_repository, POSTGRES
+
+    if conn is None:
+        pg = get_repository().dialect == POSTGRES
+    else:
+        pg = not _Db(conn).sqlite
+    kunci = "pg" if pg else DB_PATH
+    if kunci in _schema_siap:
+        return []
+    with _schema_lock:
+        if kunci in _schema_siap:
+            return []
+        if conn is None:
+            with get_repository().connection() as own:
+                dijalankan = run_migrations(own, verbose)
+        else:
+            dijalankan = run_migrations(conn, verbose)
+        _schema_siap.add(kunci)
+    return dijalankan
+
+
+def migrate_sqlite(verbose=True):
+    with sqlite_connection() as conn:
+        return run_migrations(conn, verbose)
+
+
+def migrate_postgres(verbose=True):
+    from services.db_pool import pg_connection
+    with pg_connection() as conn:
+        return run_migrations(conn, verbose)
+
+
+# ======================
+# QUERY PLAN
+# ======================
+# Query representatif untuk tiap jalur akses (parameter contoh)
+ACCESS_PATHS = [
+    ("verifikasi Kankemenag",
+     "SELECT id FROM pengajuan WHERE status=? ORDER BY id DESC", ("Menunggu",)),
+    ("penetapan Kanwil (kabupaten+jenjang)",
+     "SELECT id FROM pengajuan WHERE status=? AND kabupaten=? AND jenjang=? ORDER BY id DESC",
+     ("Diverifikasi", "Kota Bandung", "Ula")),
+    ("hasil Kanwil (jenjang)",
+     "SELECT id FROM pengajuan WHERE status=? AND jenjang=? ORDER BY id DESC", ("Ditetapkan", "Ula")),
+    ("facet hasil (kabupaten)",
+     "SELECT kabupaten, COUNT(*) FROM pengajuan WHERE status=? GROUP BY kabupaten", ("Ditetapkan",)),
+    ("facet hasil (tahun)",
+     "SELECT tahun_pelajaran, COUNT(*) FROM pengajuan WHERE status=? GROUP BY tahun_pelajaran",
+     ("Ditetapkan",)),
+    ("hasil Kanwil (rentang tanggal penetapan)",
+     "SELECT id FROM pengajuan WHERE status=? AND tanggal_penetapan >= ? AND tanggal_penetapan < ?",
+     ("Ditetapkan", "2025-01-01", "2025-07-01")),
+    ("verifikasi publik nomor ijazah",
+     "SELECT id FROM nomor_ijazah WHERE nomor_ijazah=?", ("MDT-12-01-2024/2025-000001",)),
+    ("pengajuan milik MDT",
+     "SELECT id FROM pengajuan WHERE mdt_id=? ORDER BY id DESC", (1,)),
+    ("nomor ijazah per pengajuan",
+     "SELECT nama_santri, nis, nomor_ijazah FROM nomor_ijazah WHERE pengajuan_id=? ORDER BY id", (1,)),
+    ("riwayat verifikasi (halaman berikutnya)",
+     "SELECT id FROM riwayat_verifikasi WHERE (tanggal_verifikasi, id) < (?, ?)"
+     " ORDER BY tanggal_verifikasi DESC, id DESC LIMIT 50", ("2025-06-01 00:00:00", 1000)),
+]
+
+
+def explain_access_paths(conn):
+    """{nama_jalur: [baris plan, ...]} dari EXPLAIN QUERY PLAN / EXPLAIN."""
+    db = _Db(conn)
+    hasil = {}
+    for nama, sql, params in ACCESS_PATHS:
+        try:
+            if db.sqlite:
+                rows = db.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+                hasil[nama] = [r[-1] for r in rows]
+            else:
+                rows = db.execute(f"EXPLAIN {sql}", params).fetchall()
+                hasil[nama] = [r[0] for r in rows]
+        except Exception as e:  # tabel belum ada sebelum migrasi pertama
+            hasil[nama] = [f"(tidak bisa di-explain: {e})"]
+        if not db.sqlite:
+            conn.rollback()
+    return hasil
+
+
+def print_plan_diff(sebelum, sesudah):
+    for nama, _, _ in ACCESS_PATHS:
+        print(f"\n🔎 {nama}")
+        for baris in sebelum.get(nama, []):
+            print(f"   sebelum : {baris}")
+        for baris in sesudah.get(nama, []):
+            print(f"   sesudah : {baris}")
+
+
+def main(argv):
+    postgres = "--postgres" in argv
+    if postgres:
+        from services.db_pool import pg_connection as connect
+    else:
+        connect = sqlite_connection
+
+    with connect() as conn:
+        sebelum = explain_access_paths(conn) if "--plan" in argv else None
+        dijalankan = run_migrations(conn, strict=True)
+        print(f"📦 Skema di versi {current_version(_Db(conn))} "
+              f"({len(dijalankan)} migrasi baru dijalankan)")
+        if sebelum is not None:
+            print_plan_diff(sebelum, explain_access_paths(conn))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,76 @@
+# services/nomor_sequence.py
+"""
+Alokator nomor urut ijazah per namespace (kode jenjang + tahun).
+
+Nomor disimpan di tabel counter `nomor_ijazah_seq`; satu batch memesan N nomor
+berurutan dengan satu UPSERT ... RETURNING (O(1), atomik). Pemesanan ikut
+transaksi pemanggil, jadi bila insert nomor_ijazah di-rollback, counter ikut
+mundur → tidak ada nomor yang bolong atau dobel.
+
+`conn` adalah koneksi repository (services/repository.py): placeholder `?`
+dan potongan SQL per dialek diurus di sana.
+"""
+KODE_JENJANG = {"Ula": "I", "Wustha": "II", "Ulya": "III"}
+PREFIX_NOMOR = "MDT-12"
+PANJANG_URUT = 6
+
+
+def kode_jenjang(jenjang):
+    """Ula → I, Wustha → II, Ulya → III (selain itu I)."""
+    return KODE_JENJANG.get((jenjang or "").capitalize(), "I")
+
+
+# ======================
+# ALOKASI
+# ======================
+def _seed_value(conn, c, kode, tahun):
+    """
+    Nilai awal namespace baru = nomor urut tertinggi yang sudah terbit dengan
+    prefix yang sama (data lama sebelum ada counter). Hanya dipakai sekali.
+    Dibandingkan sebagai angka, bukan teks: "1000000" > "999999" walau
+    panjangnya melebihi PANJANG_URUT; akhiran yang bukan angka diabaikan.
+    """
+    prefix = f"{PREFIX_NOMOR}-{kode}-{tahun}-"
+    awal = len(prefix) + 1
+    angka = conn.sql(
+        sqlite="substr(nomor_ijazah, ?) NOT GLOB '*[^0-9]*'",
+        postgres="substr(nomor_ijazah, ?) ~ '^[0-9]+$'",
+    )
+    c.execute(f"""
+        SELECT MAX(CAST(substr(nomor_ijazah, ?) AS INTEGER))
+        FROM nomor_ijazah
+        WHERE nomor_ijazah LIKE ? AND {angka}
+    """, (awal, prefix + "%", awal))
+    row = c.fetchone()
+    return (row[0] if row else None) or 0
+
+
+def reserve_nomor_urut(conn, jenjang, tahun, jumlah):
+    """
+    Pesan `jumlah` nomor urut berurutan untuk (jenjang, tahun).
+    Mengembalikan nomor urut pertama; blok = [awal, awal + jumlah).
+    Tidak melakukan commit — pemanggil yang commit bersama insert nomor_ijazah.
+    """
+    jumlah = int(jumlah)
+    if jumlah <= 0:
+        raise ValueError("Jumlah nomor yang dipesan harus > 0.")
+
+    kode = kode_jenjang(jenjang)
+    c = conn.cursor()
+
+    c.execute(
+        "SELECT last_value FROM nomor_ijazah_seq WHERE kode_jenjang=? AND tahun=?",
+        (kode, tahun),
+    )
+    seed = 0 if c.fetchone() else _seed_value(conn, c, kode, tahun)
+
+    c.execute("""
+        INSERT INTO nomor_ijazah_seq (kode_jenjang, tahun, last_value)
+        VALUES (?, ?, ?)
+        ON CONFLICT (kode_jenjang, tahun)
+        DO UPDATE SET last_value = nomor_ijazah_seq.last_value + ?
+        RETURNING last_value
+    """, (kode, tahun, seed + jumlah, jumlah))
+    last_value = c.fetchone()[0]
+    return last_value - jumlah + 1
+
@@ -0,0 +1,102 @@
+# services/pagination.py
+"""
+Pagination keyset (cursor id) bersama untuk semua daftar.
+
+LIMIT/OFFSET makin lambat di halaman belakang karena database tetap harus
+melewati semua baris sebelumnya. Keyset melanjutkan dari kunci urutan baris
+terakhir (`WHERE id < ?` / `WHERE (tanggal, id) < (?, ?)`) sehingga tiap
+halaman = satu seek index + per_page baris, berapa pun panjang riwayatnya.
+
+    page = keyset_page(conn, "SELECT id, nama FROM pengajuan",
+                       where="status=?", params=["Menunggu"], cursor=cursor)
+    for row in page: ...            # Page adalah list biasa
+    page.next_cursor                # None bila halaman terakhir
+
+Cursor berupa string opak (base64 JSON) yang aman dipakai di query string.
+"""
+import os, json, base64, binascii
+
+PER_PAGE = int(os.getenv("LIST_PER_PAGE", "50"))
+MAX_PER_PAGE = 200
+
+
+class Page(list):
+    """Baris satu halaman + cursor halaman ini dan berikutnya."""
+
+    def __init__(self, items=(), cursor=None, next_cursor=None, per_page=PER_PAGE):
+        super().__init__(items)
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+        self.per_page = per_page
+
+    @property
+    def is_first(self):
+        return not self.cursor
+
+    @property
+    def has_more(self):
+        return self.next_cursor is not None
+
+    def map(self, fn):
+        """Page baru dengan tiap baris diubah fn, cursor tetap."""
+        return Page(map(fn, self), self.cursor, self.next_cursor, self.per_page)
+
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor, jumlah_kunci=1):
+    """List nilai kunci dari cursor; None bila kosong/tidak valid (→ halaman pertama)."""
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, binascii.Error):
+        return None
+    if not isinstance(values, list) or len(values) != jumlah_kunci:
+        return None
+    return values
+
+
+def clamp_per_page(per_page):
+    try:
+        per_page = int(per_page or PER_PAGE)
+    except (TypeError, ValueError):
+        per_page = PER_PAGE
+    return max(1, min(per_page, MAX_PER_PAGE))
+
+
+def keyset_page(conn, select, where="1=1", params=(), cursor=None, per_page=None,
+                order_by=("id",), key=None, descending=True):
+    """
+    Jalankan `select WHERE where [AND kunci < cursor] ORDER BY order_by LIMIT per_page+1`.
+
+    - order_by : kolom kunci urutan, kolom terakhir harus unik (biasanya id)
+    - key      : fungsi baris → tuple nilai kunci (default: kolom pertama baris)
+    - descending: terbaru dulu (default) atau urut naik
+    """
+    per_page = clamp_per_page(per_page)
+    key = key or (lambda row: (row[0],))
+    order_by = list(order_by)
+    params = list(params)
+
+    kunci = decode_cursor(cursor, len(order_by))
+    op, arah = ("<", "DESC") if descending else (">", "ASC")
+    if kunci is not None:
+        if len(order_by) == 1:
+            where = f"({where}) AND {order_by[0]} {op} ?"
+        else:
+            kolom = ", ".join(order_by)
+            where = f"({where}) AND ({kolom}) {op} ({', '.join('?' for _ in order_by)})"
+        params.extend(kunci)
+
+    urutan = ", ".join(f"{k} {arah}" for k in order_by)
+    c = conn.cursor()
+    c.execute(f"{select} WHERE {where} ORDER BY {urutan} LIMIT ?", params + [per_page + 1])
+    rows = c.fetchall()
+
+    next_cursor = encode_cursor(key(rows[per_page - 1])) if len(rows) > per_page else None
+    return Page(rows[:per_page], cursor=cursor if kunci is not None else None,
+                next_cursor=next_cursor, per_page=per_page)
@@ -0,0 +1,161 @@
+# services/pdf_service.py
+"""
+Mesin PDF daftar nomor ijazah per pengajuan (FPDF).
+
+Bagian statis surat dibangun sekali per proses (TemplateDaftar): logo
+static/logo_kemenag.png dikonversi sekali (Pillow) menjadi JPEG di cache —
+FPDF men-decode PNG ber-alpha baris per baris di Python (~0,4 detik per
+dokumen), sedangkan JPEG cukup dibaca header-nya; baris kop, lebar kolom dan
+judul tabel sudah dihitung. Per dokumen tinggal menggambar
+header/kop di tiap halaman dan menulis baris yang di-stream langsung dari
+cursor database (repository.stream) — baris santri tidak pernah dimuat ke
+list sekaligus.
+
+Cache file jadi per pengajuan ada di services/export_service.py (export_pdf,
+export_pdf_zip); modul ini hanya merender.
+"""
+import os, threading
+
+from fpdf import FPDF
+
+from services.db_pool import BASE_DIR
+from services.repository import get_repository
+
+try:
+    from PIL import Image
+except ImportError:  # tanpa Pillow logo PNG tetap dipakai (lebih lambat)
+    Image = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
+LOGO_PATH = os.path.join(STATIC_DIR, "logo_kemenag.png")
+LOGO_JPEG = os.path.join(BASE_DIR, "cache", "pdf", "logo_kemenag.jpg")
+
+KOP = [
+    ("B", 12, "KEMENTERIAN AGAMA REPUBLIK INDONESIA"),
+    ("B", 11, "KANTOR WILAYAH KEMENTERIAN AGAMA PROVINSI JAWA BARAT"),
+    ("", 9, "Daftar Nomor Ijazah Madrasah Diniyah Takmiliyah (MDT)"),
+]
+# (judul, lebar mm, perataan) — total 190 mm = A4 potret dikurangi margin 10 mm
+KOLOM = [
+    ("No", 12, "C"),
+    ("Nama Santri", 70, "L"),
+    ("NIS", 38, "L"),
+    ("Nomor Ijazah", 70, "L"),
+]
+TINGGI_BARIS = 6
+
+_template = None
+_template_lock = threading.Lock()
+
+
+def _teks(nilai):
+    """Font inti FPDF hanya latin-1; karakter lain diganti '?' (bukan error)."""
+    return str("" if nilai is None else nilai).encode("latin-1", "replace").decode("latin-1")
+
+
+def _siapkan_logo():
+    """Path logo untuk FPDF: JPEG hasil konversi (dibuat ulang bila PNG berubah), PNG asli, atau None."""
+    if not os.path.isfile(LOGO_PATH):
+        return None
+    if Image is None:
+        return LOGO_PATH
+    if os.path.isfile(LOGO_JPEG) and os.path.getmtime(LOGO_JPEG) >= os.path.getmtime(LOGO_PATH):
+        return LOGO_JPEG
+    os.makedirs(os.path.dirname(LOGO_JPEG), exist_ok=True)
+    with Image.open(LOGO_PATH) as img:
+        img = img.convert("RGBA")
+        latar = Image.new("RGB", img.size, (255, 255, 255))  # transparan → putih kertas
+        latar.paste(img, mask=img.getchannel("A"))
+        tmp = f"{LOGO_JPEG}.{os.getpid()}.tmp"
+        latar.save(tmp, "JPEG", quality=90)
+    os.replace(tmp, LOGO_JPEG)
+    return LOGO_JPEG
+
+
+class TemplateDaftar:
+    """Layout statis yang sama untuk semua dokumen; dibuat sekali per proses."""
+
+    def __init__(self):
+        self.logo = _siapkan_logo()
+        self.kop = [(gaya, ukuran, _teks(t)) for gaya, ukuran, t in KOP]
+        self.kolom = [(_teks(j), w, a) for j, w, a in KOLOM]
+
+
+def get_template():
+    global _template
+    if _template is None:
+        with _template_lock:
+            if _template is None:
+                _template = TemplateDaftar()
+    return _template
+
+
+class _DaftarPDF(FPDF):
+    def __init__(self, template, judul):
+        super().__init__("P", "mm", "A4")
+        self.template = template
+        self.judul = judul
+        self.set_margins(10, 10, 10)
+        self.set_auto_page_break(True, 15)
+        self.alias_nb_pages()
+
+    def header(self):
+        t = self.template
+        if t.logo is not None:
+            self.image(t.logo, 10, 8, 18)
+        self.set_xy(30, 9)
+        for gaya, ukuran, teks in t.kop:
+            self.set_font("Arial", gaya, ukuran)
+            self.cell(170, 5.5, teks, 0, 2, "C")
+        self.set_line_width(0.6)
+        self.line(10, 28, 200, 28)
+        self.set_line_width(0.2)
+
+        self.set_xy(10, 31)
+        self.set_font("Arial", "", 9)
+        for baris in self.judul:
+            self.cell(0, 5, baris, 0, 1)
+        self.ln(2)
+
+        self.set_font("Arial", "B", 9)
+        self.set_fill_color(220, 237, 224)
+        for judul, lebar, _ in t.kolom:
+            self.cell(lebar, 7, judul, 1, 0, "C", True)
+        self.ln()
+        self.set_font("Arial", "", 9)
+
+    def footer(self):
+        self.set_y(-12)
+        self.set_font("Arial", "I", 8)
+        self.cell(0, 5, f"Halaman {self.page_no()} dari {{nb}}", 0, 0, "C")
+
+
+def render_daftar_pdf(pengajuan_id, info, path):
+    """
+    Tulis PDF daftar nomor ijazah satu pengajuan ke `path`.
+    info: dict dari export_service (nama_mdt, tahun, jenjang, ...).
+    """
+    template = get_template()
+    judul = [
+        _teks(f"Nama MDT        : {info.get('nama_mdt') or '-'}"),
+        _teks(f"Jenjang / Tahun : {info.get('jenjang') or '-'} / {info.get('tahun') or '-'}"),
+        _teks(f"Jumlah santri   : {info.get('jumlah') or 0}"),
+    ]
+    pdf = _DaftarPDF(template, judul)
+    pdf.add_page()
+
+    rows = get_repository().stream(
+        "SELECT nama_santri, nis, nomor_ijazah FROM nomor_ijazah WHERE pengajuan_id=? ORDER BY id",
+        (pengajuan_id,),
+    )
+    try:
+        for no, row in enumerate(rows, start=1):
+            nilai = (no, row[0], row[1], row[2])
+            for (_, lebar, rata), v in zip(template.kolom, nilai):
+                pdf.cell(lebar, TINGGI_BARIS, _teks(v)[:60], 1, 0, rata)
+            pdf.ln()
+    finally:
+        rows.close()
+
+    pdf.output(path, "F")
+    return path
@@ -0,0 +1,131 @@
+# services/penetapan_bulk.py
+"""
+Penetapan massal oleh Kanwil: banyak pengajuan sekaligus, dipilih lewat daftar
+id atau filter (kabupaten/jenjang, sama seperti halaman /penetapan).
+
+Tiap pengajuan = satu transaksi penomoran lewat tetapkan_pengajuan. Santri
+sudah di-stage saat upload dan file hasil dirender saat diunduh
+(services/export_service.py), jadi isinya satu INSERT ... SELECT dari
+santri_lulusan — hampir seluruh pekerjaan ada di database:
+
+- PostgreSQL: batch dijalankan di process pool (PENETAPAN_BULK_WORKERS);
+  transaksi dari beberapa koneksi berjalan bersamaan, hanya batch dengan
+  jenjang + tahun yang sama yang antre di baris counter nomor_ijazah_seq;
+- SQLite: hanya ada satu penulis, proses tambahan cuma antre di kunci tulis,
+  jadi batch dijalankan berurutan di proses worker ini (tanpa pool).
+
+Hasil akhirnya satu laporan ringkas.
+"""
+import os, time, multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from services.repository import get_repository, POSTGRES
+
+BULK_WORKERS = int(os.getenv("PENETAPAN_BULK_WORKERS", "0")) or min(os.cpu_count() or 1, 4)
+
+
+def _conn():
+    return get_repository().connection()
+
+
+def select_pengajuan_ids(pengajuan_ids=None, kabupaten=None, jenjang=None):
+    """Id pengajuan berstatus 'Diverifikasi' yang cocok dengan daftar id / filter."""
+    query = "SELECT id FROM pengajuan WHERE status='Diverifikasi'"
+    params = []
+    if pengajuan_ids:
+        ids = [int(i) for i in pengajuan_ids]
+        query += f" AND id IN ({', '.join('?' for _ in ids)})"
+        params.extend(ids)
+    if kabupaten:
+        query += " AND kabupaten=?"
+        params.append(kabupaten)
+    if jenjang:
+        query += " AND jenjang=?"
+        params.append(jenjang)
+    query += " ORDER BY id ASC"
+
+    with _conn() as conn:
+        c = conn.cursor()
+        c.execute(query, params)
+        return [r[0] for r in c.fetchall()]
+
+
+def _tetapkan_satu(pengajuan_id):
+    """Satu batch = satu transaksi penomoran (di proses anak bila memakai pool)."""
+    from services.mdt_service import tetapkan_pengajuan
+
+    mulai = time.perf_counter()
+    try:
+        hasil_file = tetapkan_pengajuan(pengajuan_id)
+        with _conn() as conn:
+            c = conn.cursor()
+            c.execute("SELECT COUNT(*) FROM nomor_ijazah WHERE pengajuan_id=?", (pengajuan_id,))
+            jumlah = c.fetchone()[0]
+        return {"pengajuan_id": pengajuan_id, "status": "berhasil", "hasil_file": hasil_file,
+                "jumlah_santri": jumlah, "durasi": round(time.perf_counter() - mulai, 2)}
+    except Exception as e:
+        return {"pengajuan_id": pengajuan_id, "status": "gagal", "error": str(e),
+                "jumlah_santri": 0, "durasi": round(time.perf_counter() - mulai, 2)}
+
+
+def _hasil_gagal_pool(pengajuan_id, error, mulai):
+    """
+    Batch yang proses anaknya mati (mis. OOM → BrokenProcessPool). Transaksinya
+    bisa saja sudah commit sebelum proses mati, jadi status dicek di database.
+    """
+    with _conn() as conn:
+        c = conn.cursor()
+        c.execute("SELECT status FROM pengajuan WHERE id=?", (pengajuan_id,))
+        row = c.fetchone()
+        c.execute("SELECT COUNT(*) FROM nomor_ijazah WHERE pengajuan_id=?", (pengajuan_id,))
+        jumlah = c.fetchone()[0]
+    durasi = round(time.perf_counter() - mulai, 2)
+    if row and row[0] == "Ditetapkan":
+        return {"pengajuan_id": pengajuan_id, "status": "berhasil", "hasil_file": None,
+                "jumlah_santri": jumlah, "durasi": durasi}
+    return {"pengajuan_id": pengajuan_id, "status": "gagal",
+            "error": f"{type(error).__name__}: {error}", "jumlah_santri": 0, "durasi": durasi}
+
+
+def tetapkan_bulk(pengajuan_ids=None, kabupaten=None, jenjang=None, max_workers=None, progress=None):
+    """
+    Tetapkan semua pengajuan terpilih (paralel hanya di PostgreSQL) dan
+    kembalikan laporan: {total, berhasil, gagal, jumlah_santri, durasi, detail: [...]}
+    """
+    progress = progress or (lambda persen, pesan=None: None)
+    ids = select_pengajuan_ids(pengajuan_ids, kabupaten, jenjang)
+    mulai = time.perf_counter()
+    detail = []
+    workers = max(1, min(max_workers or BULK_WORKERS, len(ids)))
+
+    if ids and (workers == 1 or get_repository().dialect != POSTGRES):
+        for selesai, pid in enumerate(ids, start=1):
+            detail.append(_tetapkan_satu(pid))
+            progress(int(selesai * 100 / len(ids)), f"{selesai}/{len(ids)} batch diproses")
+    elif ids:
+        # spawn: proses anak tidak mewarisi thread/koneksi milik worker gunicorn
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            futures = {pool.submit(_tetapkan_satu, pid): pid for pid in ids}
+            for selesai, fut in enumerate(as_completed(futures), start=1):
+                try:
+                    detail.append(fut.result())
+                except Exception as e:
+                    # proses anak mati: batch lain yang sudah commit tetap dilaporkan
+                    detail.append(_hasil_gagal_pool(futures[fut], e, mulai))
+                progress(int(selesai * 100 / len(ids)), f"{selesai}/{len(ids)} batch diproses")
+
+    detail.sort(key=lambda d: d["pengajuan_id"])
+    berhasil = [d for d in detail if d["status"] == "berhasil"]
+    laporan = {
+        "total": len(ids),
+        "berhasil": len(berhasil),
+        "gagal": len(detail) - len(berhasil),
+        "jumlah_santri": sum(d["jumlah_santri"] for d in berhasil),
+        "durasi": round(time.perf_counter() - mulai, 2),
+        "filter": {"pengajuan_ids": pengajuan_ids or None, "kabupaten": kabupaten, "jenjang": jenjang},
+        "detail": detail,
+    }
+    print(f"✅ Penetapan massal: {laporan['berhasil']}/{laporan['total']} batch, "
+          f"{laporan['jumlah_santri']} santri dalam {laporan['durasi']} detik")
+    return laporan
@@ -0,0 +1,244 @@
+# services/repository.py
+"""
+Lapisan repository: satu API akses data untuk SQLite dan PostgreSQL.
+
+Semua services/*.py dan route menulis SQL dengan placeholder `?` (gaya
+SQLite) lalu meminjam koneksi lewat repository aktif:
+
+    with get_repository().connection() as conn:    # commit/rollback + kembali ke pool
+        c = conn.cursor()
+        c.execute("SELECT ... WHERE id=?", (pengajuan_id,))
+        baru = conn.insert_returning("INSERT INTO ... VALUES (?, ?)", params)
+
+    for baris in get_repository().stream("SELECT ... FROM nomor_ijazah WHERE ...", params):
+        ...                                          # server-side cursor di PostgreSQL
+
+Backend dipilih sekali per proses: PostgreSQL bila DATABASE_URL diset
+(SINDI_DB_BACKEND=sqlite/postgres untuk memaksa), selain itu SQLite. Tidak
+ada fallback diam-diam ke SQLite saat PostgreSQL gagal — data tulis tidak
+boleh terpecah ke /tmp/sindi.db yang hilang saat redeploy.
+
+Perbedaan dialek yang ditangani di sini:
+- placeholder `?` → `%s` (dan `%` literal → `%%`) untuk psycopg2;
+- baris bisa diakses lewat indeks maupun nama kolom di kedua backend
+  (sqlite3.Row / psycopg2 DictRow);
+- id baris baru lewat RETURNING, bukan cursor.lastrowid;
+- conn.sql(sqlite=..., postgres=...) untuk potongan SQL yang memang beda
+  (mis. printf vs lpad);
+- stream(): fetchmany di SQLite, named (server-side) cursor di PostgreSQL,
+  jadi ekspor besar tidak memuat semua baris ke memori.
+"""
+import os, sqlite3, threading, itertools
+from functools import lru_cache
+
+from services.db_pool import sqlite_connection, pg_connection, DATABASE_URL, psycopg2
+
+try:
+    from psycopg2 import extras as pg_extras
+except ImportError:  # psycopg2 opsional saat jalan lokal dengan SQLite
+    pg_extras = None
+
+STREAM_SIZE = int(os.getenv("DB_STREAM_SIZE", "2000"))
+
+SQLITE = "sqlite"
+POSTGRES = "postgres"
+
+
+# ======================
+# TERJEMAHAN PLACEHOLDER
+# ======================
+@lru_cache(maxsize=1024)
+def translate(sql):
+    """
+    SQL ber-placeholder `?` → gaya psycopg2 (`%s`). `?` di dalam string
+    literal/identifier bertanda kutip dibiarkan, `%` literal digandakan.
+    SQL tanpa `?` (sudah ditulis untuk PostgreSQL) dikembalikan apa adanya.
+    """
+    hasil, kutip, ada_placeholder = [], None, False
+    for ch in sql:
+        if kutip:
+            if ch == kutip:
+                kutip = None
+        elif ch in ("'", '"'):
+            kutip = ch
+        elif ch == "?":
+            hasil.append("%s")
+            ada_placeholder = True
+            continue
+        hasil.append("%%" if ch == "%" else ch)
+    return "".join(hasil) if ada_placeholder else sql
+
+
+# ======================
+# CURSOR & KONEKSI
+# ======================
+class RepoCursor:
+    """Cursor backend dengan execute/executemany yang menerjemahkan placeholder."""
+
+    def __init__(self, raw_cursor, dialect):
+        self._c = raw_cursor
+        self.dialect = dialect
+
+    def _sql(self, sql, params):
+        if self.dialect == SQLITE:
+            return sql, params
+        baru = translate(sql)
+        if baru == sql and not params:
+            return sql, None  # psycopg2 tidak memformat bila params None
+        return baru, tuple(params or ())
+
+    def execute(self, sql, params=()):
+        sql, params = self._sql(sql, params)
+        if params is None:
+            self._c.execute(sql)
+        else:
+            self._c.execute(sql, params)
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        if self.dialect == SQLITE:
+            self._c.executemany(sql, seq_of_params)
+        else:
+            self._c.executemany(translate(sql), [tuple(p) for p in seq_of_params])
+        return self
+
+    @property
+    def lastrowid(self):
+        if self.dialect != SQLITE:
+            raise AttributeError("lastrowid tidak tersedia di PostgreSQL — pakai insert_returning().")
+        return self._c.lastrowid
+
+    def __iter__(self):
+        return iter(self._c)
+
+    def __getattr__(self, name):
+        return getattr(self._c, name)
+
+
+class RepoConnection:
+    """
+    Koneksi pinjaman dari pool (PooledConnection) + dialek. commit/rollback,
+    context manager dan close() diteruskan ke koneksi pool.
+    """
+
+    def __init__(self, pooled, dialect):
+        self._pooled = pooled
+        self.dialect = dialect
+
+    @property
+    def sqlite(self):
+        return self.dialect == SQLITE
+
+    @property
+    def raw(self):
+        return self._pooled.raw
+
+    def cursor(self):
+        if self.sqlite:
+            return RepoCursor(self._pooled.cursor(), SQLITE)
+        return RepoCursor(self._pooled.cursor(cursor_factory=pg_extras.DictCursor), POSTGRES)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+    def insert_returning(self, sql, params=(), kolom="id"):
+        """Jalankan INSERT dan kembalikan nilai `kolom` baris baru (pengganti lastrowid)."""
+        c = self.execute(f"{sql.rstrip().rstrip(';')} RETURNING {kolom}", params)
+        return c.fetchone()[0]
+
+    def sql(self, sqlite, postgres):
+        """Pilih potongan SQL sesuai dialek koneksi ini."""
+        return sqlite if self.sqlite else postgres
+
+    def stream(self, sql, params=(), size=None):
+        """Iterasi baris hasil query per potongan `size` tanpa fetchall()."""
+        size = size or STREAM_SIZE
+        if self.sqlite:
+            c = self.execute(sql, params)
+        else:
+            # named cursor = server-side: baris diambil per `itersize` dari server
+            c = RepoCursor(
+                self.raw.cursor(name=f"sindi_stream_{next(_stream_seq)}",
+                                cursor_factory=pg_extras.DictCursor),
+                POSTGRES,
+            )
+            c.itersize = size
+            c.execute(sql, params)
+        try:
+            while True:
+                rows = c.fetchmany(size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            c.close()
+
+    def commit(self):
+        self._pooled.commit()
+
+    def rollback(self):
+        self._pooled.rollback()
+
+    def close(self):
+        self._pooled.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._pooled.__exit__(exc_type, exc, tb)
+
+    def __getattr__(self, name):
+        return getattr(self._pooled, name)
+
+
+_stream_seq = itertools.count(1)
+
+
+# ======================
+# REPOSITORY
+# ======================
+class SqliteRepository:
+    dialect = SQLITE
+    IntegrityError = sqlite3.IntegrityError
+
+    def connection(self):
+        return RepoConnection(sqlite_connection(), SQLITE)
+
+    def stream(self, sql, params=(), size=None):
+        """Seperti RepoConnection.stream(), dengan koneksi pinjaman sendiri."""
+        with self.connection() as conn:
+            yield from conn.stream(sql, params, size)
+
+
+class PostgresRepository(SqliteRepository):
+    dialect = POSTGRES
+    IntegrityError = psycopg2.IntegrityError if psycopg2 else sqlite3.IntegrityError
+
+    def connection(self):
+        if pg_extras is None:
+            raise RuntimeError("psycopg2 belum terpasang.")
+        return RepoConnection(pg_connection(), POSTGRES)
+
+
+_repo = None
+_repo_lock = threading.Lock()
+
+
+def get_repository():
+    """Repository aktif untuk proses ini (dibuat sekali)."""
+    global _repo
+    if _repo is None:
+        with _repo_lock:
+            if _repo is None:
+                backend = os.getenv("SINDI_DB_BACKEND") or (POSTGRES if DATABASE_URL else SQLITE)
+                _repo = PostgresRepository() if backend == POSTGRES else SqliteRepository()
+    return _repo
+
+
+def connection():
+    """Singkatan get_repository().connection()."""
+    return get_repository().connection()
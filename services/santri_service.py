@@ -0,0 +1,198 @@
+# services/santri_service.py
+"""
+Staging data santri lulusan per pengajuan.
+
+File lulusan di-parse sekali saat MDT mengunggah (/pengajuan) dan tiap baris
+disimpan di tabel `santri_lulusan` (urut sesuai file, baris 0..n-1). Setelah
+itu pratinjau, ringkasan verifikasi, deteksi NIS ganda dan penomoran cukup
+query SQL ber-index — file Excel tidak perlu dibaca lagi.
+
+Header asli file disimpan di pengajuan.kolom_lulusan (JSON) dan jumlah baris
+di pengajuan.jumlah_santri. Pengajuan lama (sebelum staging ada) di-stage
+otomatis saat pertama kali dibutuhkan lewat ensure_staged().
+"""
+import json
+
+from services.repository import get_repository
+from services.storage import resolve as resolve_upload
+from services.excel_ingest import santri_columns, iter_chunks, json_value
+
+EXCEL_EXT = (".xlsx", ".xls")
+
+
+def _conn():
+    return get_repository().connection()
+
+
+def _teks(v):
+    v = json_value(v)
+    return None if v is None else str(v).strip()
+
+
+# ======================
+# STAGING
+# ======================
+def stage_santri_lulusan(conn, pengajuan_id, file_path):
+    """
+    Parse file lulusan dan isi santri_lulusan untuk satu pengajuan (idempoten:
+    baris lama dihapus dulu). Tidak commit — ikut transaksi pemanggil.
+    Mengembalikan jumlah santri, atau None bila file bukan Excel (mis. PDF).
+    Raise KolomTidakDitemukan bila kolom nama/NIS tidak ada.
+    """
+    if not file_path or not file_path.lower().endswith(EXCEL_EXT):
+        return None
+
+    header, _, nama_idx, nis_idx = santri_columns(file_path)
+    c = conn.cursor()
+    c.execute("DELETE FROM santri_lulusan WHERE pengajuan_id=?", (pengajuan_id,))
+
+    baris = 0
+    for chunk in iter_chunks(file_path):
+        c.executemany("""
+            INSERT INTO santri_lulusan (pengajuan_id, baris, nama_santri, nis, data)
+            VALUES (?, ?, ?, ?, ?)
+        """, [
+            (pengajuan_id, baris + i, _teks(row[nama_idx]), _teks(row[nis_idx]),
+             json.dumps([json_value(v) for v in row], ensure_ascii=False, default=str))
+            for i, row in enumerate(chunk)
+        ])
+        baris += len(chunk)
+
+    c.execute(
+        "UPDATE pengajuan SET kolom_lulusan=?, jumlah_santri=? WHERE id=?",
+        (json.dumps(header, ensure_ascii=False), baris, pengajuan_id),
+    )
+    return baris
+
+
+def ensure_staged(pengajuan_id):
+    """
+    Pastikan pengajuan sudah punya data staging; pengajuan lama di-stage dari
+    file_lulusan. True bila data santri tersedia, False bila file bukan Excel.
+    """
+    with _conn() as conn:
+        c = conn.cursor()
+        c.execute("SELECT file_lulusan, kolom_lulusan FROM pengajuan WHERE id=?", (pengajuan_id,))
+        row = c.fetchone()
+        if not row:
+            return False
+        file_lulusan, kolom = row
+        if kolom is not None:
+            return True
+        path = resolve_upload(file_lulusan)
+        if path is None:
+            raise FileNotFoundError(f"❌ File upload tidak ditemukan: {file_lulusan}")
+        jumlah = stage_santri_lulusan(conn, pengajuan_id, path)
+        conn.commit()
+        return jumlah is not None
+
+
+# ======================
+# BACA
+# ======================
+def santri_header(pengajuan_id):
+    """Header asli file lulusan (list) atau None bila belum di-stage."""
+    with _conn() as conn:
+        c = conn.cursor()
+        c.execute("SELECT kolom_lulusan FROM pengajuan WHERE id=?", (pengajuan_id,))
+        row = c.fetchone()
+    return json.loads(row[0]) if row and row[0] else None
+
+
+def page_santri(pengajuan_id, offset, limit):
+    """Satu halaman baris asli (list nilai) → (rows, has_more); seek lewat index (pengajuan_id, baris)."""
+    with _conn() as conn:
+        c = conn.cursor()
+        c.execute("""
+            SELECT data FROM santri_lulusan
+            WHERE pengajuan_id=? AND baris >= ?
+            ORDER BY baris LIMIT ?
+        """, (pengajuan_id, int(offset), int(limit) + 1))
+        rows = [json.loads(r[0]) for r in c.fetchall()]
+    return rows[:limit], len(rows) > limit
+
+
+def iter_santri_rows(pengajuan_id, chunk_size=2000):
+    """Generator potongan [(baris, data_list), ...] urut baris (keyset, tanpa OFFSET)."""
+    terakhir = -1
+    while True:
+        with _conn() as conn:
+            c = conn.cursor()
+            c.execute("""
+                SELECT baris, data FROM santri_lulusan
+                WHERE pengajuan_id=? AND baris > ?
+                ORDER BY baris LIMIT ?
+            """, (pengajuan_id, terakhir, chunk_size))
+            chunk = [(r[0], json.loads(r[1])) for r in c.fetchall()]
+        if not chunk:
+            return
+        yield chunk
+        terakhir = chunk[-1][0]
+
+
+def nis_ganda(pengajuan_id):
+    """
+    NIS bermasalah dalam satu pengajuan:
+      dalam_batch  — NIS muncul lebih dari sekali di file yang sama
+      sudah_terbit — NIS sudah punya nomor ijazah dari pengajuan lain
+    """
+    with _conn() as conn:
+        c = conn.cursor()
+        c.execute("""
+            SELECT nis, COUNT(*) FROM santri_lulusan
+            WHERE pengajuan_id=? AND nis IS NOT NULL AND nis <> ''
+            GROUP BY nis HAVING COUNT(*) > 1 ORDER BY nis
+        """, (pengajuan_id,))
+        dalam_batch = [{"nis": r[0], "jumlah": r[1]} for r in c.fetchall()]
+
+        c.execute("""
+            SELECT s.nis, s.nama_santri, n.nomor_ijazah, n.pengajuan_id
+            FROM santri_lulusan s
+            JOIN nomor_ijazah n ON n.nis = s.nis AND n.pengajuan_id <> s.pengajuan_id
+            WHERE s.pengajuan_id=?
+            ORDER BY s.baris
+        """, (pengajuan_id,))
+        sudah_terbit = [
+            {"nis": r[0], "nama_santri": r[1], "nomor_ijazah": r[2], "pengajuan_id": r[3]}
+            for r in c.fetchall()
+        ]
+    return {"dalam_batch": dalam_batch, "sudah_terbit": sudah_terbit}
+
+
+def ringkasan_santri(pengajuan_ids):
+    """
+    Ringkasan staging untuk banyak pengajuan sekaligus (halaman verifikasi):
+    {pengajuan_id: {"jumlah": n, "nis_ganda": k, "sudah_terbit": m}}
+    """
+    ids = [int(i) for i in pengajuan_ids]
+    if not ids:
+        return {}
+    marks = ", ".join("?" for _ in ids)
+    hasil = {i: {"jumlah": None, "nis_ganda": 0, "sudah_terbit": 0} for i in ids}
+
+    with _conn() as conn:
+        c = conn.cursor()
+        c.execute(f"SELECT id, jumlah_santri FROM pengajuan WHERE id IN ({marks})", ids)
+        for pid, jumlah in c.fetchall():
+            hasil[pid]["jumlah"] = jumlah
+
+        c.execute(f"""
+            SELECT pengajuan_id, COUNT(*) FROM (
+                SELECT pengajuan_id, nis FROM santri_lulusan
+                WHERE pengajuan_id IN ({marks}) AND nis IS NOT NULL AND nis <> ''
+                GROUP BY pengajuan_id, nis HAVING COUNT(*) > 1
+            ) AS ganda GROUP BY pengajuan_id
+        """, ids)
+        for pid, jumlah in c.fetchall():
+            hasil[pid]["nis_ganda"] = jumlah
+
+        c.execute(f"""
+            SELECT s.pengajuan_id, COUNT(DISTINCT s.nis)
+            FROM santri_lulusan s
+            JOIN nomor_ijazah n ON n.nis = s.nis AND n.pengajuan_id <> s.pengajuan_id
+            WHERE s.pengajuan_id IN ({marks})
+            GROUP BY s.pengajuan_id
+        """, ids)
+        for pid, jumlah in c.fetchall():
+            hasil[pid]["sudah_terbit"] = jumlah
+    return hasil
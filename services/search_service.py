@@ -0,0 +1,145 @@
+# services/search_service.py
+"""
+Pencarian nomor ijazah berdasarkan nama santri, NIS atau nomor ijazah.
+
+SQLite: indeks FTS5 `nomor_ijazah_fts` (external content di atas tabel
+nomor_ijazah, jadi teks tidak disimpan dua kali) dengan tokenizer unicode61
+tanpa diakritik dan indeks prefix 2/3 huruf. Trigger INSERT/UPDATE/DELETE di
+nomor_ijazah menjaga indeks tetap sinkron, termasuk INSERT ... SELECT saat
+penetapan.
+
+- prefix : tiap kata dicari sebagai awalan ("bud sant" → Budi Santoso),
+           semua kata harus cocok (AND), diurutkan dengan bm25.
+- typo   : bila hasil kurang dari limit, kata huruf (≥ 4 huruf) dikoreksi
+           dengan kosakata indeks (fts5vocab) — kandidat berhuruf awal sama
+           dan panjang ±2, dipilih dengan difflib (SEARCH_TYPO_CUTOFF). Kata
+           angka (NIS/nomor) hanya dicocokkan sebagai awalan.
+
+PostgreSQL: pg_trgm (index GIN gin_trgm_ops) untuk ILIKE awalan/potongan
+dan operator similarity `%` untuk salah ketik.
+"""
+import os, re, sqlite3, difflib
+
+from services.repository import get_repository
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+MIN_TYPO = 4
+TYPO_CUTOFF = float(os.getenv("SEARCH_TYPO_CUTOFF", "0.75"))
+TYPO_ALTERNATIF = 5
+
+_KOLOM = """
+    n.id, n.nama_santri, n.nis, n.nomor_ijazah, n.tahun, n.jenjang,
+    n.pengajuan_id, p.nama_mdt, p.kabupaten
+"""
+
+
+def _conn():
+    return get_repository().connection()
+
+
+def _is_sqlite(conn):
+    return isinstance(getattr(conn, "raw", conn), sqlite3.Connection)
+
+
+# ======================
+# QUERY
+# ======================
+def _kata(q):
+    return re.findall(r"\w+", (q or "").lower())
+
+
+def _koreksi(c, kata):
+    """Kata di kosakata indeks yang mirip `kata` (huruf awal sama, panjang ±2)."""
+    if len(kata) < MIN_TYPO or not kata.isalpha():
+        return []
+    c.execute("""
+        SELECT term FROM nomor_ijazah_fts_vocab
+        WHERE term >= ? AND term < ? AND length(term) BETWEEN ? AND ?
+    """, (kata[0], chr(ord(kata[0]) + 1), len(kata) - 2, len(kata) + 2))
+    kandidat = [r[0] for r in c.fetchall() if not r[0].startswith(kata)]
+    return difflib.get_close_matches(kata, kandidat, n=TYPO_ALTERNATIF, cutoff=TYPO_CUTOFF)
+
+
+def _match(grup):
+    """[[kata, alternatif...], ...] → ekspresi FTS5: kata pertama sebagai prefix, sisanya tepat."""
+    bagian = []
+    for kata, *alternatif in grup:
+        pilihan = [f'"{kata}"*'] + [f'"{a}"' for a in alternatif]
+        bagian.append(pilihan[0] if len(pilihan) == 1 else f"({' OR '.join(pilihan)})")
+    return " AND ".join(bagian)
+
+
+def _baris(r, cocok):
+    return {
+        "id": r[0], "nama_santri": r[1], "nis": r[2], "nomor_ijazah": r[3],
+        "tahun": r[4], "jenjang": r[5], "pengajuan_id": r[6],
+        "nama_mdt": r[7], "kabupaten": r[8], "cocok": cocok,
+    }
+
+
+def _cari_sqlite(c, kata, limit, mdt_id):
+    sql = f"""
+        SELECT {_KOLOM}
+        FROM nomor_ijazah_fts f
+        JOIN nomor_ijazah n ON n.id = f.rowid
+        JOIN pengajuan p ON p.id = n.pengajuan_id
+        WHERE nomor_ijazah_fts MATCH ? {"AND p.mdt_id = ?" if mdt_id is not None else ""}
+        ORDER BY f.rank LIMIT ?
+    """
+
+    def jalankan(expr):
+        params = [expr] + ([mdt_id] if mdt_id is not None else []) + [limit]
+        c.execute(sql, params)
+        return c.fetchall()
+
+    hasil = [_baris(r, "awalan") for r in jalankan(_match([[k] for k in kata]))]
+    if len(hasil) >= limit:
+        return hasil
+
+    grup = [[k] + _koreksi(c, k) for k in kata]
+    if any(len(g) > 1 for g in grup):
+        sudah = {h["id"] for h in hasil}
+        for r in jalankan(_match(grup)):
+            if r[0] not in sudah and len(hasil) < limit:
+                hasil.append(_baris(r, "mirip"))
+    return hasil
+
+
+def _cari_postgres(c, q, kata, limit, mdt_id):
+    pola = "%" + "%".join(kata) + "%"
+    c.execute(f"""
+        SELECT {_KOLOM}
+        FROM nomor_ijazah n
+        JOIN pengajuan p ON p.id = n.pengajuan_id
+        WHERE (n.nama_santri ILIKE %s OR n.nomor_ijazah ILIKE %s OR n.nis LIKE %s
+               OR n.nama_santri %% %s)
+          {"AND p.mdt_id = %s" if mdt_id is not None else ""}
+        ORDER BY GREATEST(similarity(n.nama_santri, %s), similarity(n.nomor_ijazah, %s)) DESC
+        LIMIT %s
+    """, [pola, pola, kata[0] + "%", q] + ([mdt_id] if mdt_id is not None else []) + [q, q, limit])
+    return [_baris(r, "mirip") for r in c.fetchall()]
+
+
+def _cari(db, kata, limit, mdt_id):
+    if not _is_sqlite(db):
+        return _cari_postgres(db.cursor(), " ".join(kata), kata, limit, mdt_id)
+    return _cari_sqlite(db.cursor(), kata, limit, mdt_id)
+
+
+def cari_ijazah(q, limit=DEFAULT_LIMIT, mdt_id=None, conn=None):
+    """
+    Cari santri bernomor ijazah. mdt_id membatasi ke pengajuan milik satu MDT.
+    Mengembalikan list dict (lihat _baris); "cocok" = "awalan" atau "mirip".
+    `conn` milik pemanggil dipakai apa adanya — tidak di-commit atau ditutup.
+    """
+    kata = _kata(q)
+    if not kata:
+        return []
+    limit = max(1, min(int(limit or DEFAULT_LIMIT), MAX_LIMIT))
+
+    if conn is None:
+        with _conn() as own:
+            return _cari(own, kata, limit, mdt_id)
+    return _cari(conn, kata, limit, mdt_id)
+
@@ -0,0 +1,140 @@
+# services/statistik_service.py
+"""
+Counter status pengajuan yang dimaterialisasi untuk dashboard.
+
+Tabel `statistik_pengajuan` menyimpan jumlah pengajuan per
+(mdt_id, kabupaten, jenjang, status) dan jumlah santri bernomor ijazah.
+- jumlah pengajuan dijaga trigger INSERT/UPDATE/DELETE di tabel pengajuan
+  (tabel & trigger dibuat migrasi 006, services/migrations.py),
+  jadi semua jalur yang mengubah status (mdt_service, kemenag_service,
+  route lama) otomatis ikut tercatat;
+- jumlah santri ditambah oleh generate_nomor_ijazah_batch dalam transaksi
+  penomoran yang sama (bukan trigger per baris nomor_ijazah, supaya insert
+  puluhan ribu nomor tidak menjadi puluhan ribu UPDATE counter).
+
+Dashboard cukup membaca beberapa baris counter, ditambah cache TTL pendek
+di memori proses (DASHBOARD_CACHE_TTL detik).
+"""
+import os, time, threading
+
+from services.repository import get_repository
+
+CACHE_TTL = float(os.getenv("DASHBOARD_CACHE_TTL", "15"))
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _conn():
+    return get_repository().connection()
+
+
+# ======================
+# PERBAIKAN
+# ======================
+def rebuild_statistik():
+    """Hitung ulang seluruh counter dari pengajuan & nomor_ijazah (backfill / perbaikan)."""
+    with _conn() as conn:
+        c = conn.cursor()
+        c.execute("DELETE FROM statistik_pengajuan")
+        c.execute("""
+            INSERT INTO statistik_pengajuan (mdt_id, kabupaten, jenjang, status, jumlah, jumlah_santri)
+            SELECT COALESCE(p.mdt_id, 0), COALESCE(p.kabupaten, ''), COALESCE(p.jenjang, ''),
+                   COALESCE(p.status, ''), COUNT(*), COALESCE(SUM(n.jumlah), 0)
+            FROM pengajuan p
+            LEFT JOIN (
+                SELECT pengajuan_id, COUNT(*) AS jumlah FROM nomor_ijazah GROUP BY pengajuan_id
+            ) n ON n.pengajuan_id = p.id
+            GROUP BY COALESCE(p.mdt_id, 0), COALESCE(p.kabupaten, ''), COALESCE(p.jenjang, ''),
+                     COALESCE(p.status, '')
+        """)
+        conn.commit()
+    invalidate()
+
+
+# ======================
+# UPDATE DARI PENETAPAN
+# ======================
+def tambah_jumlah_santri(conn, pengajuan_id, jumlah):
+    """
+    Tambah counter santri bernomor untuk pengajuan ini (status 'Ditetapkan').
+    Tidak commit — dipanggil di dalam transaksi penomoran; pemanggil memanggil
+    invalidate() setelah commit, supaya dashboard tidak meng-cache angka lama
+    yang dibaca di antara invalidate dan commit.
+    """
+    if not jumlah:
+        return
+    conn.cursor().execute("""
+        UPDATE statistik_pengajuan SET jumlah_santri = jumlah_santri + ?
+        WHERE (mdt_id, kabupaten, jenjang, status) = (
+            SELECT COALESCE(mdt_id, 0), COALESCE(kabupaten, ''), COALESCE(jenjang, ''), COALESCE(status, '')
+            FROM pengajuan WHERE id=?
+        )
+    """, (int(jumlah), pengajuan_id))
+
+
+# ======================
+# DASHBOARD
+# ======================
+def invalidate():
+    with _cache_lock:
+        _cache.clear()
+
+
+def _hitung(mdt_id=None):
+    """{status: jumlah} dan total santri, langsung dari tabel counter."""
+    query = "SELECT status, SUM(jumlah), SUM(jumlah_santri) FROM statistik_pengajuan"
+    params = ()
+    if mdt_id is not None:
+        query += " WHERE mdt_id=?"
+        params = (mdt_id,)
+    query += " GROUP BY status"
+
+    with _conn() as conn:
+        c = conn.cursor()
+        c.execute(query, params)
+        rows = c.fetchall()
+    per_status = {r[0]: r[1] or 0 for r in rows}
+    santri = sum(r[2] or 0 for r in rows)
+    return per_status, santri
+
+
+def dashboard_counts(role, mdt_id=None):
+    """Angka kartu dashboard per role (format sama seperti sebelumnya), cache TTL pendek."""
+    key = (role, mdt_id if role == "mdt" else None)
+    now = time.monotonic()
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit and hit[0] > now:
+            return dict(hit[1])
+
+    if role == "mdt":
+        s, _ = _hitung(mdt_id)
+        data = {
+            "pengajuan_total": sum(s.values()),
+            "ditetapkan": s.get("Ditetapkan", 0),
+            "menunggu": s.get("Menunggu", 0),
+        }
+    elif role == "kankemenag":
+        s, _ = _hitung()
+        data = {
+            "total": sum(s.values()),
+            "menunggu": s.get("Menunggu", 0),
+            "diverifikasi": s.get("Diverifikasi", 0),
+        }
+    elif role == "kanwil":
+        s, santri = _hitung()
+        diverifikasi, ditetapkan = s.get("Diverifikasi", 0), s.get("Ditetapkan", 0)
+        data = {
+            "total": diverifikasi + ditetapkan,
+            "ditetapkan": ditetapkan,
+            "total_santri": santri,
+            "menunggu": 0,
+            "diverifikasi": diverifikasi,
+        }
+    else:
+        data = {}
+
+    with _cache_lock:
+        _cache[key] = (now + CACHE_TTL, data)
+    return dict(data)
@@ -0,0 +1,358 @@
+# services/storage.py
+"""
+Penyimpanan file upload berbasis isi (content-addressed).
+
+Setiap file disimpan dengan kunci dari hash SHA-256 isinya:
+
+    kunci  = "<sha256>.<ext>"            (mis. "9f86d0...0f00a08.xlsx")
+    lokasi = <root>/<sha256[:2]>/<kunci>  (backend lokal)
+
+Kunci inilah yang disimpan di pengajuan.file_lulusan dan dipakai di URL
+(/uploads/<kunci>, /preview_upload/<kunci>), jadi tidak ada lagi tebak-tebakan
+folder (uploads relatif cwd, /tmp/uploads, ...). Alurnya:
+
+- simpan(): isi upload ditulis ke file sementara sambil di-hash, lalu
+  di-rename atomik ke lokasi final — pembaca tidak pernah melihat file
+  setengah jadi;
+- file yang diunggah ulang dengan isi sama mendapat kunci yang sama; file
+  sementaranya dibuang (dedup), bukan disimpan lagi;
+- resolve(): SATU jalur lookup dari nilai file_lulusan/nama di URL ke path
+  lokal yang bisa dibaca openpyxl/send_file. Nilai lama (path sebelum modul
+  ini ada) masih dicari di folder upload lama.
+
+Backend (STORAGE_BACKEND):
+- "local" (default): disk lokal di UPLOAD_ROOT (default BASE_DIR/uploads);
+- "s3": object store S3-compatible (put/head/get/delete_object). Dengan
+  STORAGE_S3_LOCAL_DIR diset, dipakai LocalObjectClient — pengganti lokal
+  yang meniru API boto3 di atas folder, untuk dev/uji tanpa bucket sungguhan.
+  Tanpa itu dipakai boto3 (STORAGE_S3_BUCKET, STORAGE_S3_ENDPOINT). File yang
+  dibaca dari bucket di-cache di disk lokal (STORAGE_CACHE_DIR).
+
+Disk Render bersifat sementara: di produksi pakai backend "s3" supaya file
+upload tidak hilang saat redeploy.
+"""
+import os, re, sys, shutil, hashlib, tempfile, threading
+from collections import namedtuple
+
+from werkzeug.utils import safe_join, secure_filename
+
+from services.db_pool import BASE_DIR
+
+try:
+    import boto3
+except ImportError:  # boto3 opsional; hanya perlu untuk backend s3 sungguhan
+    boto3 = None
+
+UPLOAD_ROOT = os.getenv("UPLOAD_ROOT", os.path.join(BASE_DIR, "uploads"))
+CACHE_DIR = os.getenv("STORAGE_CACHE_DIR", os.path.join(BASE_DIR, "cache", "storage"))
+BLOK = 1024 * 1024
+
+# folder upload sebelum penyimpanan berbasis isi (nilai file_lulusan lama)
+LEGACY_DIRS = [UPLOAD_ROOT, "/tmp/uploads", os.path.join(os.getcwd(), "uploads")]
+
+POLA_KUNCI = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]{1,8}$")
+
+Tersimpan = namedtuple("Tersimpan", "kunci sha256 ukuran baru")
+
+
+def is_kunci(nilai):
+    return bool(nilai) and bool(POLA_KUNCI.match(nilai))
+
+
+def _ext(filename):
+    nama = secure_filename(filename or "")
+    ext = nama.rsplit(".", 1)[-1].lower() if "." in nama else ""
+    return ext if re.fullmatch(r"[a-z0-9]{1,8}", ext) else "bin"
+
+
+def _tidak_ada(exc):
+    """True bila exception dari client object store berarti objek tidak ada."""
+    if isinstance(exc, FileNotFoundError):
+        return True
+    kode = str(getattr(exc, "response", {}).get("Error", {}).get("Code", ""))
+    return kode in ("404", "NoSuchKey", "NotFound")
+
+
+# ======================
+# BACKEND: DISK LOKAL
+# ======================
+class LocalBackend:
+    nama = "local"
+
+    def __init__(self, root):
+        self.root = root
+        self.tmp_dir = os.path.join(root, ".tmp")
+
+    def tmp_file(self):
+        """(fd, path) file sementara di filesystem yang sama (rename tetap atomik)."""
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        return tempfile.mkstemp(dir=self.tmp_dir, suffix=".part")
+
+    def _path(self, kunci):
+        return os.path.join(self.root, kunci[:2], kunci)
+
+    def exists(self, kunci):
+        return os.path.isfile(self._path(kunci))
+
+    def put_file(self, tmp_path, kunci):
+        """Pindahkan file sementara ke lokasi kunci (atomik). False bila isi sudah ada."""
+        tujuan = self._path(kunci)
+        if os.path.isfile(tujuan):
+            os.remove(tmp_path)
+            return False
+        os.makedirs(os.path.dirname(tujuan), exist_ok=True)
+        os.replace(tmp_path, tujuan)
+        return True
+
+    def local_path(self, kunci):
+        path = self._path(kunci)
+        return path if os.path.isfile(path) else None
+
+    def delete(self, kunci):
+        try:
+            os.remove(self._path(kunci))
+        except FileNotFoundError:
+            pass
+
+
+# ======================
+# BACKEND: OBJECT STORE (S3-COMPATIBLE)
+# ======================
+class LocalObjectClient:
+    """
+    Pengganti lokal client boto3 S3 (subset put/head/get/delete_object):
+    objek = file di <root>/<bucket>/<key>, ditulis atomik.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, Bucket, Key):
+        path = safe_join(os.path.join(self.root, Bucket), Key)
+        if path is None:
+            raise ValueError(f"Key tidak valid: {Key}")
+        return path
+
+    def put_object(self, Bucket, Key, Body, Metadata=None, **_):
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+        with os.fdopen(fd, "wb") as f:
+            shutil.copyfileobj(Body, f, BLOK)
+        os.replace(tmp, path)
+        return {"ETag": f'"{(Metadata or {}).get("sha256", "")}"'}
+
+    def head_object(self, Bucket, Key):
+        return {"ContentLength": os.path.getsize(self._path(Bucket, Key))}
+
+    def get_object(self, Bucket, Key):
+        return {"Body": open(self._path(Bucket, Key), "rb")}
+
+    def delete_object(self, Bucket, Key):
+        try:
+            os.remove(self._path(Bucket, Key))
+        except FileNotFoundError:
+            pass
+        return {}
+
+
+class ObjectStoreBackend:
+    """
+    Backend bucket S3-compatible. Objek disimpan dengan key "uploads/<kunci>";
+    salinan lokal di CACHE_DIR dipakai untuk dibaca (openpyxl/send_file perlu path).
+    """
+    nama = "s3"
+
+    def __init__(self, client, bucket, cache_dir, prefix="uploads/"):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.cache = LocalBackend(cache_dir)
+        self.tmp_file = self.cache.tmp_file
+
+    def _key(self, kunci):
+        return self.prefix + kunci
+
+    def exists(self, kunci):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(kunci))
+            return True
+        except Exception as e:
+            if _tidak_ada(e):
+                return False
+            raise
+
+    def put_file(self, tmp_path, kunci):
+        if self.exists(kunci):
+            self.cache.put_file(tmp_path, kunci)
+            return False
+        with open(tmp_path, "rb") as f:
+            self.client.put_object(Bucket=self.bucket, Key=self._key(kunci), Body=f,
+                                   Metadata={"sha256": kunci.split(".", 1)[0]})
+        self.cache.put_file(tmp_path, kunci)  # yang baru diunggah langsung jadi cache baca
+        return True
+
+    def local_path(self, kunci):
+        path = self.cache.local_path(kunci)
+        if path:
+            return path
+        try:
+            body = self.client.get_object(Bucket=self.bucket, Key=self._key(kunci))["Body"]
+        except Exception as e:
+            if _tidak_ada(e):
+                return None
+            raise
+        fd, tmp = self.tmp_file()
+        try:
+            with os.fdopen(fd, "wb") as f:
+                shutil.copyfileobj(body, f, BLOK)
+        finally:
+            body.close()
+        self.cache.put_file(tmp, kunci)
+        return self.cache.local_path(kunci)
+
+    def delete(self, kunci):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(kunci))
+        self.cache.delete(kunci)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Backend aktif untuk proses ini (dibuat sekali dari env)."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _buat_backend(os.getenv("STORAGE_BACKEND", "local"))
+    return _backend
+
+
+def _buat_backend(nama):
+    if nama != "s3":
+        return LocalBackend(UPLOAD_ROOT)
+    bucket = os.getenv("STORAGE_S3_BUCKET", "sindi-uploads")
+    local_dir = os.getenv("STORAGE_S3_LOCAL_DIR")
+    if local_dir:
+        client = LocalObjectClient(local_dir)
+    elif boto3 is None:
+        raise RuntimeError("boto3 belum terpasang (STORAGE_BACKEND=s3).")
+    else:
+        client = boto3.client("s3", endpoint_url=os.getenv("STORAGE_S3_ENDPOINT") or None)
+    return ObjectStoreBackend(client, bucket, CACHE_DIR)
+
+
+# ======================
+# SIMPAN
+# ======================
+def simpan(fileobj, filename):
+    """
+    Simpan isi `fileobj` (stream upload/file biner) → Tersimpan(kunci, sha256,
+    ukuran, baru). baru=False bila isi yang sama sudah pernah disimpan.
+    """
+    backend = get_backend()
+    h, ukuran = hashlib.sha256(), 0
+    fd, tmp = backend.tmp_file()
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for blok in iter(lambda: fileobj.read(BLOK), b""):
+                h.update(blok)
+                f.write(blok)
+                ukuran += len(blok)
+        digest = h.hexdigest()
+        kunci = f"{digest}.{_ext(filename)}"
+        baru = backend.put_file(tmp, kunci)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return Tersimpan(kunci, digest, ukuran, baru)
+
+
+def simpan_path(path):
+    """Simpan file yang sudah ada di disk (mis. upload lama) → Tersimpan."""
+    with open(path, "rb") as f:
+        return simpan(f, os.path.basename(path))
+
+
+def hapus(kunci):
+    if is_kunci(kunci):
+        get_backend().delete(kunci)
+
+
+# ======================
+# LOOKUP
+# ======================
+def resolve(nilai):
+    """
+    Path lokal untuk kunci penyimpanan, nama file di URL, atau nilai
+    file_lulusan lama (path) — None bila file tidak ditemukan. Hanya nama
+    file (bagian terakhir) yang dipakai, jadi nilai dari URL tidak bisa
+    menunjuk ke luar folder penyimpanan.
+    """
+    if not nilai:
+        return None
+    nama = str(nilai).replace("\\", "/").rsplit("/", 1)[-1]
+    if is_kunci(nama):
+        return get_backend().local_path(nama)
+
+    # nilai lama (sebelum berbasis isi): cari nama file di folder upload lama
+    for folder in LEGACY_DIRS:
+        path = safe_join(folder, nama)
+        if path and os.path.isfile(path):
+            return path
+    return None
+
+
+# ======================
+# KONVERSI UPLOAD LAMA
+# ======================
+def konversi_upload_lama(verbose=True):
+    """
+    file_lulusan lama (path di uploads/, /tmp/uploads, ...) → kunci berbasis
+    isi. Tiap file di-hash & disalin lalu di-commit sendiri, jadi aman
+    dihentikan dan diulang; file yang sudah tidak ada di disk dibiarkan
+    (tetap dicari resolve() di folder lama). Bukan migrasi skema — file besar
+    tidak boleh menahan start aplikasi. Mengembalikan (dikonversi, hilang).
+    """
+    from services.repository import get_repository
+
+    with get_repository().connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT id, file_lulusan FROM pengajuan WHERE file_lulusan IS NOT NULL ORDER BY id")
+        rows = [(r[0], r[1]) for r in c.fetchall()]
+
+    dikonversi, hilang = 0, 0
+    for pengajuan_id, nilai in rows:
+        if is_kunci(str(nilai).replace("\\", "/").rsplit("/", 1)[-1]):
+            continue
+        path = resolve(nilai)
+        if path is None:
+            hilang += 1
+            if verbose:
+                print(f"⚠️ Pengajuan {pengajuan_id}: file {nilai} tidak ditemukan")
+            continue
+        kunci = simpan_path(path).kunci
+        with get_repository().connection() as conn:
+            conn.cursor().execute("UPDATE pengajuan SET file_lulusan=? WHERE id=? AND file_lulusan=?",
+                                  (kunci, pengajuan_id, nilai))
+            conn.commit()
+        dikonversi += 1
+        if verbose:
+            print(f"✅ Pengajuan {pengajuan_id}: {os.path.basename(path)} → {kunci}")
+    return dikonversi, hilang
+
+
+def main(argv):
+    if "--konversi-upload-lama" not in argv:
+        print("Pemakaian: python -m services.storage --konversi-upload-lama")
+        return 2
+    dikonversi, hilang = konversi_upload_lama()
+    print(f"📦 {dikonversi} file upload lama dikonversi, {hilang} tidak ditemukan")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
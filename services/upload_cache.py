@@ -0,0 +1,244 @@
+# services/upload_cache.py
+"""
+Cache tabel hasil parsing file upload (xlsx/xls) di disk lokal.
+
+File lulusan yang sama dibuka berkali-kali: pratinjau Kankemenag, pratinjau
+Kanwil, lalu penetapan (hitung baris + penomoran). Tabel yang sudah
+dinormalisasi (header + baris data tanpa baris kosong, lebar = jumlah kolom
+header) disimpan sekali per isi file, dengan kunci hash SHA-256 dari isinya —
+file yang diunggah ulang dengan isi sama memakai cache yang sama, file yang
+diganti otomatis mendapat kunci baru.
+
+Format: satu file pickle berisi beberapa frame berurutan
+    {"versi", "header"}, [baris...], [baris...], ..., {"jumlah": n}
+sehingga pembacaan tetap streaming per potongan (memori datar).
+
+Pratinjau halaman pertama tidak menunggu cache: excel_ingest.read_page
+membaca langsung dari sumber lalu memanggil build_background, sehingga
+cache dibangun di thread latar untuk halaman berikutnya.
+
+Eviction LRU berdasarkan total ukuran (PARSED_CACHE_MAX_BYTES); waktu akses
+disimpan di mtime file cache. PARSED_CACHE_MAX_BYTES=0 mematikan cache.
+"""
+import os, pickle, hashlib, threading, uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from itertools import islice
+
+from services.db_pool import BASE_DIR
+
+CACHE_DIR = os.getenv("PARSED_CACHE_DIR", os.path.join(BASE_DIR, "cache", "parsed_upload"))
+CACHE_MAX_BYTES = int(os.getenv("PARSED_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+FRAME_ROWS = 2000
+FORMAT_VERSI = 1
+HASH_MEMO_MAX = 4096
+
+_lock = threading.Lock()
+_hash_memo = OrderedDict()  # (path, size, mtime_ns) → sha256, LRU maksimal HASH_MEMO_MAX
+_memo_lock = threading.Lock()
+_building = set()  # digest yang sedang dibangun build_background
+_build_lock = threading.Lock()
+
+
+def enabled():
+    return CACHE_MAX_BYTES > 0
+
+
+# ======================
+# KUNCI
+# ======================
+def file_hash(path):
+    """
+    SHA-256 isi file; diingat per (path, ukuran, mtime) supaya tidak dihitung
+    ulang. Memo dibatasi HASH_MEMO_MAX entri (yang paling lama tidak dipakai
+    dibuang), jadi file yang diganti/dihapus tidak menumpuk selamanya.
+    """
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    with _memo_lock:
+        digest = _hash_memo.get(memo_key)
+        if digest:
+            _hash_memo.move_to_end(memo_key)
+            return digest
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for blok in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(blok)
+    digest = h.hexdigest()
+    with _memo_lock:
+        _hash_memo[memo_key] = digest
+        while len(_hash_memo) > HASH_MEMO_MAX:
+            _hash_memo.popitem(last=False)
+    return digest
+
+
+def _cache_path(digest):
+    return os.path.join(CACHE_DIR, f"{digest}.pkl")
+
+
+def is_cached(path):
+    return enabled() and os.path.exists(_cache_path(file_hash(path)))
+
+
+# ======================
+# TULIS / BACA
+# ======================
+def _build(path, rows, digest):
+    """Tulis tabel ke file sementara lalu rename atomik (aman antar proses)."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    target = _cache_path(digest)
+    tmp = f"{target}.{uuid.uuid4().hex}.tmp"
+    jumlah = 0
+    try:
+        with open(tmp, "wb") as f:
+            header = next(rows, None) or ()
+            pickle.dump({"versi": FORMAT_VERSI, "header": tuple(header), "sumber": os.path.basename(path)},
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+            while True:
+                frame = list(islice(rows, FRAME_ROWS))
+                if not frame:
+                    break
+                jumlah += len(frame)
+                pickle.dump(frame, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump({"jumlah": jumlah}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, target)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    evict()
+    return target
+
+
+def _read_frames(f):
+    """Generator header lalu baris-baris dari file cache yang sudah dibuka."""
+    meta = pickle.load(f)
+    if not isinstance(meta, dict) or meta.get("versi") != FORMAT_VERSI:
+        raise ValueError("Format cache tidak dikenal.")
+    yield meta["header"]
+    while True:
+        frame = pickle.load(f)
+        if isinstance(frame, dict):  # footer
+            return
+        yield from frame
+
+
+@contextmanager
+def open_table(path, loader):
+    """
+    Iterator tabel ter-normalisasi (baris pertama = header) untuk `path`.
+
+    `loader(path)` adalah context manager yang menghasilkan iterator yang sama
+    langsung dari file Excel; dipanggil sekali saat cache belum ada, hasilnya
+    ditulis ke cache lalu dibaca dari sana.
+    """
+    if not enabled():
+        with loader(path) as rows:
+            yield rows
+        return
+
+    digest = file_hash(path)
+    target = _cache_path(digest)
+    if not os.path.exists(target):
+        with loader(path) as rows:
+            _build(path, rows, digest)
+
+    try:
+        f = open(target, "rb")
+    except FileNotFoundError:
+        # baru saja tergusur proses lain: baca langsung dari sumber
+        with loader(path) as rows:
+            yield rows
+        return
+
+    with f:
+        _touch(target)
+        yield _read_frames(f)
+
+
+def build_background(path, loader):
+    """
+    Bangun cache `path` di thread latar (sekali per isi file). Tidak melakukan
+    apa-apa bila cache mati, sudah ada, atau sedang dibangun; mengembalikan
+    thread-nya bila dimulai.
+    """
+    if not enabled():
+        return None
+    digest = file_hash(path)
+    if os.path.exists(_cache_path(digest)):
+        return None
+    with _build_lock:
+        if digest in _building:
+            return None
+        _building.add(digest)
+
+    def kerja():
+        try:
+            with loader(path) as rows:
+                _build(path, rows, digest)
+        except Exception as e:
+            print(f"⚠️ Cache {os.path.basename(path)} gagal dibangun: {e}")
+        finally:
+            with _build_lock:
+                _building.discard(digest)
+
+    t = threading.Thread(target=kerja, name=f"upload-cache-{digest[:8]}", daemon=True)
+    t.start()
+    return t
+
+
+# ======================
+# LRU
+# ======================
+def _touch(target):
+    try:
+        os.utime(target, None)
+    except OSError:
+        pass
+
+
+def evict(max_bytes=None):
+    """Hapus file cache yang paling lama tidak diakses sampai total ≤ max_bytes."""
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    with _lock:
+        try:
+            entries = []
+            for name in os.listdir(CACHE_DIR):
+                if not name.endswith(".pkl"):
+                    continue
+                full = os.path.join(CACHE_DIR, name)
+                try:
+                    st = os.stat(full)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, full))
+        except FileNotFoundError:
+            return 0
+
+        total = sum(e[1] for e in entries)
+        dihapus = 0
+        for _, size, full in sorted(entries):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(full)
+                dihapus += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+        return dihapus
+
+
+def stats():
+    """Ringkasan isi cache: {files, bytes, max_bytes}."""
+    files, total = 0, 0
+    if os.path.isdir(CACHE_DIR):
+        for name in os.listdir(CACHE_DIR):
+            if name.endswith(".pkl"):
+                try:
+                    total += os.path.getsize(os.path.join(CACHE_DIR, name))
+                    files += 1
+                except FileNotFoundError:
+                    pass
+    return {"files": files, "bytes": total, "max_bytes": CACHE_MAX_BYTES}
@@ -0,0 +1,192 @@
+# services/verifikasi_publik.py
+"""
+Verifikasi nomor ijazah untuk pihak luar (sekolah, pemberi kerja) tanpa login.
+
+Lalu lintasnya baca saja, banyak berulang dan datang bergelombang, jadi:
+- lookup lewat index UNIQUE nomor_ijazah.nomor_ijazah (satu seek);
+- cache LRU di memori proses untuk nomor yang baru dicek (VERIFIKASI_CACHE_SIZE,
+  VERIFIKASI_CACHE_TTL), termasuk cache negatif untuk nomor yang tidak ada
+  dengan umur lebih pendek (VERIFIKASI_NEGATIF_TTL) supaya nomor yang baru
+  ditetapkan cepat terlihat;
+- format nomor dicek dulu sebelum menyentuh database/cache;
+- rate limit token bucket per IP (VERIFIKASI_RATE token/detik, maksimal
+  VERIFIKASI_BURST). Di balik reverse proxy set VERIFIKASI_TRUST_PROXY=1
+  supaya IP diambil dari X-Forwarded-For.
+
+Tidak memakai session/require_role; data yang dibuka dibatasi (NIS disamarkan).
+"""
+import os, re, time, threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request, jsonify
+
+from services.repository import get_repository
+
+CACHE_SIZE = int(os.getenv("VERIFIKASI_CACHE_SIZE", "10000"))
+CACHE_TTL = float(os.getenv("VERIFIKASI_CACHE_TTL", "600"))
+NEGATIF_TTL = float(os.getenv("VERIFIKASI_NEGATIF_TTL", "60"))
+RATE = float(os.getenv("VERIFIKASI_RATE", "2"))
+BURST = float(os.getenv("VERIFIKASI_BURST", "20"))
+TRUST_PROXY = os.getenv("VERIFIKASI_TRUST_PROXY") == "1"
+
+# huruf/angka dengan pemisah - / . (mis. MDT-12-01-2024/2025-000123)
+POLA_NOMOR = re.compile(r"^[A-Z0-9][A-Z0-9./-]{4,63}$")
+
+_TIDAK_ADA = object()
+
+
+def _conn():
+    return get_repository().connection()
+
+
+# ======================
+# CACHE LRU
+# ======================
+class LRUCache:
+    """LRU + TTL per entri, aman antar thread."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] <= now:
+                if item is not None:
+                    del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return item[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+_cache = LRUCache(CACHE_SIZE)
+
+
+# ======================
+# LOOKUP
+# ======================
+def normalisasi_nomor(nomor):
+    """Nomor dalam bentuk baku (huruf besar, tanpa spasi) atau None bila formatnya tidak mungkin valid."""
+    nomor = re.sub(r"\s+", "", nomor or "").upper()
+    return nomor if POLA_NOMOR.match(nomor) else None
+
+
+def _samarkan(nis):
+    nis = str(nis or "")
+    return "*" * max(len(nis) - 4, 0) + nis[-4:]
+
+
+def cek_nomor(nomor):
+    """Data ijazah publik untuk nomor yang sudah dinormalisasi, atau None bila tidak terdaftar."""
+    hit = _cache.get(nomor)
+    if hit is not None:
+        return None if hit is _TIDAK_ADA else hit
+
+    with _conn() as conn:
+        c = conn.cursor()
+        c.execute("""
+            SELECT n.nomor_ijazah, n.nama_santri, n.nis, n.jenjang, n.tahun,
+                   p.nama_mdt, p.kabupaten, p.tanggal_penetapan
+            FROM nomor_ijazah n
+            LEFT JOIN pengajuan p ON p.id = n.pengajuan_id
+            WHERE n.nomor_ijazah = ?
+        """, (nomor,))
+        row = c.fetchone()
+
+    if row is None:
+        _cache.set(nomor, _TIDAK_ADA, NEGATIF_TTL)
+        return None
+
+    data = {
+        "nomor_ijazah": row[0],
+        "nama_santri": row[1],
+        "nis": _samarkan(row[2]),
+        "jenjang": row[3],
+        "tahun_pelajaran": row[4],
+        "nama_mdt": row[5],
+        "kabupaten": row[6],
+        "tanggal_penetapan": row[7],
+    }
+    _cache.set(nomor, data, CACHE_TTL)
+    return data
+
+
+# ======================
+# RATE LIMIT
+# ======================
+class TokenBucket:
+    """
+    Token bucket per kunci (IP): isi `rate` token/detik sampai `burst`.
+    Bucket disimpan urut waktu akses terakhir (OrderedDict, seperti LRUCache),
+    jadi pembuangan cukup popitem(last=False) dari depan — O(1) per kunci.
+    """
+
+    def __init__(self, rate, burst, max_keys=100_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def ambil(self, key):
+        """(boleh, detik_tunggu) — mengurangi satu token bila tersedia."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, terakhir = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - terakhir) * self.rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                boleh, tunggu = True, 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                boleh, tunggu = False, (1 - tokens) / self.rate
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.max_keys:
+                self._buang(now)
+        return boleh, tunggu
+
+    def _buang(self, now):
+        # bucket yang sudah terisi penuh lagi sama saja dengan IP baru; semuanya
+        # ada di depan. Bila masih melebihi max_keys, yang paling lama diam ikut dibuang.
+        penuh = (self.burst / self.rate) if self.rate else 0
+        while self._buckets:
+            _, terakhir = next(iter(self._buckets.values()))
+            if now - terakhir < penuh and len(self._buckets) <= self.max_keys:
+                break
+            self._buckets.popitem(last=False)
+
+
+_bucket = TokenBucket(RATE, BURST)
+
+
+def client_ip():
+    if TRUST_PROXY:
+        forwarded = request.headers.get("X-Forwarded-For", "")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.remote_addr or "-"
+
+
+def rate_limited(fn):
+    """Decorator route publik: 429 + Retry-After bila token IP ini habis."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        boleh, tunggu = _bucket.ambil(client_ip())
+        if not boleh:
+            resp = jsonify({"error": "Terlalu banyak permintaan, coba lagi sebentar."})
+            resp.status_code = 429
+            resp.headers["Retry-After"] = str(max(1, int(tunggu + 0.999)))
+            return resp
+        return fn(*args, **kwargs)
+    return wrapper
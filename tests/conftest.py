@@ -0,0 +1,39 @@
+# tests/conftest.py
+"""
+Lingkungan uji: database SQLite, folder upload/cache, dan cwd di folder
+sementara — diset sebelum services diimpor, karena path dibaca saat import.
+Worker penetapan tidak dijalankan.
+
+    python -m pytest -q
+"""
+import os, sys, tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_TMP = tempfile.mkdtemp(prefix="sindi_test_")
+os.environ["SINDI_DB_PATH"] = os.path.join(_TMP, "sindi.db")
+os.environ["UPLOAD_ROOT"] = os.path.join(_TMP, "uploads")
+os.environ["PARSED_CACHE_DIR"] = os.path.join(_TMP, "cache", "parsed_upload")
+os.environ["STORAGE_CACHE_DIR"] = os.path.join(_TMP, "cache", "storage")
+os.environ["PENETAPAN_WORKERS"] = "0"
+os.environ.pop("DATABASE_URL", None)
+os.environ.pop("SINDI_DB_BACKEND", None)
+os.chdir(_TMP)  # BASE_DIR = cwd (hasil_excel, cache pdf)
+
+import pytest
+
+from services.migrations import ensure_schema
+from services.repository import get_repository
+
+
+@pytest.fixture(scope="session", autouse=True)
+def skema():
+    ensure_schema(verbose=False)
+
+
+@pytest.fixture
+def conn():
+    with get_repository().connection() as c:
+        yield c
+        c.rollback()
@@ -0,0 +1,70 @@
+# tests/test_db_pool.py
+import threading
+
+import pytest
+
+from services.db_pool import sqlite_connection
+
+
+@pytest.fixture
+def tabel():
+    with sqlite_connection() as conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS _pool_uji (nilai TEXT)")
+        conn.execute("DELETE FROM _pool_uji")
+    yield
+    with sqlite_connection() as conn:
+        conn.execute("DROP TABLE _pool_uji")
+
+
+def _isi():
+    with sqlite_connection() as conn:
+        return sorted(r[0] for r in conn.execute("SELECT nilai FROM _pool_uji"))
+
+
+def test_pinjaman_dalam_berbagi_handle():
+    with sqlite_connection() as luar, sqlite_connection() as dalam:
+        assert luar.raw is dalam.raw
+        assert luar.outermost and not dalam.outermost
+
+
+def test_gagal_di_dalam_tidak_membatalkan_tulisan_luar(tabel):
+    with sqlite_connection() as luar:
+        luar.execute("INSERT INTO _pool_uji VALUES ('luar')")
+        with pytest.raises(RuntimeError):
+            with sqlite_connection() as dalam:
+                dalam.execute("INSERT INTO _pool_uji VALUES ('dalam')")
+                raise RuntimeError("gagal")
+        assert luar.in_transaction
+    # tanpa savepoint tulisan dalam ikut transaksi luar; yang penting luar tidak hilang
+    assert "luar" in _isi()
+
+
+def test_commit_di_dalam_tidak_memotong_transaksi_luar(tabel):
+    with pytest.raises(RuntimeError):
+        with sqlite_connection() as luar:
+            luar.execute("INSERT INTO _pool_uji VALUES ('luar')")
+            with sqlite_connection() as dalam:
+                dalam.execute("INSERT INTO _pool_uji VALUES ('dalam')")
+                dalam.commit()
+            raise RuntimeError("luar gagal")
+    assert _isi() == []
+
+
+def test_pinjaman_terluar_tetap_commit(tabel):
+    with sqlite_connection() as conn:
+        conn.execute("INSERT INTO _pool_uji VALUES ('a')")
+    assert _isi() == ["a"]
+
+
+def test_thread_lain_handle_sendiri():
+    hasil = {}
+
+    def pinjam():
+        with sqlite_connection() as conn:
+            hasil["raw"] = conn.raw
+
+    with sqlite_connection() as conn:
+        t = threading.Thread(target=pinjam)
+        t.start()
+        t.join()
+        assert hasil["raw"] is not conn.raw
@@ -0,0 +1,44 @@
+# tests/test_excel_ingest.py
+import pytest
+from openpyxl import Workbook
+
+from services import upload_cache
+from services.excel_ingest import read_page
+
+
+@pytest.fixture
+def lulusan(tmp_path):
+    path = tmp_path / "lulusan.xlsx"
+    wb = Workbook()
+    wb.active.append(["Nama Santri", "Nomor Induk Santri"])
+    for i in range(30):
+        wb.active.append([f"Santri {i}", str(5000 + i)])
+    wb.active.append([None, None])  # baris kosong dilewati
+    wb.save(path)
+    return str(path)
+
+
+def test_halaman_pertama_tidak_menunggu_cache(lulusan, monkeypatch):
+    dibangun = []
+    monkeypatch.setattr(upload_cache, "build_background", lambda path, loader: dibangun.append(path))
+
+    rows, has_more = read_page(lulusan, 0, 10)
+    assert rows[0] == ["Santri 0", "5000"]
+    assert len(rows) == 10 and has_more
+    assert dibangun == [lulusan]
+    assert not upload_cache.is_cached(lulusan)
+
+
+def test_cache_dibangun_di_latar_lalu_dipakai(lulusan, monkeypatch):
+    threads = []
+    asli = upload_cache.build_background
+    monkeypatch.setattr(upload_cache, "build_background", lambda path, loader: threads.append(asli(path, loader)))
+
+    rows_sumber, _ = read_page(lulusan, 20, 10)
+    threads[0].join()
+    assert upload_cache.is_cached(lulusan)
+
+    rows_cache, has_more = read_page(lulusan, 20, 10)
+    assert rows_cache == rows_sumber
+    assert not has_more
+    assert len(threads) == 1  # halaman kedua dibaca dari cache
@@ -0,0 +1,106 @@
+# tests/test_export_hasil.py
+import os
+
+import pytest
+from openpyxl import Workbook, load_workbook
+
+from services import export_service
+from services.repository import get_repository
+from services.storage import simpan_path
+from services.file_serving import SIDECAR
+from services.mdt_service import create_pengajuan_batch, generate_nomor_ijazah_batch
+from services.export_service import export_hasil, export_hasil_by_nama, nama_file_hasil
+
+
+def _ditetapkan(tmp_path, nama, jumlah):
+    path = tmp_path / f"{nama}.xlsx"
+    wb = Workbook()
+    wb.active.append(["No", "Nama Santri", "Nomor Induk Santri"])
+    for i in range(jumlah):
+        wb.active.append([i + 1, f"{nama} {i}", f"{nama}-{i}"])
+    wb.save(path)
+    mdt = {"id": 1, "kode_mdt": "UJI", "wilayah": "Uji"}
+    pid, _ = create_pengajuan_batch(mdt, nama, "Ulya", "2020/2021", jumlah, simpan_path(str(path)).kunci)
+    with get_repository().connection() as conn:
+        conn.cursor().execute("UPDATE pengajuan SET status='Diverifikasi' WHERE id=?", (pid,))
+    generate_nomor_ijazah_batch(pid)
+    return pid
+
+
+@pytest.fixture
+def render(monkeypatch):
+    """Hitung render sungguhan (jumlah panggilan per pengajuan)."""
+    dipanggil = []
+    asli = export_service._render
+
+    def hitung(pengajuan_id, info, path):
+        dipanggil.append(pengajuan_id)
+        asli(pengajuan_id, info, path)
+
+    monkeypatch.setattr(export_service, "_render", hitung)
+    return dipanggil
+
+
+def _baris(path):
+    return [list(r) for r in load_workbook(path, read_only=True).active.values]
+
+
+def test_dirender_sekali_lalu_dari_cache(tmp_path, render):
+    pid = _ditetapkan(tmp_path, "EH1", 3)
+    path, nama = export_hasil(pid)
+    assert nama == nama_file_hasil("EH1", "2020/2021", "Ulya", pid)
+    assert export_hasil(pid) == (path, nama)
+    assert render == [pid]
+    assert os.path.exists(path + SIDECAR)
+
+    rows = _baris(path)
+    assert rows[0] == ["No", "Nama Santri", "Nomor Induk Santri", "Nomor Ijazah"]
+    assert rows[1][:3] == [1, "EH1 0", "EH1-0"]
+    assert rows[1][3].startswith("MDT-12-III-2020/2021-")
+    assert len(rows) == 1 + 3
+
+
+def test_nomor_baru_mengganti_versi(tmp_path, render):
+    pid = _ditetapkan(tmp_path, "EH2", 2)
+    lama, _ = export_hasil(pid)
+    with get_repository().connection() as conn:
+        conn.cursor().execute("""
+            INSERT INTO nomor_ijazah (pengajuan_id, nama_santri, nis, nomor_ijazah, tahun, jenjang)
+            VALUES (?, 'Susulan', 'EH2-X', 'MDT-12-III-2020/2021-SUSULAN', '2020/2021', 'Ulya')
+        """, (pid,))
+        conn.commit()
+
+    baru, _ = export_hasil(pid)
+    assert baru != lama
+    assert render == [pid, pid]
+    assert not os.path.exists(lama) and not os.path.exists(lama + SIDECAR)
+    # staging (2 baris) tidak lagi sama dengan jumlah nomor → kolom ringkas
+    rows = _baris(baru)
+    assert rows[0] == ["Nama Santri", "NIS", "Nomor Ijazah"]
+    assert rows[-1] == ["Susulan", "EH2-X", "MDT-12-III-2020/2021-SUSULAN"]
+
+
+def test_belum_ditetapkan_tidak_dirender(tmp_path, render):
+    path = tmp_path / "belum.xlsx"
+    wb = Workbook()
+    wb.active.append(["Nama Santri", "Nomor Induk Santri"])
+    wb.active.append(["A", "1"])
+    wb.save(path)
+    pid, _ = create_pengajuan_batch({"id": 1, "kode_mdt": "UJI", "wilayah": "Uji"}, "EH3", "Ulya",
+                                    "2020/2021", 1, simpan_path(str(path)).kunci)
+    assert export_hasil(pid) is None
+    assert render == []
+
+
+def test_nama_harus_cocok_sebelum_render(tmp_path, render):
+    pid = _ditetapkan(tmp_path, "EH4", 1)
+    nama = nama_file_hasil("EH4", "2020/2021", "Ulya", pid)
+
+    assert export_hasil_by_nama(nama.replace("EH4", "TEBAKAN")) is None
+    assert export_hasil_by_nama(f"HASIL_EH4_{pid}.pdf") is None
+    assert export_hasil_by_nama("../../sindi.db") is None
+    assert render == []
+
+    path, unduh = export_hasil_by_nama(nama)
+    assert unduh == nama and os.path.isfile(path)
+    assert render == [pid]
@@ -0,0 +1,87 @@
+# tests/test_export_pdf.py
+import os, re, zipfile
+
+import pytest
+from openpyxl import Workbook
+
+from services import export_service, pdf_service
+from services.repository import get_repository
+from services.storage import simpan_path
+from services.mdt_service import create_pengajuan_batch, generate_nomor_ijazah_batch
+from services.export_service import export_pdf, export_pdf_zip
+from services.job_service import enqueue_export_pdf_zip, get_job, run_job, JENIS_PDF_ZIP
+
+
+def _pengajuan(tmp_path, nama, jumlah, tetapkan=True):
+    path = tmp_path / f"{nama}.xlsx"
+    wb = Workbook()
+    wb.active.append(["Nama Santri", "Nomor Induk Santri"])
+    for i in range(jumlah):
+        wb.active.append([f"{nama} Santri {i}", f"{nama}-{i}"])
+    wb.save(path)
+    mdt = {"id": 1, "kode_mdt": "UJI", "wilayah": "Uji"}
+    pid, _ = create_pengajuan_batch(mdt, nama, "Ula", "2021/2022", jumlah, simpan_path(str(path)).kunci)
+    if tetapkan:
+        with get_repository().connection() as conn:
+            conn.cursor().execute("UPDATE pengajuan SET status='Diverifikasi' WHERE id=?", (pid,))
+        generate_nomor_ijazah_batch(pid)
+    return pid
+
+
+@pytest.fixture
+def render(monkeypatch):
+    dipanggil = []
+    asli = pdf_service.render_daftar_pdf
+
+    def hitung(pengajuan_id, info, path):
+        dipanggil.append(pengajuan_id)
+        asli(pengajuan_id, info, path)
+
+    monkeypatch.setattr(pdf_service, "render_daftar_pdf", hitung)
+    return dipanggil
+
+
+def test_pdf_dirender_sekali(tmp_path, render):
+    pid = _pengajuan(tmp_path, "PD1", 60)  # lebih dari satu halaman
+    path, nama = export_pdf(pid)
+    assert nama.endswith(f"_{pid}.pdf")
+    with open(path, "rb") as f:
+        isi = f.read()
+    assert isi.startswith(b"%PDF")
+    assert len(re.findall(rb"/Type /Page(?!s)", isi)) >= 2
+
+    assert export_pdf(pid) == (path, nama)
+    assert render == [pid]
+
+
+def test_template_dibuat_sekali():
+    assert pdf_service.get_template() is pdf_service.get_template()
+
+
+def test_zip_berisi_pdf_dan_daftar_gagal(tmp_path):
+    ok = [_pengajuan(tmp_path, f"PZ{i}", 3) for i in range(2)]
+    belum = _pengajuan(tmp_path, "PZB", 1, tetapkan=False)
+    path = str(tmp_path / "out" / "daftar.zip")
+
+    gagal = export_pdf_zip(ok + [belum], path, max_workers=1)
+    assert list(gagal) == [belum]
+    with zipfile.ZipFile(path) as zf:
+        nama = zf.namelist()
+        assert len(nama) == 2 and all(n.endswith(".pdf") for n in nama)
+        assert all(zf.read(n).startswith(b"%PDF") for n in nama)
+    assert os.listdir(tmp_path / "out") == ["daftar.zip"]  # tanpa sisa .tmp
+
+
+def test_job_zip_pdf(tmp_path):
+    ids = [_pengajuan(tmp_path, f"PJ{i}", 2) for i in range(2)]
+    job_id = enqueue_export_pdf_zip(ids, "daftar.zip", "kanwil")
+    job = get_job(job_id)
+    assert job["jenis"] == JENIS_PDF_ZIP
+
+    run_job(job)
+    job = get_job(job_id)
+    assert job["status"] == "selesai"
+    assert (job["laporan"]["berhasil"], job["laporan"]["gagal"]) == (2, 0)
+    assert job["hasil_file"] == export_service.path_file_job(job_id, "zip")
+    with zipfile.ZipFile(job["hasil_file"]) as zf:
+        assert len(zf.namelist()) == 2
@@ -0,0 +1,95 @@
+# tests/test_file_serving.py
+import os, time, hashlib
+
+import pytest
+from flask import Flask
+
+from services import file_serving
+from services.file_serving import kirim_file, SIDECAR, CACHE_IMMUTABLE, CACHE_REVALIDATE
+
+ISI = b"0123456789" * 100
+
+
+@pytest.fixture
+def berkas(tmp_path):
+    path = tmp_path / "hasil.pdf"
+    path.write_bytes(ISI)
+    return str(path)
+
+
+@pytest.fixture
+def client(berkas):
+    app = Flask(__name__)
+
+    @app.route("/berkas")
+    def unduh():
+        return kirim_file(app.config["PATH"], download_name="Hasil Penetapan.pdf")
+
+    app.config["PATH"] = berkas
+    return app.test_client()
+
+
+def test_etag_sha256_dan_sidecar(client, berkas):
+    r = client.get("/berkas")
+    assert r.status_code == 200
+    assert r.data == ISI
+    assert r.headers["ETag"] == f'"{hashlib.sha256(ISI).hexdigest()}"'
+    assert r.headers["Cache-Control"] == CACHE_REVALIDATE
+    assert r.headers["Accept-Ranges"] == "bytes"
+    assert os.path.exists(berkas + SIDECAR)
+
+
+def test_if_none_match_304(client):
+    etag = client.get("/berkas").headers["ETag"]
+    r = client.get("/berkas", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.data == b""
+    assert client.get("/berkas", headers={"If-None-Match": '"lain"'}).status_code == 200
+
+
+def test_etag_berubah_bila_isi_berubah(client, berkas):
+    etag = client.get("/berkas").headers["ETag"]
+    time.sleep(0.01)
+    with open(berkas, "wb") as f:
+        f.write(b"isi baru")
+    r = client.get("/berkas", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.data == b"isi baru"
+    assert r.headers["ETag"] != etag
+
+
+def test_range_206(client):
+    r = client.get("/berkas", headers={"Range": "bytes=10-19"})
+    assert r.status_code == 206
+    assert r.data == ISI[10:20]
+    assert r.headers["Content-Range"] == f"bytes 10-19/{len(ISI)}"
+
+    r = client.get("/berkas", headers={"Range": "bytes=-5"})
+    assert r.status_code == 206
+    assert r.data == ISI[-5:]
+
+
+def test_range_di_luar_ukuran_416(client):
+    assert client.get("/berkas", headers={"Range": f"bytes={len(ISI) + 10}-"}).status_code == 416
+
+
+def test_file_berbasis_isi_immutable(client, tmp_path):
+    digest = hashlib.sha256(ISI).hexdigest()
+    path = tmp_path / f"{digest}.xlsx"
+    path.write_bytes(ISI)
+    client.application.config["PATH"] = str(path)
+
+    r = client.get("/berkas")
+    assert r.headers["ETag"] == f'"{digest}"'
+    assert r.headers["Cache-Control"] == CACHE_IMMUTABLE
+    assert not os.path.exists(str(path) + SIDECAR)
+
+
+def test_x_sendfile_tanpa_isi(client, berkas, monkeypatch):
+    monkeypatch.setattr(file_serving, "OFFLOAD", "x-sendfile")
+    r = client.get("/berkas")
+    assert r.status_code == 200
+    assert r.data == b""
+    assert r.headers["X-Sendfile"] == os.path.realpath(berkas)
+    assert r.headers["Content-Disposition"].startswith("inline")
+    assert client.get("/berkas", headers={"If-None-Match": r.headers["ETag"]}).status_code == 304
@@ -0,0 +1,109 @@
+# tests/test_job_service.py
+import pytest
+from openpyxl import Workbook
+
+from services.repository import get_repository
+from services.storage import simpan_path
+from services.mdt_service import create_pengajuan_batch
+from services.job_service import (
+    enqueue_penetapan, claim_next_job, requeue_stale_jobs, run_job, get_job, list_active_jobs,
+    MAX_ATTEMPTS,
+)
+
+
+def _pengajuan(tmp_path, nama, jumlah=2, status="Diverifikasi"):
+    path = tmp_path / f"{nama}.xlsx"
+    wb = Workbook()
+    wb.active.append(["Nama Santri", "Nomor Induk Santri"])
+    for i in range(jumlah):
+        wb.active.append([f"{nama} {i}", f"{nama}-{i}"])
+    wb.save(path)
+    mdt = {"id": 1, "kode_mdt": "UJI", "wilayah": "Uji"}
+    pengajuan_id, _ = create_pengajuan_batch(mdt, nama, "Wustha", "2017/2018", jumlah, simpan_path(str(path)).kunci)
+    with get_repository().connection() as conn:
+        conn.cursor().execute("UPDATE pengajuan SET status=? WHERE id=?", (status, pengajuan_id))
+    return pengajuan_id
+
+
+def _sql(query, params=()):
+    with get_repository().connection() as conn:
+        c = conn.cursor()
+        c.execute(query, params)
+        conn.commit()
+        return c.fetchall() if c.description else None
+
+
+@pytest.fixture(autouse=True)
+def antrian_kosong():
+    _sql("DELETE FROM penetapan_job")
+
+
+def test_klik_ganda_tidak_membuat_job_baru(tmp_path):
+    pid = _pengajuan(tmp_path, "JQ1")
+    job_id = enqueue_penetapan(pid, "kanwil")
+    assert enqueue_penetapan(pid, "kanwil") == job_id
+    assert list(list_active_jobs()) == [pid]
+
+
+def test_klaim_urut_dan_sekali_saja(tmp_path):
+    pertama = enqueue_penetapan(_pengajuan(tmp_path, "JQ2"))
+    kedua = enqueue_penetapan(_pengajuan(tmp_path, "JQ3"))
+
+    job = claim_next_job("w1")
+    assert (job["id"], job["status"], job["attempts"]) == (pertama, "proses", 1)
+    assert claim_next_job("w2")["id"] == kedua
+    assert claim_next_job("w1") is None
+
+
+def test_job_basi_diulang_lalu_digagalkan(tmp_path):
+    job_id = enqueue_penetapan(_pengajuan(tmp_path, "JQ4"))
+    for percobaan in range(1, MAX_ATTEMPTS + 1):
+        assert claim_next_job("mati")["attempts"] == percobaan
+        _sql("UPDATE penetapan_job SET heartbeat=0 WHERE id=?", (job_id,))  # worker mati
+        requeue_stale_jobs()
+        status = get_job(job_id)["status"]
+        assert status == ("antri" if percobaan < MAX_ATTEMPTS else "gagal")
+    assert "berulang" in get_job(job_id)["pesan"]
+
+
+def test_heartbeat_segar_tidak_diulang(tmp_path):
+    job_id = enqueue_penetapan(_pengajuan(tmp_path, "JQ5"))
+    claim_next_job("hidup")
+    requeue_stale_jobs()
+    assert get_job(job_id)["status"] == "proses"
+
+
+def test_run_job_menetapkan(tmp_path):
+    pid = _pengajuan(tmp_path, "JQ6", 3)
+    enqueue_penetapan(pid)
+    job = claim_next_job("w1")
+    run_job(job)
+
+    job = get_job(job["id"])
+    assert (job["status"], job["progress"]) == ("selesai", 100)
+    assert _sql("SELECT status FROM pengajuan WHERE id=?", (pid,))[0][0] == "Ditetapkan"
+    assert _sql("SELECT COUNT(*) FROM nomor_ijazah WHERE pengajuan_id=?", (pid,))[0][0] == 3
+
+
+def test_run_job_ulang_setelah_commit(tmp_path):
+    # worker mati setelah commit: percobaan berikutnya tidak menomori ulang
+    pid = _pengajuan(tmp_path, "JQ7")
+    enqueue_penetapan(pid)
+    run_job(claim_next_job("w1"))
+    _sql("UPDATE penetapan_job SET status='antri'")
+
+    job = claim_next_job("w2")
+    run_job(job)
+    assert get_job(job["id"])["pesan"] == "Sudah ditetapkan"
+    assert _sql("SELECT COUNT(*) FROM nomor_ijazah WHERE pengajuan_id=?", (pid,))[0][0] == 2
+
+
+def test_run_job_gagal_dicatat(tmp_path):
+    pid = _pengajuan(tmp_path, "JQ8", status="Menunggu")
+    enqueue_penetapan(pid)
+    job = claim_next_job("w1")
+    run_job(job)
+
+    job = get_job(job["id"])
+    assert job["status"] == "gagal"
+    assert "belum diverifikasi" in job["pesan"]
@@ -0,0 +1,92 @@
+# tests/test_migrations.py
+import os, sqlite3
+
+import pytest
+
+from services.migrations import (
+    MIGRATIONS, LATEST_VERSION, MigrasiTertunda, run_migrations, applied_versions, _Db,
+)
+
+
+@pytest.fixture
+def db_baru(tmp_path):
+    conn = sqlite3.connect(tmp_path / "ledger.db")
+    yield conn
+    conn.close()
+
+
+def _ledger(conn):
+    return [tuple(r) for r in conn.execute("SELECT version, nama FROM schema_migrations ORDER BY version")]
+
+
+def test_semua_migrasi_tercatat_berurutan(db_baru):
+    assert run_migrations(db_baru, verbose=False) == [v for v, _, _ in MIGRATIONS]
+    assert _ledger(db_baru) == [(v, nama) for v, nama, _ in MIGRATIONS]
+    assert max(applied_versions(_Db(db_baru))) == LATEST_VERSION
+
+
+def test_versi_unik_dan_naik():
+    versi = [v for v, _, _ in MIGRATIONS]
+    assert versi == sorted(set(versi))
+    assert versi == list(range(1, len(versi) + 1))
+
+
+def test_jalan_ulang_tidak_menjalankan_apa_pun(db_baru):
+    run_migrations(db_baru, verbose=False)
+    ledger = _ledger(db_baru)
+    assert run_migrations(db_baru, verbose=False) == []
+    assert _ledger(db_baru) == ledger
+
+
+def _nomor_ganda(conn):
+    """Kembalikan database ke keadaan sebelum migrasi 009 dengan nomor ganda."""
+    conn.execute("DROP INDEX idx_nomor_ijazah_nomor")
+    conn.execute("DELETE FROM schema_migrations WHERE version=9")
+    conn.executemany("INSERT INTO nomor_ijazah (pengajuan_id, nomor_ijazah) VALUES (1, ?)",
+                     [("MDT-12-I-2024/2025-000001",)] * 2)
+    conn.commit()
+
+
+def test_migrasi_tertunda_dilewati_lalu_dicoba_lagi(db_baru, capsys):
+    run_migrations(db_baru, verbose=False)
+    _nomor_ganda(db_baru)
+
+    assert run_migrations(db_baru, verbose=False) == []
+    assert 9 not in applied_versions(_Db(db_baru))
+    assert "ditunda" in capsys.readouterr().out
+
+    db_baru.execute("DELETE FROM nomor_ijazah WHERE rowid = (SELECT MAX(rowid) FROM nomor_ijazah)")
+    db_baru.commit()
+    assert run_migrations(db_baru, verbose=False) == [9]
+
+
+def test_migrasi_tertunda_gagal_di_cli(db_baru):
+    run_migrations(db_baru, verbose=False)
+    _nomor_ganda(db_baru)
+    with pytest.raises(MigrasiTertunda):
+        run_migrations(db_baru, verbose=False, strict=True)
+
+
+def test_upload_lama_dikonversi_lewat_perintah_terpisah(tmp_path):
+    from services.repository import get_repository
+    from services.storage import UPLOAD_ROOT, is_kunci, resolve, konversi_upload_lama
+
+    os.makedirs(UPLOAD_ROOT, exist_ok=True)
+    with open(os.path.join(UPLOAD_ROOT, "lama.xlsx"), "wb") as f:
+        f.write(b"isi upload lama")
+    with get_repository().connection() as conn:
+        pid = conn.insert_returning("INSERT INTO pengajuan (nama_mdt, file_lulusan) VALUES (?, ?)",
+                                    ("Lama", "/tmp/uploads/lama.xlsx"))
+        hilang = conn.insert_returning("INSERT INTO pengajuan (nama_mdt, file_lulusan) VALUES (?, ?)",
+                                       ("Hilang", "uploads/tidak_ada.xlsx"))
+        conn.commit()
+
+    assert konversi_upload_lama(verbose=False) == (1, 1)
+    with get_repository().connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT id, file_lulusan FROM pengajuan WHERE id IN (?, ?)", (pid, hilang))
+        nilai = dict(c.fetchall())
+    assert is_kunci(nilai[pid])
+    assert open(resolve(nilai[pid]), "rb").read() == b"isi upload lama"
+    assert nilai[hilang] == "uploads/tidak_ada.xlsx"
+    assert konversi_upload_lama(verbose=False) == (0, 1)  # diulang: yang sudah berkunci dilewati
@@ -0,0 +1,62 @@
+# tests/test_nomor_sequence.py
+import multiprocessing as mp
+
+import pytest
+
+from services.repository import get_repository
+from services.nomor_sequence import reserve_nomor_urut
+
+
+def _pesan(jenjang, tahun, jumlah):
+    with get_repository().connection() as conn:
+        awal = reserve_nomor_urut(conn, jenjang, tahun, jumlah)
+        conn.commit()
+    return awal
+
+
+def _pesan_berulang(args):
+    tahun, jumlah, kali = args
+    return [(_pesan("Ula", tahun, jumlah), jumlah) for _ in range(kali)]
+
+
+def test_batch_berurutan_tanpa_celah():
+    blok = [(_pesan("Ula", "2001/2002", n), n) for n in (3, 1, 7, 2)]
+    assert blok == [(1, 3), (4, 1), (5, 7), (12, 2)]
+
+
+def test_namespace_terpisah_per_jenjang_dan_tahun():
+    assert _pesan("Wustha", "2002/2003", 5) == 1
+    assert _pesan("Ulya", "2002/2003", 5) == 1
+    assert _pesan("Wustha", "2003/2004", 5) == 1
+    assert _pesan("Wustha", "2002/2003", 1) == 6
+
+
+def test_rollback_mengembalikan_counter():
+    with get_repository().connection() as conn:
+        assert reserve_nomor_urut(conn, "Ula", "2004/2005", 10) == 1
+        conn.rollback()
+    assert _pesan("Ula", "2004/2005", 4) == 1
+
+
+def test_seed_dari_nomor_lama_dibandingkan_sebagai_angka(conn):
+    for nomor in ("MDT-12-III-2005/2006-999999", "MDT-12-III-2005/2006-1000000",
+                  "MDT-12-III-2005/2006-00012x"):
+        conn.cursor().execute(
+            "INSERT INTO nomor_ijazah (pengajuan_id, nama_santri, nis, nomor_ijazah, tahun, jenjang) "
+            "VALUES (0, 'lama', ?, ?, '2005/2006', 'Ulya')", (nomor, nomor))
+    assert reserve_nomor_urut(conn, "Ulya", "2005/2006", 2) == 1000001
+
+
+def test_jumlah_harus_positif(conn):
+    with pytest.raises(ValueError):
+        reserve_nomor_urut(conn, "Ula", "2006/2007", 0)
+
+
+def test_antar_proses_tidak_dobel_dan_tidak_bolong():
+    proses, kali, jumlah = 4, 25, 3
+    with mp.get_context("fork").Pool(proses) as pool:
+        hasil = pool.map(_pesan_berulang, [("2007/2008", jumlah, kali)] * proses)
+
+    nomor = sorted(awal + i for blok in hasil for awal, n in blok for i in range(n))
+    assert nomor == list(range(1, proses * kali * jumlah + 1))
+
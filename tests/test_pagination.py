@@ -0,0 +1,72 @@
+# tests/test_pagination.py
+import pytest
+
+from services.pagination import keyset_page, encode_cursor, decode_cursor, MAX_PER_PAGE
+
+SELECT = "SELECT id, tanggal, grup FROM _halaman"
+
+
+@pytest.fixture
+def tabel(conn):
+    c = conn.cursor()
+    c.execute("CREATE TEMP TABLE _halaman (id INTEGER PRIMARY KEY, tanggal TEXT, grup TEXT)")
+    # tanggal sengaja kembar (3 baris per tanggal) supaya id menjadi pemecah seri
+    for i in range(1, 31):
+        c.execute("INSERT INTO _halaman (id, tanggal, grup) VALUES (?, ?, ?)",
+                  (i, f"2024-01-{(i - 1) // 3 + 1:02d}", "a" if i % 2 else "b"))
+    yield conn
+    conn.rollback()
+    c.execute("DROP TABLE _halaman")
+
+
+def _semua(conn, **kw):
+    halaman, cursor = [], None
+    while True:
+        page = keyset_page(conn, SELECT, cursor=cursor, **kw)
+        halaman.append(page)
+        if not page.has_more:
+            return halaman
+        cursor = page.next_cursor
+
+
+def test_halaman_pas_tanpa_halaman_kosong(tabel):
+    halaman = _semua(tabel, per_page=10)
+    assert [len(p) for p in halaman] == [10, 10, 10]
+    assert [r[0] for p in halaman for r in p] == list(range(30, 0, -1))
+    assert halaman[0].is_first and not halaman[1].is_first
+
+
+def test_halaman_terakhir_sisa(tabel):
+    halaman = _semua(tabel, per_page=7)
+    assert [len(p) for p in halaman] == [7, 7, 7, 7, 2]
+    assert halaman[-1].next_cursor is None
+
+
+def test_urut_naik_dengan_filter(tabel):
+    halaman = _semua(tabel, where="grup=?", params=["a"], per_page=4, descending=False)
+    assert [r[0] for p in halaman for r in p] == list(range(1, 31, 2))
+
+
+def test_kunci_komposit_tidak_melewatkan_seri(tabel):
+    # per_page=4 memotong di tengah kelompok tanggal yang sama
+    halaman = _semua(tabel, order_by=("tanggal", "id"), key=lambda r: (r[1], r[0]), per_page=4)
+    ids = [r[0] for p in halaman for r in p]
+    assert ids == list(range(30, 0, -1))
+    assert len(set(ids)) == 30
+
+
+def test_cursor_tidak_valid_kembali_ke_halaman_pertama(tabel):
+    for cursor in ("bukan-base64!!", encode_cursor([1, 2]), ""):
+        page = keyset_page(tabel, SELECT, cursor=cursor, per_page=5)
+        assert [r[0] for r in page] == [30, 29, 28, 27, 26]
+        assert page.cursor is None
+
+
+def test_per_page_dibatasi(tabel):
+    assert keyset_page(tabel, SELECT, per_page=10_000).per_page == MAX_PER_PAGE
+    assert keyset_page(tabel, SELECT, per_page="x").per_page > 0
+
+
+def test_cursor_bolak_balik():
+    assert decode_cursor(encode_cursor(["2024-01-02", 5]), 2) == ["2024-01-02", 5]
+    assert decode_cursor(encode_cursor([5]), 2) is None
@@ -0,0 +1,73 @@
+# tests/test_penetapan.py
+import pytest
+from openpyxl import Workbook
+
+from services.repository import get_repository
+from services.storage import simpan_path
+from services.mdt_service import create_pengajuan_batch, generate_nomor_ijazah_batch
+
+
+def _pengajuan(tmp_path, nama, jumlah, tahun, status="Diverifikasi"):
+    path = tmp_path / f"{nama}.xlsx"
+    wb = Workbook()
+    wb.active.append(["Nama Santri", "Nomor Induk Santri"])
+    for i in range(jumlah):
+        wb.active.append([f"{nama} {i}", f"{nama}-{i}"])
+    wb.save(path)
+    mdt = {"id": 1, "kode_mdt": "UJI", "wilayah": "Uji"}
+    pengajuan_id, _ = create_pengajuan_batch(mdt, nama, "Wustha", tahun, jumlah, simpan_path(str(path)).kunci)
+    with get_repository().connection() as conn:
+        conn.cursor().execute("UPDATE pengajuan SET status=? WHERE id=?", (status, pengajuan_id))
+    return pengajuan_id
+
+
+def _nomor(tahun):
+    with get_repository().connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT pengajuan_id, nomor_ijazah FROM nomor_ijazah WHERE tahun=? ORDER BY id", (tahun,))
+        return [tuple(r) for r in c.fetchall()]
+
+
+def test_id_pengajuan_unik_walau_dibuat_pada_detik_yang_sama(tmp_path):
+    # nomor_batch beresolusi detik; id dari RETURNING tetap berbeda
+    assert len({_pengajuan(tmp_path, f"S{i}", 1, "2008/2009") for i in range(3)}) == 3
+
+
+def test_beberapa_pengajuan_bernomor_urut(tmp_path):
+    tahun = "2009/2010"
+    ids = [_pengajuan(tmp_path, nama, n, tahun) for nama, n in (("A", 3), ("B", 4), ("C", 2))]
+    for pid in ids:
+        generate_nomor_ijazah_batch(pid)
+
+    rows = _nomor(tahun)
+    assert [r[0] for r in rows] == [ids[0]] * 3 + [ids[1]] * 4 + [ids[2]] * 2
+    assert [r[1] for r in rows] == [f"MDT-12-II-{tahun}-{i:06d}" for i in range(1, 10)]
+
+
+def test_tidak_bisa_ditetapkan_dua_kali(tmp_path):
+    tahun = "2010/2011"
+    pid = _pengajuan(tmp_path, "D", 2, tahun)
+    generate_nomor_ijazah_batch(pid)
+    with pytest.raises(Exception, match="sudah diproses"):
+        generate_nomor_ijazah_batch(pid)
+    assert len(_nomor(tahun)) == 2
+
+
+@pytest.mark.parametrize("status", ["Menunggu", "Ditolak"])
+def test_hanya_pengajuan_diverifikasi(tmp_path, status):
+    tahun = f"2011/2012-{status}"
+    pid = _pengajuan(tmp_path, status, 2, tahun, status=status)
+    with pytest.raises(Exception, match="belum diverifikasi"):
+        generate_nomor_ijazah_batch(pid)
+    assert _nomor(tahun) == []
+
+
+def test_pengajuan_yang_sudah_bernomor_tidak_dinomori_ulang(tmp_path):
+    tahun = "2012/2013"
+    pid = _pengajuan(tmp_path, "E", 2, tahun)
+    generate_nomor_ijazah_batch(pid)
+    with get_repository().connection() as conn:  # status dikembalikan manual
+        conn.cursor().execute("UPDATE pengajuan SET status='Diverifikasi' WHERE id=?", (pid,))
+    with pytest.raises(Exception, match="sudah diproses"):
+        generate_nomor_ijazah_batch(pid)
+    assert len(_nomor(tahun)) == 2
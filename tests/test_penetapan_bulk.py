@@ -0,0 +1,91 @@
+# tests/test_penetapan_bulk.py
+import pytest
+from openpyxl import Workbook
+
+from services import penetapan_bulk
+from services.repository import get_repository
+from services.storage import simpan_path
+from services.mdt_service import create_pengajuan_batch
+from services.penetapan_bulk import select_pengajuan_ids, tetapkan_bulk
+from services.job_service import enqueue_penetapan_massal, get_job, run_job
+
+KABUPATEN = "Kab. Uji Massal"
+
+
+def _pengajuan(tmp_path, nama, jumlah, jenjang="Ula", status="Diverifikasi", kabupaten=KABUPATEN):
+    path = tmp_path / f"{nama}.xlsx"
+    wb = Workbook()
+    wb.active.append(["Nama Santri", "Nomor Induk Santri"])
+    for i in range(jumlah):
+        wb.active.append([f"{nama} {i}", f"{nama}-{i}"])
+    wb.save(path)
+    mdt = {"id": 1, "kode_mdt": "UJI", "wilayah": kabupaten}
+    pengajuan_id, _ = create_pengajuan_batch(mdt, nama, jenjang, "2015/2016", jumlah, simpan_path(str(path)).kunci)
+    with get_repository().connection() as conn:
+        conn.cursor().execute("UPDATE pengajuan SET status=?, kabupaten=? WHERE id=?", (status, kabupaten, pengajuan_id))
+    return pengajuan_id
+
+
+def _status(pengajuan_id):
+    with get_repository().connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT status FROM pengajuan WHERE id=?", (pengajuan_id,))
+        return c.fetchone()[0]
+
+
+@pytest.fixture
+def tanpa_pool(monkeypatch):
+    """Di SQLite pool proses tidak boleh dipakai (satu penulis)."""
+    def jangan(*a, **kw):
+        raise AssertionError("ProcessPoolExecutor dipakai di SQLite")
+    monkeypatch.setattr(penetapan_bulk, "ProcessPoolExecutor", jangan)
+
+
+def test_pilih_sesuai_filter(tmp_path):
+    kab = "Kab. Uji Filter"
+    ula = _pengajuan(tmp_path, "F1", 1, "Ula", kabupaten=kab)
+    wustha = _pengajuan(tmp_path, "F2", 1, "Wustha", kabupaten=kab)
+    _pengajuan(tmp_path, "F3", 1, "Ula", status="Menunggu", kabupaten=kab)
+
+    assert select_pengajuan_ids(kabupaten=kab) == [ula, wustha]
+    assert select_pengajuan_ids(kabupaten=kab, jenjang="Wustha") == [wustha]
+    assert select_pengajuan_ids(pengajuan_ids=[wustha, 999999]) == [wustha]
+
+
+def test_massal_berurutan_di_sqlite(tmp_path, tanpa_pool):
+    ids = [_pengajuan(tmp_path, f"M{i}", n) for i, n in enumerate((2, 3, 1))]
+    persen = []
+
+    laporan = tetapkan_bulk(pengajuan_ids=ids, max_workers=4, progress=lambda p, pesan=None: persen.append(p))
+    assert (laporan["total"], laporan["berhasil"], laporan["gagal"]) == (3, 3, 0)
+    assert laporan["jumlah_santri"] == 6
+    assert [d["pengajuan_id"] for d in laporan["detail"]] == ids
+    assert persen == [33, 66, 100]
+    assert {_status(pid) for pid in ids} == {"Ditetapkan"}
+
+
+def test_batch_gagal_tidak_menghentikan_yang_lain(tmp_path, tanpa_pool):
+    ok = _pengajuan(tmp_path, "G1", 2)
+    rusak = _pengajuan(tmp_path, "G2", 2)
+    with get_repository().connection() as conn:  # seolah sudah bernomor sebagian
+        conn.cursor().execute("INSERT INTO nomor_ijazah (pengajuan_id, nomor_ijazah) VALUES (?, ?)",
+                              (rusak, "MDT-UJI-GANDA-1"))
+        conn.commit()
+
+    laporan = tetapkan_bulk(pengajuan_ids=[ok, rusak])
+    assert (laporan["berhasil"], laporan["gagal"]) == (1, 1)
+    gagal = next(d for d in laporan["detail"] if d["status"] == "gagal")
+    assert gagal["pengajuan_id"] == rusak and "sudah diproses" in gagal["error"]
+    assert (_status(ok), _status(rusak)) == ("Ditetapkan", "Diverifikasi")
+
+
+def test_job_massal(tmp_path, tanpa_pool):
+    kab = "Kab. Uji Job Massal"
+    ids = [_pengajuan(tmp_path, f"J{i}", 2, kabupaten=kab) for i in range(2)]
+
+    job_id = enqueue_penetapan_massal(kabupaten=kab, diajukan_oleh="kanwil")
+    run_job(get_job(job_id))
+    job = get_job(job_id)
+    assert job["status"] == "selesai"
+    assert (job["laporan"]["berhasil"], job["laporan"]["jumlah_santri"]) == (2, 4)
+    assert {_status(pid) for pid in ids} == {"Ditetapkan"}
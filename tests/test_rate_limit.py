@@ -0,0 +1,102 @@
+# tests/test_rate_limit.py
+import pytest
+from flask import Flask
+
+from services import verifikasi_publik
+from services.verifikasi_publik import TokenBucket, rate_limited
+
+
+class Jam:
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self):
+        return self.t
+
+
+@pytest.fixture
+def jam(monkeypatch):
+    jam = Jam()
+    monkeypatch.setattr(verifikasi_publik.time, "monotonic", jam)
+    return jam
+
+
+def test_burst_lalu_ditolak(jam):
+    bucket = TokenBucket(rate=2, burst=3)
+    assert [bucket.ambil("ip")[0] for _ in range(4)] == [True, True, True, False]
+    boleh, tunggu = bucket.ambil("ip")
+    assert not boleh
+    assert tunggu == pytest.approx(0.5)
+
+
+def test_token_terisi_lagi_sesuai_rate(jam):
+    bucket = TokenBucket(rate=2, burst=3)
+    for _ in range(3):
+        bucket.ambil("ip")
+    jam.t += 0.5
+    assert bucket.ambil("ip")[0]
+    assert not bucket.ambil("ip")[0]
+    jam.t += 60  # tidak melebihi burst walau lama menganggur
+    assert [bucket.ambil("ip")[0] for _ in range(4)] == [True, True, True, False]
+
+
+def test_bucket_per_ip(jam):
+    bucket = TokenBucket(rate=1, burst=1)
+    assert bucket.ambil("a")[0]
+    assert not bucket.ambil("a")[0]
+    assert bucket.ambil("b")[0]
+
+
+def test_bucket_penuh_dibuang_saat_melebihi_max_keys(jam):
+    bucket = TokenBucket(rate=1, burst=2, max_keys=2)
+    bucket.ambil("a")
+    bucket.ambil("b")
+    jam.t += 5
+    bucket.ambil("c")
+    assert set(bucket._buckets) == {"c"}
+
+
+def test_jumlah_bucket_dibatasi_max_keys(jam):
+    bucket = TokenBucket(rate=1, burst=2, max_keys=3)
+    for ip in "abcde":  # belum ada yang terisi penuh lagi
+        bucket.ambil(ip)
+        jam.t += 0.1
+    assert list(bucket._buckets) == ["c", "d", "e"]
+
+    bucket.ambil("c")  # dipakai lagi → pindah ke belakang
+    bucket.ambil("f")
+    assert list(bucket._buckets) == ["e", "c", "f"]
+
+
+@pytest.fixture
+def client(jam, monkeypatch):
+    monkeypatch.setattr(verifikasi_publik, "_bucket", TokenBucket(rate=1, burst=2))
+    app = Flask(__name__)
+
+    @app.route("/cek")
+    @rate_limited
+    def cek():
+        return "ok"
+
+    return app.test_client()
+
+
+def test_decorator_429_dengan_retry_after(client):
+    assert [client.get("/cek").status_code for _ in range(2)] == [200, 200]
+    r = client.get("/cek")
+    assert r.status_code == 429
+    assert r.headers["Retry-After"] == "1"
+    assert "error" in r.get_json()
+    # IP lain tidak terpengaruh
+    assert client.get("/cek", environ_base={"REMOTE_ADDR": "10.0.0.9"}).status_code == 200
+
+
+def test_x_forwarded_for_hanya_bila_trust_proxy(client, monkeypatch):
+    palsu = {"X-Forwarded-For": "203.0.113.7"}
+    for _ in range(2):
+        client.get("/cek")
+    # tanpa TRUST_PROXY header diabaikan: tetap dihitung sebagai IP yang sama
+    assert client.get("/cek", headers=palsu).status_code == 429
+
+    monkeypatch.setattr(verifikasi_publik, "TRUST_PROXY", True)
+    assert client.get("/cek", headers=palsu).status_code == 200
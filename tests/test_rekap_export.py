@@ -0,0 +1,77 @@
+# tests/test_rekap_export.py
+import os, csv, io
+
+import pytest
+from openpyxl import Workbook, load_workbook
+
+from services import export_service
+from services.repository import get_repository
+from services.storage import simpan_path
+from services.facet_service import make_filter
+from services.mdt_service import create_pengajuan_batch, generate_nomor_ijazah_batch
+from services.export_service import KOLOM_REKAP, rekap_csv, export_rekap_xlsx
+from services.job_service import enqueue_export_rekap_xlsx, get_job, run_job, JENIS_REKAP_XLSX
+
+TAHUN = "2014/2015"
+
+
+@pytest.fixture(scope="module")
+def ditetapkan(tmp_path_factory):
+    """Dua pengajuan Ditetapkan (3 + 4 santri) di tahun TAHUN."""
+    folder = tmp_path_factory.mktemp("rekap")
+    mdt = {"id": 1, "kode_mdt": "UJI", "wilayah": "Uji"}
+    for nama, jumlah in (("R1", 3), ("R2", 4)):
+        path = folder / f"{nama}.xlsx"
+        wb = Workbook()
+        wb.active.append(["Nama Santri", "Nomor Induk Santri"])
+        for i in range(jumlah):
+            wb.active.append([f"{nama} {i}", f"{nama}-{i}"])
+        wb.save(path)
+        pid, _ = create_pengajuan_batch(mdt, nama, "Ulya", TAHUN, jumlah, simpan_path(str(path)).kunci)
+        with get_repository().connection() as conn:
+            conn.cursor().execute("UPDATE pengajuan SET status='Diverifikasi' WHERE id=?", (pid,))
+        generate_nomor_ijazah_batch(pid)
+    return make_filter(tahun=TAHUN)
+
+
+def test_csv_dikirim_per_potongan(ditetapkan, monkeypatch):
+    monkeypatch.setattr(export_service, "REKAP_CHUNK", 2)
+    potongan = list(rekap_csv(ditetapkan))
+    assert len(potongan) == 4  # header+2, 2, 2, sisa 1
+
+    rows = list(csv.reader(io.StringIO("".join(potongan).lstrip("\ufeff"))))
+    assert rows[0] == KOLOM_REKAP
+    assert len(rows) == 1 + 7
+    assert {r[5] for r in rows[1:]} == {"R1", "R2"}
+
+
+def test_xlsx_ditulis_lengkap(ditetapkan, tmp_path):
+    path = str(tmp_path / "rekap.xlsx")
+    assert export_rekap_xlsx(ditetapkan, path) == 7
+
+    rows = list(load_workbook(path, read_only=True).active.values)
+    assert list(rows[0]) == KOLOM_REKAP
+    assert len(rows) == 1 + 7
+    assert not [f for f in os.listdir(tmp_path) if f.endswith(".tmp")]
+
+
+def test_xlsx_dipecah_per_sheet(ditetapkan, tmp_path, monkeypatch):
+    monkeypatch.setattr(export_service, "XLSX_MAX_BARIS", 3)
+    path = str(tmp_path / "rekap.xlsx")
+    export_rekap_xlsx(ditetapkan, path)
+
+    wb = load_workbook(path, read_only=True)
+    assert [len(list(ws.values)) for ws in wb.worksheets] == [4, 4, 2]
+
+
+def test_job_rekap_xlsx(ditetapkan):
+    job_id = enqueue_export_rekap_xlsx(ditetapkan, "rekap.xlsx", "kanwil")
+    job = get_job(job_id)
+    assert job["jenis"] == JENIS_REKAP_XLSX
+    assert job["parameter"]["filter"]["tahun"] == [TAHUN]
+
+    run_job(job)
+    job = get_job(job_id)
+    assert job["status"] == "selesai"
+    assert job["laporan"] == {"jumlah": 7}
+    assert len(list(load_workbook(job["hasil_file"], read_only=True).active.values)) == 1 + 7
@@ -0,0 +1,104 @@
+# tests/test_santri_staging.py
+import pytest
+from openpyxl import Workbook
+
+from services.repository import get_repository
+from services.storage import simpan_path
+from services.excel_ingest import KolomTidakDitemukan
+from services.mdt_service import create_pengajuan_batch, generate_nomor_ijazah_batch, pengajuan_milik_mdt
+from services.santri_service import santri_header, page_santri, iter_santri_rows, nis_ganda, ringkasan_santri
+
+MDT = {"id": 41, "kode_mdt": "STG", "wilayah": "Uji"}
+MDT_LAIN = {"id": 42, "kode_mdt": "LAIN", "wilayah": "Uji"}
+
+
+def _file(tmp_path, nama, baris, header=("No", "Nama Santri", "Nomor Induk Santri")):
+    path = tmp_path / f"{nama}.xlsx"
+    wb = Workbook()
+    wb.active.append(list(header))
+    for r in baris:
+        wb.active.append(list(r))
+    wb.save(path)
+    return simpan_path(str(path)).kunci
+
+
+def _jumlah_pengajuan():
+    with get_repository().connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT COUNT(*) FROM pengajuan")
+        return c.fetchone()[0]
+
+
+def test_baris_di_stage_saat_upload(tmp_path):
+    baris = [(i + 1, f"Santri {i}", f"S-{i}") for i in range(7)] + [(None, None, None)]
+    pid, _ = create_pengajuan_batch(MDT, "STG", "Ula", "2018/2019", 7, _file(tmp_path, "stg", baris))
+
+    assert santri_header(pid) == ["No", "Nama Santri", "Nomor Induk Santri"]
+    rows, has_more = page_santri(pid, 0, 5)
+    assert rows[0] == [1, "Santri 0", "S-0"] and len(rows) == 5 and has_more
+    rows, has_more = page_santri(pid, 5, 5)
+    assert [r[1] for r in rows] == ["Santri 5", "Santri 6"] and not has_more
+    assert [b for chunk in iter_santri_rows(pid, chunk_size=3) for b, _ in chunk] == list(range(7))
+    assert ringkasan_santri([pid])[pid]["jumlah"] == 7
+
+
+def test_file_tanpa_kolom_wajib_tidak_membuat_pengajuan(tmp_path):
+    kunci = _file(tmp_path, "salah", [("x", "y")], header=("Nama", "Alamat"))
+    sebelum = _jumlah_pengajuan()
+    with pytest.raises(KolomTidakDitemukan):
+        create_pengajuan_batch(MDT, "STG", "Ula", "2018/2019", 1, kunci)
+    assert _jumlah_pengajuan() == sebelum
+
+
+def test_nis_ganda_dalam_batch_dan_sudah_terbit(tmp_path):
+    lama, _ = create_pengajuan_batch(MDT, "STG", "Ula", "2019/2020", 1,
+                                     _file(tmp_path, "lama", [(1, "Terbit", "NIS-TERBIT")]))
+    with get_repository().connection() as conn:
+        conn.cursor().execute("UPDATE pengajuan SET status='Diverifikasi' WHERE id=?", (lama,))
+    generate_nomor_ijazah_batch(lama)
+
+    baris = [(1, "A", "NIS-DUA"), (2, "B", "NIS-DUA"), (3, "C", "NIS-TERBIT")]
+    pid, _ = create_pengajuan_batch(MDT, "STG", "Ula", "2019/2020", 3, _file(tmp_path, "baru", baris))
+
+    hasil = nis_ganda(pid)
+    assert hasil["dalam_batch"] == [{"nis": "NIS-DUA", "jumlah": 2}]
+    assert [(s["nis"], s["pengajuan_id"]) for s in hasil["sudah_terbit"]] == [("NIS-TERBIT", lama)]
+    assert ringkasan_santri([pid])[pid] == {"jumlah": 3, "nis_ganda": 1, "sudah_terbit": 1}
+
+
+def test_pengajuan_milik_mdt(tmp_path):
+    pid, _ = create_pengajuan_batch(MDT, "STG", "Ula", "2018/2019", 1, _file(tmp_path, "milik", [(1, "A", "1")]))
+    assert pengajuan_milik_mdt(pid, MDT["id"])
+    assert not pengajuan_milik_mdt(pid, MDT_LAIN["id"])
+
+
+@pytest.fixture
+def client():
+    from app_gateway import app
+    return app.test_client()
+
+
+def _login(client, role, uid):
+    with client.session_transaction() as s:
+        s["user"] = {"id": uid, "username": role, "role": role, "kode_mdt": "STG", "wilayah": "Uji", "nama": role}
+
+
+def test_preview_data_staging_hanya_untuk_pemilik(tmp_path, client):
+    kunci = _file(tmp_path, "auth", [(1, "Rahasia", "NIS-1")])
+    pid, _ = create_pengajuan_batch(MDT, "STG", "Ula", "2018/2019", 1, kunci)
+    url = f"/preview_data/{kunci}?pengajuan_id={pid}"
+
+    _login(client, "mdt", MDT_LAIN["id"])
+    assert client.get(url).status_code == 403
+
+    for role, uid in (("mdt", MDT["id"]), ("kanwil", 3)):
+        _login(client, role, uid)
+        r = client.get(url)
+        assert r.status_code == 200
+        assert r.get_json()["rows"] == [[1, "Rahasia", "NIS-1"]]
+
+
+def test_preview_data_butuh_login(tmp_path, client):
+    kunci = _file(tmp_path, "anon", [(1, "A", "1")])
+    pid, _ = create_pengajuan_batch(MDT, "STG", "Ula", "2018/2019", 1, kunci)
+    assert client.get(f"/preview_data/{kunci}?pengajuan_id={pid}").status_code in (302, 401, 403)
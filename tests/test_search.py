@@ -0,0 +1,43 @@
+# tests/test_search.py
+import sqlite3
+
+from services.db_pool import DB_PATH
+from services.search_service import cari_ijazah
+
+
+def _tambah(c, nama, nomor):
+    c.execute("INSERT INTO pengajuan (nama_mdt, status) VALUES ('MDT Cari', 'Ditetapkan')")
+    c.execute("INSERT INTO nomor_ijazah (pengajuan_id, nama_santri, nis, nomor_ijazah) VALUES (?, ?, ?, ?)",
+              (c.lastrowid, nama, nomor[-6:], nomor))
+
+
+def test_cari_awalan_nama(conn):
+    _tambah(conn.cursor(), "Zulkarnain Pencarian", "MDT-UJI-CARI-000001")
+    hasil = cari_ijazah("zulk penc", conn=conn)
+    assert [h["nomor_ijazah"] for h in hasil] == ["MDT-UJI-CARI-000001"]
+    assert hasil[0]["cocok"] == "awalan"
+
+
+def test_koneksi_pemanggil_tidak_dicommit(conn):
+    _tambah(conn.cursor(), "Qadarisman Transaksi", "MDT-UJI-CARI-000002")
+    assert cari_ijazah("qadarisman", conn=conn)
+
+    # masih transaksi pemanggil: koneksi lain belum melihat barisnya
+    lain = sqlite3.connect(DB_PATH)
+    try:
+        assert lain.execute("SELECT COUNT(*) FROM nomor_ijazah WHERE nomor_ijazah='MDT-UJI-CARI-000002'").fetchone()[0] == 0
+    finally:
+        lain.close()
+    conn.rollback()
+    assert cari_ijazah("qadarisman", conn=conn) == []
+
+
+def test_koneksi_sqlite_mentah_tetap_terbuka():
+    raw = sqlite3.connect(DB_PATH)
+    try:
+        _tambah(raw.cursor(), "Wiraguna Mentah", "MDT-UJI-CARI-000003")
+        assert cari_ijazah("wiraguna", conn=raw)
+        assert raw.in_transaction
+        raw.rollback()
+    finally:
+        raw.close()
@@ -0,0 +1,53 @@
+# tests/test_statistik.py
+import threading
+
+from openpyxl import Workbook
+
+from services import mdt_service, statistik_service
+from services.repository import get_repository
+from services.storage import simpan_path
+from services.mdt_service import create_pengajuan_batch, generate_nomor_ijazah_batch
+from services.statistik_service import dashboard_counts
+
+
+def _pengajuan(tmp_path, nama, jumlah):
+    path = tmp_path / f"{nama}.xlsx"
+    wb = Workbook()
+    wb.active.append(["Nama Santri", "Nomor Induk Santri"])
+    for i in range(jumlah):
+        wb.active.append([f"{nama} {i}", f"{nama}-{i}"])
+    wb.save(path)
+    mdt = {"id": 1, "kode_mdt": "UJI", "wilayah": "Uji"}
+    pengajuan_id, _ = create_pengajuan_batch(mdt, nama, "Ula", "2016/2017", jumlah, simpan_path(str(path)).kunci)
+    with get_repository().connection() as conn:
+        conn.cursor().execute("UPDATE pengajuan SET status='Diverifikasi' WHERE id=?", (pengajuan_id,))
+    return pengajuan_id
+
+
+def test_cache_dashboard_dibersihkan_setelah_commit(tmp_path, monkeypatch):
+    pid = _pengajuan(tmp_path, "ST1", 3)
+    terlihat = []  # status pengajuan menurut koneksi lain saat cache dibersihkan
+    asli = statistik_service.invalidate
+
+    def spy():
+        def baca():
+            with get_repository().connection() as conn:
+                c = conn.cursor()
+                c.execute("SELECT status FROM pengajuan WHERE id=?", (pid,))
+                terlihat.append(c.fetchone()[0])
+        t = threading.Thread(target=baca)
+        t.start()
+        t.join()
+        asli()
+
+    monkeypatch.setattr(statistik_service, "invalidate", spy)
+    monkeypatch.setattr(mdt_service, "invalidate_statistik", spy)
+    generate_nomor_ijazah_batch(pid)
+    assert terlihat == ["Ditetapkan"]
+
+
+def test_santri_baru_langsung_terlihat_di_dashboard(tmp_path):
+    pid = _pengajuan(tmp_path, "ST2", 4)
+    sebelum = dashboard_counts("kanwil")["total_santri"]  # sekarang ada di cache TTL
+    generate_nomor_ijazah_batch(pid)
+    assert dashboard_counts("kanwil")["total_santri"] == sebelum + 4
@@ -0,0 +1,83 @@
+# tests/test_storage.py
+import io, os, hashlib
+
+import pytest
+
+from services import storage
+from services.storage import (
+    LocalBackend, LocalObjectClient, ObjectStoreBackend, simpan, resolve, is_kunci, UPLOAD_ROOT,
+)
+
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    b = LocalBackend(str(tmp_path / "uploads"))
+    monkeypatch.setattr(storage, "_backend", b)
+    return b
+
+
+def _file_final(root):
+    return sorted(f for _, _, files in os.walk(root) for f in files if not f.endswith(".part"))
+
+
+class _PutusDiTengah(io.BytesIO):
+    def read(self, n=-1):
+        if self.tell() > 0:
+            raise IOError("koneksi putus")
+        return super().read(4)
+
+
+def test_kunci_dari_hash_isi(backend):
+    hasil = simpan(io.BytesIO(b"isi lulusan"), "Daftar Lulusan.XLSX")
+    assert hasil.kunci == hashlib.sha256(b"isi lulusan").hexdigest() + ".xlsx"
+    assert is_kunci(hasil.kunci) and hasil.baru and hasil.ukuran == 11
+    with open(resolve(hasil.kunci), "rb") as f:
+        assert f.read() == b"isi lulusan"
+
+
+def test_isi_sama_tidak_disimpan_dua_kali(backend):
+    pertama = simpan(io.BytesIO(b"sama"), "a.xlsx")
+    kedua = simpan(io.BytesIO(b"sama"), "nama lain.xlsx")
+    assert kedua.kunci == pertama.kunci and not kedua.baru
+    assert _file_final(backend.root) == [pertama.kunci]
+    assert os.listdir(backend.tmp_dir) == []
+
+
+def test_upload_gagal_tidak_meninggalkan_file(backend):
+    with pytest.raises(IOError):
+        simpan(_PutusDiTengah(b"12345678"), "putus.xlsx")
+    assert _file_final(backend.root) == []
+    assert os.listdir(backend.tmp_dir) == []
+
+
+def test_ekstensi_tidak_wajar_jadi_bin(backend):
+    assert simpan(io.BytesIO(b"a"), "tanpa_ekstensi").kunci.endswith(".bin")
+    assert simpan(io.BytesIO(b"b"), "x.ekstensipanjang").kunci.endswith(".bin")
+    assert simpan(io.BytesIO(b"c"), "../../x.CSV").kunci.endswith(".csv")
+
+
+def test_resolve_nilai_lama_dan_traversal(backend):
+    os.makedirs(UPLOAD_ROOT, exist_ok=True)
+    lama = os.path.join(UPLOAD_ROOT, "20240101_lulusan.xlsx")
+    with open(lama, "wb") as f:
+        f.write(b"lama")
+    assert resolve("uploads/20240101_lulusan.xlsx") == lama
+    assert resolve("C:\\data\\uploads\\20240101_lulusan.xlsx") == lama
+    assert resolve("../../etc/passwd") is None
+    assert resolve("0" * 64 + ".xlsx") is None  # kunci valid tapi tidak ada
+
+
+def test_object_store_lokal(tmp_path, monkeypatch):
+    b = ObjectStoreBackend(LocalObjectClient(str(tmp_path / "bucket")), "sindi", str(tmp_path / "cache"))
+    monkeypatch.setattr(storage, "_backend", b)
+
+    hasil = simpan(io.BytesIO(b"di bucket"), "s3.xlsx")
+    assert hasil.baru and not simpan(io.BytesIO(b"di bucket"), "s3.xlsx").baru
+    assert os.path.isfile(tmp_path / "bucket" / "sindi" / "uploads" / hasil.kunci)
+
+    b.cache.delete(hasil.kunci)  # cache lokal hilang (mis. redeploy): diambil lagi dari bucket
+    with open(resolve(hasil.kunci), "rb") as f:
+        assert f.read() == b"di bucket"
+
+    storage.hapus(hasil.kunci)
+    assert resolve(hasil.kunci) is None
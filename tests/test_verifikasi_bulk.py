@@ -0,0 +1,81 @@
+# tests/test_verifikasi_bulk.py
+import pytest
+
+from services.repository import get_repository
+from services.mdt_service import update_status_pengajuan_bulk
+
+
+def _buat_pengajuan(jumlah, status="Menunggu"):
+    with get_repository().connection() as conn:
+        ids = [conn.insert_returning("""
+            INSERT INTO pengajuan (nama_mdt, jenjang, tahun_pelajaran, jumlah_lulus, status)
+            VALUES (?, 'Ula', '2010/2011', 10, ?)
+        """, (f"MDT Verifikasi {i}", status)) for i in range(jumlah)]
+        conn.commit()
+    return ids
+
+
+def _status(ids):
+    with get_repository().connection() as conn:
+        c = conn.cursor()
+        marks = ", ".join("?" for _ in ids)
+        c.execute(f"SELECT id, status FROM pengajuan WHERE id IN ({marks}) ORDER BY id", ids)
+        return {r[0]: r[1] for r in c.fetchall()}
+
+
+def _jumlah_riwayat(ids):
+    with get_repository().connection() as conn:
+        c = conn.cursor()
+        marks = ", ".join("?" for _ in ids)
+        c.execute(f"SELECT COUNT(*) FROM riwayat_verifikasi WHERE pengajuan_id IN ({marks})", ids)
+        return c.fetchone()[0]
+
+
+def test_status_dan_riwayat_ditulis_bersama():
+    ids = _buat_pengajuan(3)
+    sudah = _buat_pengajuan(1, status="Diverifikasi")[0]
+    hasil = update_status_pengajuan_bulk(
+        [(ids[0], "Diverifikasi", ""), (ids[1], "Ditolak", "berkas kurang"), (sudah, "Diverifikasi", "")],
+        verifikator="uji")
+
+    assert hasil == {"diperbarui": ids[:2], "dilewati": [sudah]}
+    assert _status(ids) == {ids[0]: "Diverifikasi", ids[1]: "Ditolak", ids[2]: "Menunggu"}
+    assert _jumlah_riwayat(ids + [sudah]) == 2
+
+
+def test_lintas_potongan(monkeypatch):
+    from services import mdt_service
+    monkeypatch.setattr(mdt_service, "BULK_CHUNK", 2)
+    ids = _buat_pengajuan(5)
+    hasil = update_status_pengajuan_bulk([(i, "Diverifikasi", None) for i in ids], verifikator="uji")
+    assert hasil["diperbarui"] == ids
+    assert _jumlah_riwayat(ids) == 5
+
+
+def test_gagal_tulis_riwayat_tidak_mengubah_pengajuan(monkeypatch):
+    from services import mdt_service
+    monkeypatch.setattr(mdt_service, "BULK_CHUNK", 2)  # beberapa UPDATE sebelum insert riwayat
+    ids = _buat_pengajuan(5)
+    with get_repository().connection() as conn:
+        conn.cursor().execute("""
+            CREATE TRIGGER _riwayat_gagal BEFORE INSERT ON riwayat_verifikasi
+            BEGIN SELECT RAISE(ABORT, 'riwayat gagal'); END
+        """)
+        conn.commit()
+    try:
+        with pytest.raises(Exception, match="riwayat gagal"):
+            update_status_pengajuan_bulk([(i, "Ditolak", "x") for i in ids], verifikator="uji")
+    finally:
+        with get_repository().connection() as conn:
+            conn.cursor().execute("DROP TRIGGER _riwayat_gagal")
+            conn.commit()
+
+    assert set(_status(ids).values()) == {"Menunggu"}
+    assert _jumlah_riwayat(ids) == 0
+
+
+def test_status_tidak_dikenal_ditolak_sebelum_menyentuh_database():
+    ids = _buat_pengajuan(1)
+    with pytest.raises(ValueError):
+        update_status_pengajuan_bulk([(ids[0], "Entahlah", None)])
+    assert _status(ids) == {ids[0]: "Menunggu"}